@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'AWS SES - Tracking Avanzado de Emails',
-    'version': '1.0',
+    'version': '1.2',
     'author': 'Pedro Pereira Vaz',
     'website': 'https://wavext.io',
     'category': 'Marketing/Email Marketing',
@@ -66,7 +66,11 @@
         'mass_mailing',
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/mailing_trace_view.xml',
+        'views/ir_mail_server_view.xml',
+        'views/aws_ses_suppression_views.xml',
     ],
     'images': [],
     'installable': True,
@@ -0,0 +1 @@
+from . import ses_import
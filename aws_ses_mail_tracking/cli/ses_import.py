@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+from pathlib import Path
+
+import odoo
+from odoo.cli import Command
+
+
+class SesImport(Command):
+    """Importa en mailing.trace un fichero JSON-lines de eventos SES exportados (Firehose/S3)"""
+    name = 'ses_import'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(prog=f'{Path(sys.argv[0]).name} {self.name}', description=self.__doc__)
+        parser.add_argument('-c', '--config', dest='config', help="fichero de configuración de Odoo")
+        parser.add_argument('-d', '--database', dest='db_name', help="base de datos")
+        parser.add_argument('--offset', type=int, default=0, help="byte del fichero desde el que reanudar")
+        parser.add_argument('--batch-size', type=int, default=10000, help="líneas por lote (y por commit)")
+        parser.add_argument('path', help="fichero JSON-lines con un evento SES (o sobre SNS) por línea")
+        args = parser.parse_args(cmdargs)
+
+        config_args = []
+        if args.config:
+            config_args += ['-c', args.config]
+        if args.db_name:
+            config_args += ['-d', args.db_name]
+        odoo.tools.config.parse_config(config_args, setup_logging=True)
+        db_name = odoo.tools.config['db_name']
+        if not db_name:
+            sys.exit("Missing database name (-d)")
+
+        registry = odoo.modules.registry.Registry(db_name)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            result = env['aws.ses.event']._import_event_file(
+                args.path, offset=args.offset, batch_size=args.batch_size)
+        print(f"Imported {result['rows']} rows ({result['skipped']} skipped) in {result['seconds']:.1f}s "
+              f"({result['rows_per_second']:.0f} rows/s). Next offset: {result['offset']}")
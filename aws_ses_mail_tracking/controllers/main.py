@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import hmac
+import json
+import logging
+import threading
+
+import requests
+
+from odoo import http
+from odoo.http import request
+from odoo.addons.aws_ses_mail_tracking.libs.ses_events import is_sns_url, parse_ses_event, verify_sns_signature
+
+_logger = logging.getLogger(__name__)
+
+# Certificados de firma SNS por URL (AWS los rota con poca frecuencia)
+_sns_certificates = {}
+_sns_certificates_lock = threading.Lock()
+
+
+def _get_sns_certificate(url):
+    certificate = _sns_certificates.get(url)
+    if certificate is None:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+        certificate = response.content
+        with _sns_certificates_lock:
+            _sns_certificates[url] = certificate
+    return certificate
+
+
+class AwsSesController(http.Controller):
+
+    @http.route('/aws_ses/sns', type='http', auth='public', methods=['POST'], csrf=False, save_session=False)
+    def sns_notification(self, **kwargs):
+        """Recibe eventos SES publicados en un tema SNS y los encola para aplicarlos por lotes"""
+        try:
+            message = json.loads(request.httprequest.get_data())
+        except ValueError:
+            return request.make_response("Invalid JSON", status=400)
+        if not isinstance(message, dict) or not verify_sns_signature(message, _get_sns_certificate):
+            _logger.warning("[SES EVENTS] Rejected SNS message with invalid signature")
+            return request.make_response("Invalid signature", status=403)
+
+        allowed_topics = request.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.sns_topic_arns')
+        if allowed_topics and message.get('TopicArn') not in [t.strip() for t in allowed_topics.split(',')]:
+            _logger.warning("[SES EVENTS] Rejected SNS message from topic %s", message.get('TopicArn'))
+            return request.make_response("Unknown topic", status=403)
+
+        if message['Type'] == 'SubscriptionConfirmation':
+            if not is_sns_url(message.get('SubscribeURL')):
+                return request.make_response("Invalid SubscribeURL", status=400)
+            requests.get(message['SubscribeURL'], timeout=10).raise_for_status()
+            _logger.info("[SES EVENTS] Confirmed SNS subscription to %s", message.get('TopicArn'))
+        elif message['Type'] == 'Notification':
+            try:
+                events = parse_ses_event(json.loads(message['Message']))
+            except (ValueError, TypeError, AttributeError):
+                return request.make_response("Invalid SES event", status=400)
+            request.env['aws.ses.event'].sudo()._enqueue(events)
+        return request.make_response("OK")
+
+    @http.route('/aws_ses/metrics', type='http', auth='public', methods=['GET'], csrf=False, save_session=False)
+    def metrics(self, format=None, token=None, **kwargs):
+        """Métricas de envío de todos los workers, en formato de texto de Prometheus o JSON (?format=json).
+
+        Requiere el token del parámetro aws_ses_mail_tracking.metrics_token, como cabecera
+        ``Authorization: Bearer <token>`` o como ``?token=``. Sin token configurado no existe.
+        """
+        expected = request.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.metrics_token')
+        if not expected:
+            return request.not_found()
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):].strip()
+        if not token or not hmac.compare_digest(token.encode(), expected.encode()):
+            return request.make_response("Invalid token", status=403)
+
+        registry = request.env['aws.ses.metric'].sudo()._get_registry()
+        if format == 'json':
+            return request.make_json_response(registry.snapshot())
+        return request.make_response(registry.render_prometheus(), headers=[
+            ('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+        ])
@@ -1 +1,13 @@
 from . import smtplib_inherit
+from . import ses_tools
+from . import smtp_pool
+from . import ses_retry
+from . import ses_sender
+from . import ses_events
+from . import bounce_report
+from . import suppression
+from . import ses_api
+from . import ses_routing
+from . import metrics
+from . import trace_cache
+from . import event_dedup
@@ -0,0 +1,167 @@
+"""Análisis de informes de rebote (RFC 3464, DSN) y de queja (RFC 5965, ARF).
+
+Solo se recorren las partes de primer nivel del informe (y los multipart que las contienen,
+por si el informe llega envuelto): nunca se entra en el mensaje original devuelto
+(message/rfc822, text/rfc822-headers), que suele ser la parte más grande. El recorrido
+termina en cuanto se encuentra la parte del informe.
+
+Las cabeceras se leen en crudo (raw_items): con email.policy.SMTP, que es la política con la
+que Odoo parsea el correo entrante, cada get() construye un objeto de cabecera completo.
+"""
+import re
+from collections import namedtuple
+from email.parser import HeaderParser
+
+REPORT_CONTENT_TYPES = ('message/delivery-status', 'message/feedback-report')
+# Partes que contienen el mensaje original: nunca se analizan
+RETURNED_CONTENT_TYPES = ('message/rfc822', 'text/rfc822-headers', 'message/rfc822-headers')
+
+RecipientStatus = namedtuple('RecipientStatus', ['recipient', 'action', 'status', 'diagnostic_code'])
+BounceReport = namedtuple('BounceReport', ['report_type', 'feedback_type', 'recipients'])
+BounceReport.__doc__ = """Resultado del análisis.
+
+report_type: 'delivery-status', 'feedback-report' o None si el mensaje no es un informe;
+feedback_type: tipo de queja (abuse, fraud...) para informes ARF;
+recipients: lista de RecipientStatus (acción, estado y código de diagnóstico por destinatario).
+"""
+
+_BLOCK_SEPARATOR_RE = re.compile(r'\r?\n[ \t]*\r?\n')
+_header_parser = HeaderParser()
+
+
+def bounce_class(status):
+    """'hard' para estados 5.X.X, 'soft' para 4.X.X, None en otro caso"""
+    if status and status.startswith('5'):
+        return 'hard'
+    if status and status.startswith('4'):
+        return 'soft'
+    return None
+
+
+# Estados permanentes de la dirección (RFC 3463): buzón o dominio inexistente, sintaxis no
+# válida, buzón trasladado o deshabilitado. Otros 5.X.X (política 5.7.X, buzón lleno 5.2.2,
+# red 5.4.X) dependen del mensaje o del servidor, no de la dirección, y no la suprimen.
+PERMANENT_STATUSES = frozenset(('5.1.1', '5.1.2', '5.1.3', '5.1.6', '5.1.10', '5.2.1'))
+
+
+def is_permanent_failure(status):
+    """True si el estado DSN indica que la dirección no volverá a aceptar correo"""
+    return bool(status) and status.strip() in PERMANENT_STATUSES
+
+
+def parse_report(message):
+    """Analiza un email.message.Message de rebote o queja y devuelve un BounceReport"""
+    headers = _raw_headers(message)
+    part = _find_report_part(message, headers)
+    if part is None:
+        report_type = None
+        if _content_type(headers) == 'multipart/report':
+            report_type = message.get_param('report-type') or None
+        return BounceReport(report_type, None, [])
+    part, headers = part
+    if _content_type(headers) == 'message/delivery-status':
+        return BounceReport('delivery-status', None, _parse_delivery_status(part))
+    return _parse_feedback_report(part, headers)
+
+
+def _raw_headers(part):
+    """Cabeceras en crudo (nombre en minúsculas, primera aparición), sin plegado"""
+    headers = {}
+    for name, value in part.raw_items():
+        name = name.lower()
+        if name not in headers:
+            headers[name] = ' '.join(str(value).split())
+    return headers
+
+
+def _content_type(headers):
+    content_type = headers.get('content-type')
+    if not content_type:
+        return 'text/plain'
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def _find_report_part(message, headers):
+    content_type = _content_type(headers)
+    if content_type in REPORT_CONTENT_TYPES:
+        return message, headers
+    if not content_type.startswith('multipart/') or not message.is_multipart():
+        return None
+    for part in message.get_payload():
+        part_headers = _raw_headers(part)
+        content_type = _content_type(part_headers)
+        if content_type in REPORT_CONTENT_TYPES:
+            return part, part_headers
+        if content_type in RETURNED_CONTENT_TYPES:
+            continue
+        if content_type.startswith('multipart/'):
+            found = _find_report_part(part, part_headers)
+            if found is not None:
+                return found
+    return None
+
+
+def _header_blocks(part):
+    """Bloques de cabeceras (en crudo) del cuerpo de la parte del informe"""
+    payload = part.get_payload()
+    if isinstance(payload, list):
+        # El parser de email ya separa message/delivery-status en bloques
+        return [_raw_headers(block) for block in payload]
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8', 'replace')
+    if not payload:
+        return []
+    return [
+        _raw_headers(_header_parser.parsestr(block))
+        for block in _BLOCK_SEPARATOR_RE.split(payload.strip()) if block
+    ]
+
+
+def _address(value):
+    # "rfc822; user@example.com" -> user@example.com
+    if not value:
+        return None
+    return value.split(';', 1)[-1].strip() or None
+
+
+def _parse_delivery_status(part):
+    recipients = []
+    for block in _header_blocks(part):
+        recipient = _address(block.get('final-recipient') or block.get('original-recipient'))
+        status = block.get('status')
+        if not recipient and not status:
+            # Bloque de campos por mensaje (Reporting-MTA, Arrival-Date...)
+            continue
+        action = block.get('action')
+        recipients.append(RecipientStatus(
+            recipient,
+            action.lower() if action else None,
+            status.split(' ', 1)[0] if status else None,
+            block.get('diagnostic-code') or None,
+        ))
+    return recipients
+
+
+def _parse_feedback_report(part, headers):
+    # Las cabeceras pueden estar en la propia parte o en su cuerpo
+    feedback_type = headers.get('feedback-type')
+    recipients = []
+    for block in [part] + _block_messages(part):
+        for name, value in block.raw_items():
+            name = name.lower()
+            if name == 'feedback-type' and not feedback_type:
+                feedback_type = ' '.join(str(value).split())
+            elif name == 'original-rcpt-to':
+                recipients.append(RecipientStatus(_address(str(value)), None, None, None))
+    return BounceReport('feedback-report', feedback_type.lower() if feedback_type else None, recipients)
+
+
+def _block_messages(part):
+    payload = part.get_payload()
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8', 'replace')
+    if not payload:
+        return []
+    return [_header_parser.parsestr(payload.strip())]
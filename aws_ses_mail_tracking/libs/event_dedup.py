@@ -0,0 +1,52 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def event_fingerprint(message_key, event_class, recipient, status=None):
+    """Huella de 64 bits (16 caracteres hexadecimales) de una notificación SES.
+
+    Identifica el rebote o la queja por (SES Message-ID normalizado, clase, destinatario, código de
+    estado), de modo que el mismo evento llegado por DSN, por SNS o repetido por el MTA tiene siempre
+    la misma huella, pero un rebote permanente que sigue a uno temporal del mismo mensaje no.
+    La clase es 'hard', 'soft' o 'complaint' (o el tipo de evento si no se conoce).
+    """
+    data = '\0'.join((message_key or '', event_class or '', (recipient or '').strip().lower(), status or ''))
+    return hashlib.blake2b(data.encode('utf-8', 'surrogateescape'), digest_size=8).hexdigest()
+
+
+class RecentFingerprints:
+    """Huellas vistas en los últimos ``window`` segundos (como mucho ``max_size``), en memoria.
+
+    Reconoce en O(1) y sin consultar la base de datos las repeticiones de una ráfaga; la tabla
+    aws.ses.event.fingerprint sigue siendo la referencia para las que ya salieron de la ventana.
+    Es por proceso: cada worker de Odoo mantiene la suya.
+    """
+
+    def __init__(self, window=3600, max_size=50000):
+        self.window = window
+        self.max_size = max_size
+        # huella -> caducidad, de la que caduca antes a la que caduca después
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expires)
+
+    def __contains__(self, fingerprint):
+        expires = self._expires.get(fingerprint)
+        return expires is not None and expires > time.monotonic()
+
+    def add(self, fingerprints):
+        now = time.monotonic()
+        expires = now + self.window
+        with self._lock:
+            for fingerprint in fingerprints:
+                self._expires[fingerprint] = expires
+                self._expires.move_to_end(fingerprint)
+            while self._expires:
+                fingerprint, fingerprint_expires = next(iter(self._expires.items()))
+                if fingerprint_expires > now and len(self._expires) <= self.max_size:
+                    break
+                self._expires.popitem(last=False)
@@ -0,0 +1,229 @@
+"""Métricas de envío del proceso: contadores e histogramas con etiquetas.
+
+Desactivadas por defecto (``metrics.enabled``): con ellas desactivadas, ``inc``/``observe``
+retornan de inmediato y ``timer`` devuelve un contexto vacío compartido, así que la
+instrumentación de la ruta de envío apenas cuesta una llamada a función.
+Se exportan en formato de texto de Prometheus o como un diccionario serializable a JSON.
+Cada worker de Odoo acumula sus métricas en memoria y las vuelca periódicamente (``drain``)
+en un almacén común, del que se reconstruyen sumadas (``merge``) para exportarlas.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Límites superiores (segundos) de los buckets de los histogramas de tiempos
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'ses_phase_seconds': "Duration of each send phase (tcp, starttls, auth, prepare, envelope, mail, rcpt, data, "
+                         "api_request, writeback)",
+    'ses_messages_total': "Messages accepted by SES",
+    'ses_message_bytes_total': "Bytes of the messages accepted by SES",
+    'ses_send_failures_total': "Messages that could not be sent, by reply code or exception",
+    'ses_replies_total': "SMTP replies (and API HTTP statuses) received, by command and code",
+    'ses_retries_total': "Temporary failures retried, by reply code",
+    'ses_smtp_pool_total': "SMTP connections requested from the pool, by result",
+    'ses_traces_written_total': "SES Message-IDs written to mailing.trace",
+    'ses_trace_cache_total': "SES ids looked up in the bounce/reply correlation cache, by result",
+    'ses_duplicate_events_total': "Repeated bounce/complaint notifications skipped, by source",
+}
+
+
+class _NullTimer:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(límite, observaciones <= límite)], terminando en +Inf"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsRegistry:
+
+    def __init__(self, enabled=False, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._drained_at = time.monotonic()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """Contexto que mide su duración en el histograma ``name``"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def drain(self, min_interval=0):
+        """Retira las métricas acumuladas desde el último vaciado como muestras sumables.
+
+        Devuelve ``[(nombre, tipo, etiquetas, valor)]`` con tipo ``counter``, ``bucket`` (las
+        observaciones de un único bucket, no acumuladas, con su límite en la etiqueta ``le``),
+        ``sum`` o ``count``, y deja el registro vacío. Si no han pasado ``min_interval``
+        segundos desde el último vaciado no retira nada.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._drained_at < min_interval or not (self._counters or self._histograms):
+                return []
+            counters, self._counters = self._counters, {}
+            histograms, self._histograms = self._histograms, {}
+            self._drained_at = now
+        samples = [(name, 'counter', labels, value) for (name, labels), value in counters.items()]
+        for (name, labels), histogram in histograms.items():
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                if count:
+                    samples.append((name, 'bucket', labels + (('le', _format_bound(bound)),), count))
+            samples.append((name, 'sum', labels, histogram.sum))
+            samples.append((name, 'count', labels, histogram.count))
+        return samples
+
+    def merge(self, samples):
+        """Suma al registro muestras de ``drain`` (de este u otros procesos), aunque esté desactivado"""
+        bounds = {_format_bound(bound): index for index, bound in enumerate(self.buckets + (float('inf'),))}
+        with self._lock:
+            for name, kind, labels, value in samples:
+                labels = tuple(sorted(labels))
+                if kind == 'counter':
+                    key = (name, labels)
+                    self._counters[key] = self._counters.get(key, 0) + value
+                    continue
+                le = dict(labels).get('le')
+                key = (name, tuple(label for label in labels if label[0] != 'le'))
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(self.buckets)
+                if kind == 'bucket':
+                    # Buckets de otra configuración: solo cuentan en _count y _sum
+                    if le in bounds:
+                        histogram.counts[bounds[le]] += int(value)
+                elif kind == 'sum':
+                    histogram.sum += value
+                elif kind == 'count':
+                    histogram.count += int(value)
+
+    def snapshot(self):
+        """Copia de las métricas como diccionario serializable a JSON"""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = [(key, histogram.count, histogram.sum, histogram.cumulative())
+                          for key, histogram in self._histograms.items()]
+        result = {'enabled': self.enabled, 'counters': {}, 'histograms': {}}
+        for (name, labels), value in counters:
+            result['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), count, total, cumulative in histograms:
+            result['histograms'].setdefault(name, []).append({
+                'labels': dict(labels),
+                'count': count,
+                'sum': total,
+                'buckets': {_format_bound(bound): value for bound, value in cumulative},
+            })
+        return result
+
+    def render_prometheus(self):
+        """Métricas en el formato de texto de Prometheus (versión 0.0.4)"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, series in sorted(snapshot['counters'].items()):
+            lines += _header(name, 'counter')
+            for serie in series:
+                lines.append(f"{name}{_labels(serie['labels'])} {serie['value']}")
+        for name, series in sorted(snapshot['histograms'].items()):
+            lines += _header(name, 'histogram')
+            for serie in series:
+                for bound, value in serie['buckets'].items():
+                    lines.append(f"{name}_bucket{_labels(dict(serie['labels'], le=bound))} {value}")
+                lines.append(f"{name}_sum{_labels(serie['labels'])} {serie['sum']}")
+                lines.append(f"{name}_count{_labels(serie['labels'])} {serie['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def _header(name, kind):
+    lines = [f"# TYPE {name} {kind}"]
+    if name in METRIC_HELP:
+        lines.insert(0, f"# HELP {name} {METRIC_HELP[name]}")
+    return lines
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in sorted(labels.items())) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registro del proceso usado por toda la ruta de envío
+metrics = MetricsRegistry()
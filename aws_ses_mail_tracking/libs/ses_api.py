@@ -0,0 +1,213 @@
+"""Transporte por la API HTTPS de Amazon SES (v2, SendEmail con contenido Raw).
+
+La firma AWS Signature Version 4 se calcula aquí (sin boto3). Cada cliente mantiene una
+requests.Session con su pool de conexiones keep-alive, de modo que los envíos consecutivos
+reutilizan la misma conexión TLS en lugar de repetir el diálogo SMTP completo por mensaje.
+"""
+import base64
+import copy
+import datetime
+import hashlib
+import hmac
+import io
+import json
+import threading
+from email.generator import BytesGenerator
+from smtplib import SMTPResponseException
+from urllib.parse import quote, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import metrics
+
+SES_API_SERVICE = 'ses'
+SES_API_SEND_PATH = '/v2/email/outbound-emails'
+
+# Errores de la API de limitación de tasa: se tratan como el 454 de SMTP
+SES_API_THROTTLING_ERRORS = ('TooManyRequestsException', 'ThrottlingException', 'LimitExceededException')
+
+_signing_keys = {}
+
+
+class SESAPIError(SMTPResponseException):
+    """Error de la API SES con el código SMTP equivalente.
+
+    454 para la limitación de tasa, 451 para errores temporales del servicio (5xx) y 554 para
+    rechazos definitivos, de modo que el manejo de errores SMTP existente sirve también aquí.
+    """
+
+    def __init__(self, status, error_code, message):
+        if status == 429 or error_code in SES_API_THROTTLING_ERRORS:
+            smtp_code = 454
+        elif status >= 500:
+            smtp_code = 451
+        else:
+            smtp_code = 554
+        super().__init__(smtp_code, f"{error_code or status}: {message}")
+        self.status = status
+        self.error_code = error_code
+
+
+def _signing_key(secret_key, date_stamp, region, service):
+    # La clave de firma solo cambia una vez al día: se guarda por fecha, región y servicio
+    cache_key = (secret_key, date_stamp, region, service)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = f"AWS4{secret_key}".encode()
+        for part in (date_stamp, region, service, 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        if len(_signing_keys) > 64:
+            _signing_keys.clear()
+        _signing_keys[cache_key] = key
+    return key
+
+
+def sign_v4(method, url, headers, body, access_key, secret_key, region, service=SES_API_SERVICE,
+            session_token=None, amz_date=None):
+    """Añade a ``headers`` las cabeceras de AWS Signature Version 4 y las devuelve.
+
+    Se firman todas las cabeceras recibidas más Host y X-Amz-Date.
+    """
+    parts = urlsplit(url)
+    amz_date = amz_date or datetime.datetime.now(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = amz_date[:8]
+    headers = dict(headers, **{'host': parts.netloc, 'x-amz-date': amz_date})
+    if session_token:
+        headers['x-amz-security-token'] = session_token
+    canonical = {name.lower(): ' '.join(str(value).split()) for name, value in headers.items()}
+    signed_headers = ';'.join(sorted(canonical))
+    query = '&'.join(sorted(
+        '='.join(quote(value, safe='-_.~') for value in (item.split('=', 1) + [''])[:2])
+        for item in parts.query.split('&') if item
+    ))
+    canonical_request = '\n'.join([
+        method,
+        quote(parts.path or '/', safe='/-_.~'),
+        query,
+        ''.join(f"{name}:{canonical[name]}\n" for name in sorted(canonical)),
+        signed_headers,
+        hashlib.sha256(body).hexdigest(),
+    ])
+    scope = f"{date_stamp}/{region}/{service}/aws4_request"
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256', amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest()])
+    signature = hmac.new(
+        _signing_key(secret_key, date_stamp, region, service), string_to_sign.encode(), hashlib.sha256).hexdigest()
+    headers['Authorization'] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={signed_headers}, Signature={signature}")
+    return headers
+
+
+class SESAPIClient:
+    """Cliente de la API SES v2 con conexiones HTTP persistentes, seguro entre hilos"""
+
+    def __init__(self, region, access_key, secret_key, endpoint=None, session_token=None,
+                 configuration_set=None, timeout=60, pool_size=10):
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.session_token = session_token
+        self.configuration_set = configuration_set
+        self.endpoint = (endpoint or f"https://email.{region}.amazonaws.com").rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def send_raw_email(self, data, from_addr=None, to_addrs=None):
+        """Envía un mensaje MIME ya serializado y devuelve el MessageId asignado por SES"""
+        payload = {'Content': {'Raw': {'Data': base64.b64encode(data).decode('ascii')}}}
+        if from_addr:
+            payload['FromEmailAddress'] = from_addr
+        if to_addrs:
+            payload['Destination'] = {'ToAddresses': list(to_addrs)}
+        if self.configuration_set:
+            payload['ConfigurationSetName'] = self.configuration_set
+        return self._request('POST', SES_API_SEND_PATH, payload)['MessageId']
+
+    def get_account(self):
+        """GetAccount: petición firmada sin efectos, para comprobar credenciales y endpoint"""
+        return self._request('GET', '/v2/email/account')
+
+    def close(self):
+        self.session.close()
+
+    def _request(self, method, path, payload=None):
+        url = f"{self.endpoint}{path}"
+        body = json.dumps(payload).encode() if payload is not None else b''
+        headers = sign_v4(
+            method, url, {'content-type': 'application/json', 'x-amz-content-sha256': hashlib.sha256(body).hexdigest()},
+            body, self.access_key, self.secret_key, self.region, session_token=self.session_token)
+        # requests añade Host a partir de la URL
+        headers.pop('host')
+        with self._lock:
+            self.requests += 1
+        with metrics.timer('ses_phase_seconds', phase='api_request'):
+            response = self.session.request(method, url, data=body, headers=headers, timeout=self.timeout)
+        metrics.inc('ses_replies_total', command='api', code=response.status_code)
+        if response.status_code >= 400:
+            try:
+                error = response.json()
+            except ValueError:
+                error = {}
+            error_code = response.headers.get('x-amzn-ErrorType', '').split(':')[0] or error.get('__type')
+            raise SESAPIError(response.status_code, error_code, error.get('message') or error.get('Message') or response.text)
+        return response.json()
+
+
+class SESAPISession:
+    """Sesión de envío por la API con la interfaz de una conexión SMTP que usa ir.mail_server.
+
+    ``send_message`` devuelve el MessageId de SES (str) en lugar de la respuesta a DATA.
+    ``quit``/``close`` no cierran nada: las conexiones HTTP pertenecen al cliente compartido.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.region = client.region
+        self.from_filter = False
+        self.smtp_from = None
+        self.messages_sent = 0
+
+    def send_message(self, msg, from_addr=None, to_addrs=None, mail_options=(), rcpt_options=()):
+        # Como smtplib.send_message: Bcc/Resent-Bcc no se transmiten
+        msg_copy = copy.copy(msg)
+        del msg_copy['Bcc']
+        del msg_copy['Resent-Bcc']
+        fp = io.BytesIO()
+        BytesGenerator(fp, policy=msg.policy.clone(linesep='\r\n')).flatten(msg_copy, linesep='\r\n')
+        return self.sendmail(from_addr, to_addrs, fp.getvalue())
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(), rcpt_options=()):
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        if isinstance(msg, str):
+            msg = msg.encode('utf-8')
+        message_id = self.client.send_raw_email(msg, from_addr, to_addrs)
+        self.messages_sent += 1
+        if metrics.enabled:
+            metrics.inc('ses_messages_total', transport='api')
+            metrics.inc('ses_message_bytes_total', len(msg), transport='api')
+        return message_id
+
+    def set_debuglevel(self, debuglevel):
+        pass
+
+    def noop(self):
+        return (250, b'OK')
+
+    def has_extn(self, opt):
+        return opt.lower() in ('smtputf8', '8bitmime')
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
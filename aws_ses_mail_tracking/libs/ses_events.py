@@ -0,0 +1,117 @@
+import base64
+import json
+import re
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from .ses_tools import normalize_message_id
+
+# Tipos de evento SES (event publishing: eventType / notificaciones de identidad: notificationType)
+EVENT_TYPES = {
+    'Bounce': 'bounce',
+    'Complaint': 'complaint',
+    'Open': 'open',
+    'Click': 'click',
+    'Reject': 'reject',
+}
+
+# Campos firmados por SNS, en el orden exigido por AWS
+SNS_SIGNED_KEYS = {
+    'Notification': ('Message', 'MessageId', 'Subject', 'Timestamp', 'TopicArn', 'Type'),
+    'SubscriptionConfirmation': ('Message', 'MessageId', 'SubscribeURL', 'Timestamp', 'Token', 'TopicArn', 'Type'),
+    'UnsubscribeConfirmation': ('Message', 'MessageId', 'SubscribeURL', 'Timestamp', 'Token', 'TopicArn', 'Type'),
+}
+SNS_SIGNATURE_HASHES = {'1': hashes.SHA1, '2': hashes.SHA256}
+SNS_HOST_RE = re.compile(r'^sns\.[a-z0-9-]+\.amazonaws\.com(\.cn)?$')
+
+
+def is_sns_url(url):
+    """Solo se aceptan URLs https de SNS (certificado de firma y confirmación de suscripción)"""
+    parts = urlsplit(url or '')
+    return parts.scheme == 'https' and bool(SNS_HOST_RE.match(parts.hostname or ''))
+
+
+def verify_sns_signature(message, get_certificate):
+    """Comprueba la firma de un mensaje SNS.
+
+    ``get_certificate(url)`` devuelve el certificado PEM (bytes) publicado en SigningCertURL;
+    se recibe como parámetro para poder cachearlo o sustituirlo en pruebas.
+    """
+    keys = SNS_SIGNED_KEYS.get(message.get('Type'))
+    hash_class = SNS_SIGNATURE_HASHES.get(str(message.get('SignatureVersion')))
+    cert_url = message.get('SigningCertURL') or message.get('SigningCertUrl')
+    if not keys or not hash_class or not message.get('Signature') or not is_sns_url(cert_url):
+        return False
+    string_to_sign = ''.join(f"{key}\n{message[key]}\n" for key in keys if key in message)
+    try:
+        certificate = x509.load_pem_x509_certificate(get_certificate(cert_url))
+        certificate.public_key().verify(
+            base64.b64decode(message['Signature']), string_to_sign.encode('utf-8'),
+            padding.PKCS1v15(), hash_class())
+    except (InvalidSignature, ValueError, TypeError):
+        return False
+    return True
+
+
+def _parse_timestamp(value):
+    # Formato SES: 2016-01-27T14:59:38.237Z (UTC)
+    try:
+        return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return False
+
+
+def parse_ses_event(event):
+    """Convierte un evento SES (JSON ya decodificado) en una lista de eventos planos, uno por destinatario.
+
+    Devuelve una lista vacía si el evento no es de un tipo que se aplique a mailing.trace.
+    """
+    event_type = EVENT_TYPES.get(event.get('eventType') or event.get('notificationType'))
+    mail = event.get('mail') or {}
+    ses_message_key = normalize_message_id(mail.get('messageId'))
+    if not event_type or not ses_message_key:
+        return []
+    details = event.get(event_type) or {}
+    base = {
+        'ses_message_key': ses_message_key,
+        'event_type': event_type,
+        'event_date': _parse_timestamp(details.get('timestamp') or mail.get('timestamp')),
+        'recipient': False,
+        'bounce_type': False,
+        'status_code': False,
+        'diagnostic_code': False,
+        'feedback_type': False,
+    }
+    if event_type == 'bounce':
+        base['bounce_type'] = details.get('bounceType') or False
+        return [dict(base,
+                     recipient=recipient.get('emailAddress') or False,
+                     status_code=recipient.get('status') or False,
+                     diagnostic_code=recipient.get('diagnosticCode') or False)
+                for recipient in details.get('bouncedRecipients') or [{}]]
+    if event_type == 'complaint':
+        base['feedback_type'] = details.get('complaintFeedbackType') or False
+        return [dict(base, recipient=recipient.get('emailAddress') or False)
+                for recipient in details.get('complainedRecipients') or [{}]]
+    if event_type == 'reject':
+        base['diagnostic_code'] = details.get('reason') or False
+    return [base]
+
+
+def parse_ses_event_line(line):
+    """Convierte una línea de un fichero exportado (JSON-lines de Firehose/S3) en eventos planos.
+
+    Acepta tanto el evento SES directamente como el sobre SNS que lo contiene.
+    Lanza ValueError si la línea no es JSON válido.
+    """
+    data = json.loads(line)
+    if not isinstance(data, dict):
+        raise ValueError("SES event line is not a JSON object")
+    if data.get('Type') == 'Notification' and isinstance(data.get('Message'), str):
+        data = json.loads(data['Message'])
+    return parse_ses_event(data)
@@ -0,0 +1,192 @@
+import logging
+import random
+import threading
+import time
+from smtplib import SMTPRecipientsRefused, SMTPResponseException, SMTPServerDisconnected
+
+from .metrics import metrics
+
+_logger = logging.getLogger(__name__)
+
+
+def temporary_code(exception):
+    """Código SMTP 4xx (fallo temporal: 454 de throttling, 421, 451, 452...) del error, o None.
+
+    Un SMTPRecipientsRefused solo es temporal si todos los destinatarios se rechazaron con 4xx.
+    """
+    if isinstance(exception, SMTPRecipientsRefused):
+        codes = [code for code, _message in exception.recipients.values()]
+        if codes and all(400 <= code < 500 for code in codes):
+            return max(codes)
+        return None
+    if isinstance(exception, SMTPResponseException) and 400 <= exception.smtp_code < 500:
+        return exception.smtp_code
+    return None
+
+
+def retry_code(exception):
+    """Código del fallo temporal si el envío puede reintentarse por la misma conexión, o None.
+
+    Los 5xx y los errores de conexión no se reintentan aquí, ni el 421: smtplib ya ha cerrado
+    la conexión al recibirlo (el correo vuelve a la cola, ver is_temporary_failure).
+    """
+    code = temporary_code(exception)
+    return None if code == 421 else code
+
+
+# Fallos temporales del servidor y no del mensaje: cierre de la conexión (421), error local o
+# del servicio (451, también los 5xx de la API) y throttling (454)
+SERVER_TEMPORARY_CODES = (421, 451, 454)
+
+
+def is_temporary_failure(exception):
+    """True si el mismo envío puede repetirse más tarde tal cual: conexión perdida o servidor que
+    no acepta correo por ahora. Los 4xx de un destinatario concreto no cuentan (el correo fallaría
+    en cada intento y no saldría nunca de la cola).
+    """
+    return isinstance(exception, SMTPServerDisconnected) or temporary_code(exception) in SERVER_TEMPORARY_CODES
+
+
+class TemporaryFailure(SMTPServerDisconnected):
+    """Fallo temporal que sigue tras la espera máxima: el correo debe volver a la cola.
+
+    mail.mail._send devuelve a la cola solo el correo con ``message_id`` (con su siguiente intento
+    dentro de ``retry_after`` segundos) y sigue con el lote. Hereda de SMTPServerDisconnected para
+    que cualquier otro llamador de send_email lo siga tratando como una conexión perdida.
+    """
+
+    def __init__(self, message, message_id=None, retry_after=0):
+        super().__init__(message)
+        self.message_id = message_id
+        self.retry_after = retry_after
+
+
+class ServerThrottle:
+    """Estado de limitación de un servidor: envíos simultáneos máximos y pausa común.
+
+    Una pausa (tras un 4xx) detiene a todos los hilos que envían por ese servidor, no solo al que
+    recibió el error: así el ritmo baja en conjunto en lugar de que cada hilo siga insistiendo.
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.paused_until = 0.0
+        self.failures = 0
+        self.retries = 0
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        self._semaphore.release()
+
+    def acquire(self, deadline=None):
+        """Ocupa un envío simultáneo tras esperar a que termine la pausa.
+
+        Devuelve False (sin ocupar nada) si la pausa termina después de ``deadline`` (monotonic).
+        """
+        self._semaphore.acquire()
+        while True:
+            wait = self.paused_until - time.monotonic()
+            if wait <= 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                self._semaphore.release()
+                return False
+            time.sleep(wait)
+
+    def remaining(self):
+        """Segundos que le quedan a la pausa del servidor"""
+        return max(self.paused_until - time.monotonic(), 0.0)
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.failures += 1
+            self.retries += 1
+
+    def success(self):
+        if self.failures:
+            with self._lock:
+                self.failures = 0
+
+
+class RetryScheduler:
+    """Reintenta en el mismo proceso (y con la misma conexión) los envíos con fallo temporal.
+
+    ``send(key, function, ...)`` llama a ``function`` (normalmente ``connection.send_message``)
+    limitando los envíos simultáneos por servidor (``key``) y, ante un 4xx, espera un tiempo
+    exponencial con jitter antes de volver a intentarlo, hasta ``max_retries`` veces. La espera
+    crece con los fallos consecutivos del servidor, no solo con los del mensaje. Con ``max_wait``
+    la espera total de un envío (reintentos y pausas del servidor) no pasa de esos segundos: si
+    haría falta esperar más, se lanza el último fallo temporal para devolver el correo a la cola.
+    """
+
+    def __init__(self, max_retries=5, backoff=1.0, max_backoff=30.0, concurrency=8):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_retries=None, backoff=None, max_backoff=None, concurrency=None):
+        if max_retries is not None:
+            self.max_retries = max_retries
+        if backoff is not None:
+            self.backoff = backoff
+        if max_backoff is not None:
+            self.max_backoff = max_backoff
+        if concurrency is not None and concurrency != self.concurrency:
+            # Los servidores nuevos usarán el nuevo límite; los existentes se recrean
+            with self._lock:
+                self.concurrency = concurrency
+                self._throttles.clear()
+
+    def throttle(self, key):
+        with self._lock:
+            throttle = self._throttles.get(key)
+            if throttle is None:
+                throttle = self._throttles[key] = ServerThrottle(self.concurrency)
+            return throttle
+
+    def delay(self, attempt, failures=0):
+        """Espera antes del reintento ``attempt`` (desde 0): exponencial, acotada y con jitter"""
+        exponent = max(attempt, failures - 1)
+        return min(self.max_backoff, self.backoff * (2 ** exponent)) * random.uniform(0.5, 1.5)
+
+    def send(self, key, function, *args, on_retry=None, max_wait=None, **kwargs):
+        throttle = self.throttle(key)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        attempt = 0
+        last_error = None
+        while True:
+            if not throttle.acquire(deadline):
+                _logger.info("[SES SEND] Sending to %s paused beyond the %ss wait limit", key, max_wait)
+                raise last_error or SMTPResponseException(454, f"Throttling: sending to {key} is paused")
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                code = retry_code(e)
+                if code is None or attempt >= self.max_retries:
+                    raise
+                delay = self.delay(attempt, throttle.failures)
+                throttle.pause(delay)
+                attempt += 1
+                last_error = e
+                metrics.inc('ses_retries_total', code=code)
+                _logger.info("[SES SEND] Temporary failure %s from %s (attempt %s), retrying in %.2fs",
+                             code, key, attempt, delay)
+                if on_retry:
+                    on_retry(e, code, delay)
+                continue
+            finally:
+                throttle.release()
+            throttle.success()
+            return result
@@ -0,0 +1,147 @@
+import random
+import threading
+import time
+from smtplib import SMTPServerDisconnected
+
+from .ses_retry import temporary_code
+
+
+class EndpointHealth:
+    """Salud de un endpoint SES: latencia y tasa de error con media móvil exponencial (EWMA)
+    y un circuit breaker que lo saca de la rotación tras ``failure_threshold`` fallos seguidos.
+
+    La tasa de error también decae con el tiempo (``error_half_life``): un endpoint que dejó de
+    recibir tráfico por sus errores vuelve a probarse aunque no haya envíos que la actualicen.
+
+    Con el circuito abierto el endpoint no recibe tráfico durante ``open_seconds`` (que se
+    duplica en cada reapertura hasta ``max_open_seconds``); después se deja pasar un único envío
+    de prueba (semiabierto) y el circuito se cierra si tiene éxito.
+    """
+
+    def __init__(self, alpha=0.2, failure_threshold=5, open_seconds=30.0, max_open_seconds=300.0,
+                 error_half_life=30.0):
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.latency = None
+        self.error_rate = 0.0
+        self.updated = time.monotonic()
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.open_until = 0.0
+        self.openings = 0
+        self.probing = False
+
+    @property
+    def is_open(self):
+        return self.open_until > 0.0
+
+    def available(self, now):
+        if not self.is_open:
+            return True
+        # Semiabierto: un solo envío de prueba a la vez
+        return now >= self.open_until and not self.probing
+
+    def current_error_rate(self, now):
+        return self.error_rate * 0.5 ** ((now - self.updated) / self.error_half_life)
+
+    def score(self, error_penalty, now):
+        """Menor es mejor: latencia esperada penalizada por la tasa de error.
+
+        Los endpoints sin medidas puntúan 0 para que reciban tráfico y se midan.
+        """
+        if self.latency is None:
+            return 0.0
+        return self.latency * (1.0 + error_penalty * self.current_error_rate(now))
+
+    def record(self, latency, ok, now):
+        self.requests += 1
+        self.probing = False
+        error_rate = self.current_error_rate(now)
+        self.error_rate = error_rate + self.alpha * ((0.0 if ok else 1.0) - error_rate)
+        self.updated = now
+        if ok:
+            self.latency = latency if self.latency is None else self.latency + self.alpha * (latency - self.latency)
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            self.openings = 0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.is_open or self.consecutive_failures >= self.failure_threshold:
+            # Abrir (o reabrir tras una prueba fallida) con espera creciente
+            self.open_until = now + min(self.max_open_seconds, self.open_seconds * (2 ** self.openings))
+            self.openings += 1
+
+    def as_dict(self):
+        return {
+            'latency': self.latency,
+            'error_rate': self.current_error_rate(time.monotonic()),
+            'consecutive_failures': self.consecutive_failures,
+            'requests': self.requests,
+            'failures': self.failures,
+            'open': self.is_open,
+        }
+
+
+class SESRouter:
+    """Reparte los envíos entre varios endpoints SES (servidores de un mismo grupo) según su salud.
+
+    ``choose(keys)`` devuelve las claves en orden de preferencia: primero la elegida por
+    "power of two choices" (de dos endpoints disponibles al azar, el de mejor puntuación: evita que
+    todos los workers se lancen a la vez sobre el mismo) y después el resto como alternativas de
+    failover, de mejor a peor. Los endpoints con el circuito abierto van al final. La salud es
+    por proceso.
+    """
+
+    def __init__(self, error_penalty=20.0, **health_options):
+        self.error_penalty = error_penalty
+        self.health_options = health_options
+        self._health = {}
+        self._lock = threading.Lock()
+
+    def health(self, key):
+        with self._lock:
+            health = self._health.get(key)
+            if health is None:
+                health = self._health[key] = EndpointHealth(**self.health_options)
+            return health
+
+    def choose(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            healths = {key: self._health.get(key) or EndpointHealth(**self.health_options) for key in keys}
+            available = [key for key in keys if healths[key].available(now)]
+            ranked = sorted(available, key=lambda key: healths[key].score(self.error_penalty, now))
+            if len(available) >= 2:
+                first, second = random.sample(available, 2)
+                chosen = min((first, second), key=lambda key: healths[key].score(self.error_penalty, now))
+                ranked.remove(chosen)
+                ranked.insert(0, chosen)
+            # Sin ninguno disponible se intenta igualmente, empezando por el que antes se reabre
+            unavailable = sorted((key for key in keys if key not in available), key=lambda key: healths[key].open_until)
+            if ranked and healths[ranked[0]].is_open:
+                healths[ranked[0]].probing = True
+            return ranked + unavailable
+
+    def record(self, key, latency, ok):
+        health = self.health(key)
+        with self._lock:
+            health.record(latency, ok, time.monotonic())
+
+    def snapshot(self):
+        with self._lock:
+            return {key: health.as_dict() for key, health in self._health.items()}
+
+
+def is_endpoint_failure(exception):
+    """True si el error es del endpoint y no del mensaje: conexión caída, timeout, error de red
+    (requests.RequestException también es OSError) o un fallo temporal 4xx que persiste tras
+    los reintentos. Los rechazos definitivos del mensaje (5xx) no cuentan contra el endpoint.
+    """
+    if isinstance(exception, (SMTPServerDisconnected, OSError)):
+        return True
+    return temporary_code(exception) is not None
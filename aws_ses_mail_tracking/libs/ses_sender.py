@@ -0,0 +1,201 @@
+import queue
+import threading
+import time
+from smtplib import SMTPServerDisconnected
+
+from .ses_retry import RetryScheduler
+
+
+class TokenBucket:
+    """Limitador de tasa de tipo token bucket, seguro entre hilos.
+
+    ``rate`` es el número de mensajes por segundo (la "maximum send rate" de la cuenta SES);
+    ``rate`` <= 0 desactiva el límite.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Detiene la emisión de tokens para todos los hilos (tras un throttling de SES)"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+            self._updated = self._paused_until
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket cuyo ritmo comparten todos los procesos que envían con la misma cuenta SES.
+
+    Los tokens se reservan por bloques de un segundo de envíos con ``reserve(count)``, que
+    devuelve los segundos que faltan para que empiece el bloque reservado: los bloques de todos
+    los procesos se encadenan en un contador común (ver aws.ses.rate.limit), así que entre todos
+    no superan ``rate``. Dentro de su bloque cada token llega a su hora (uno cada 1/``rate``
+    segundos); los que no se usan antes de que termine el bloque se pierden.
+    """
+
+    def __init__(self, rate, reserve):
+        super().__init__(rate)
+        self.reserve = reserve
+        self.block = max(1, int(rate))
+        self._next = self._block_end = 0.0
+        self._remaining = 0
+
+    def acquire(self):
+        if self.rate <= 0:
+            return super().acquire()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._remaining and now < self._block_end:
+                    wait = self._next - now
+                    if wait <= 0:
+                        self._remaining -= 1
+                        self._next += 1 / self.rate
+                        return
+                else:
+                    # Nuevo bloque; mientras se reserva, los demás hilos esperan igualmente
+                    self._next = now + max(self.reserve(self.block), 0.0)
+                    self._block_end = self._next + self.block / self.rate
+                    self._remaining = self.block
+                    continue
+            time.sleep(wait)
+
+
+class ConcurrentSender:
+    """Envía mensajes ya preparados por varias conexiones SMTP en paralelo.
+
+    Cada hilo trabajador usa en exclusiva una de las ``connections`` recibidas (no se abre
+    ninguna conexión ni se toca el ORM desde los hilos). Los envíos se regulan con un
+    TokenBucket (un SharedTokenBucket si se recibe ``reserve``, para repartir ``rate`` entre
+    procesos) y pasan por un RetryScheduler: ante un 4xx (454 de throttling incluido) se
+    reintentan por la misma conexión con espera exponencial, que detiene a todos los hilos
+    del mismo servidor (``throttle_key``), como mucho ``max_wait`` segundos por envío.
+    ``join()`` espera a que terminen todos y devuelve ``{key: respuesta | excepción}``.
+    ``take_pending()`` devuelve las claves encoladas desde la llamada anterior, para saber qué
+    envíos corresponden a cada correo.
+    """
+
+    def __init__(self, connections, rate=0, max_retries=5, backoff=1.0, scheduler=None, throttle_key=None,
+                 reserve=None, max_wait=None):
+        self.connections = list(connections)
+        self.max_wait = max_wait
+        self.bucket = SharedTokenBucket(rate, reserve) if reserve and rate > 0 else TokenBucket(rate)
+        self.scheduler = scheduler or RetryScheduler(
+            max_retries=max_retries, backoff=backoff, concurrency=len(self.connections))
+        self.throttle_key = throttle_key or ('sender', id(self))
+        self.results = {}
+        self.submitted = self.sent = self.failed = self.throttled = 0
+        self._pending = []
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._started = None
+
+    def submit(self, key, message, from_addr, to_addrs):
+        """Encola un EmailMessage para enviarlo con ``send_message`` en algún hilo trabajador"""
+        if not self._threads:
+            self._start()
+        self.submitted += 1
+        self._pending.append(key)
+        self._queue.put((key, message, from_addr, to_addrs))
+
+    def take_pending(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def join(self):
+        """Espera a que se envíe todo lo encolado y devuelve los resultados por clave"""
+        for _thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        # Si todas las conexiones se cayeron, lo que quede en la cola no se ha enviado
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._set_result(job[0], SMTPServerDisconnected("No SMTP connection left to send the message"))
+        self._threads = []
+        return self.results
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._started if self._started else 0.0
+
+    @property
+    def send_rate(self):
+        """Mensajes enviados por segundo desde el primer submit"""
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def _start(self):
+        self._started = time.monotonic()
+        for index, connection in enumerate(self.connections):
+            thread = threading.Thread(
+                target=self._worker, args=(connection,), name=f"ses-sender-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self, connection):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            key, message, from_addr, to_addrs = job
+            try:
+                self._set_result(key, self._send(connection, message, from_addr, to_addrs))
+            except SMTPServerDisconnected as e:
+                # Sin conexión este hilo ya no puede enviar: el resto sigue con la cola
+                self._set_result(key, e)
+                return
+            except Exception as e:
+                self._set_result(key, e)
+
+    def _send(self, connection, message, from_addr, to_addrs):
+        def send_message(*args):
+            self.bucket.acquire()
+            return connection.send_message(*args)
+        return self.scheduler.send(
+            self.throttle_key, send_message, message, from_addr, to_addrs, on_retry=self._on_retry,
+            max_wait=self.max_wait)
+
+    def _on_retry(self, exception, code, delay):
+        with self._lock:
+            self.throttled += 1
+        # Sin ráfaga al reanudar: el bucket también queda vacío durante la pausa
+        self.bucket.pause(delay)
+
+    def _set_result(self, key, result):
+        with self._lock:
+            self.results[key] = result
+            if isinstance(result, Exception):
+                self.failed += 1
+            else:
+                self.sent += 1
@@ -0,0 +1,43 @@
+import re
+
+
+def normalize_message_id(message_id):
+    """Devuelve la clave de correlación de un Message-ID (parte local, sin <> ni dominio).
+
+    SES envía con @<region>.amazonses.com pero los rebotes llegan con @email.amazonses.com,
+    así que solo la parte anterior a @ es estable entre envío y rebote.
+    Example: <0100019ae9321ea7-...@email.amazonses.com> -> 0100019ae9321ea7-...
+    """
+    if not message_id:
+        return False
+    return message_id.strip().strip('<>').split('@')[0].lower() or False
+
+
+# Región de AWS: us-east-1, eu-central-2, us-gov-west-1, cn-north-1, us-isob-east-1...
+_REGION = r'[a-z]{2}(?:-gov|-iso[a-z]?)?-[a-z]+-\d+'
+# Endpoints SES (SMTP y API, FIPS y VPC), p. ej.:
+#   email-smtp.eu-west-1.amazonaws.com, email-smtp-fips.us-east-1.amazonaws.com,
+#   email.us-east-1.amazonaws.com, vpce-0a1b-c2d3.email-smtp.us-east-1.vpce.amazonaws.com,
+#   email-smtp.cn-north-1.amazonaws.com.cn
+_SES_HOST_RE = re.compile(
+    r'(?:^|\.)email(?:-smtp)?(?:-fips)?\.(%s)\.(?:vpce\.)?amazonaws\.com(?:\.cn)?$' % _REGION)
+_REGION_LABEL_RE = re.compile(r'^%s$' % _REGION)
+
+
+def parse_ses_region(host):
+    """Región de un endpoint SES a partir de su nombre de host, o False si no es de SES.
+
+    Si el nombre no sigue ninguno de los formatos conocidos pero es de amazonaws.com, se usa
+    la primera etiqueta con forma de región.
+    """
+    if not host:
+        return False
+    host = host.strip().lower().rstrip('.')
+    match = _SES_HOST_RE.search(host)
+    if match:
+        return match.group(1)
+    if '.amazonaws.com' in host:
+        for label in host.split('.'):
+            if _REGION_LABEL_RE.match(label):
+                return label
+    return False
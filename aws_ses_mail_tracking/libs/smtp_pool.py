@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+from collections import deque
+from smtplib import SMTPException
+
+_logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Pool de conexiones SMTP ya autenticadas, agrupadas por clave (normalmente un ir.mail_server).
+
+    Las conexiones se devuelven al pool con ``quit()`` (ver ``SMTPInherit.quit``) y se
+    reutilizan entre llamadas a send_email y entre lotes del cron mientras sigan sanas:
+    - se descartan si llevan más de ``max_idle`` segundos sin usarse,
+    - se comprueban con NOOP si llevan más de ``noop_interval`` segundos sin usarse,
+    - se cierran al alcanzar ``max_messages`` mensajes enviados.
+    El pool es por proceso: cada worker de Odoo mantiene sus propias conexiones.
+    """
+
+    def __init__(self, max_size=4, max_idle=60, max_messages=100, noop_interval=15):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.noop_interval = noop_interval
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_size=None, max_idle=None, max_messages=None, noop_interval=None):
+        if max_size is not None:
+            self.max_size = max_size
+        if max_idle is not None:
+            self.max_idle = max_idle
+        if max_messages is not None:
+            self.max_messages = max_messages
+        if noop_interval is not None:
+            self.noop_interval = noop_interval
+
+    def acquire(self, key):
+        """Devuelve una conexión sana del pool para ``key`` o None si hay que abrir una nueva"""
+        self._evict_idle()
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                # LIFO: la conexión usada más recientemente es la que menos probablemente haya caducado
+                connection = idle.pop() if idle else None
+            if connection is None:
+                return None
+            if time.monotonic() - connection.pool_last_used > self.noop_interval and not self._is_alive(connection):
+                _logger.info("[SES POOL] Discarding dead SMTP connection for %s", key)
+                self._discard(connection)
+                continue
+            connection.pool = self
+            return connection
+
+    def attach(self, connection, key):
+        """Asocia una conexión recién abierta al pool: su ``quit()`` la devolverá al pool"""
+        connection.pool = self
+        connection.pool_key = key
+        connection.pool_last_used = time.monotonic()
+
+    def release(self, connection):
+        """Devuelve una conexión al pool, o la cierra si ya no es reutilizable"""
+        connection.pool = None
+        if self.max_size <= 0 or connection.sock is None or connection.messages_sent >= self.max_messages:
+            self._discard(connection)
+            return
+        connection.pool_last_used = time.monotonic()
+        overflow = None
+        with self._lock:
+            idle = self._idle.setdefault(connection.pool_key, deque())
+            idle.append(connection)
+            if len(idle) > self.max_size:
+                overflow = idle.popleft()
+        if overflow is not None:
+            self._discard(overflow)
+
+    def clear(self, key=None):
+        """Cierra las conexiones inactivas de ``key`` (o de todas las claves)"""
+        with self._lock:
+            if key is None:
+                connections = [conn for idle in self._idle.values() for conn in idle]
+                self._idle.clear()
+            else:
+                connections = list(self._idle.pop(key, ()))
+        for connection in connections:
+            self._discard(connection)
+
+    def _evict_idle(self):
+        limit = time.monotonic() - self.max_idle
+        expired = []
+        with self._lock:
+            for idle in self._idle.values():
+                # Las más antiguas están a la izquierda
+                while idle and idle[0].pool_last_used < limit:
+                    expired.append(idle.popleft())
+        for connection in expired:
+            self._discard(connection)
+
+    @staticmethod
+    def _is_alive(connection):
+        try:
+            return connection.noop()[0] == 250
+        except (SMTPException, OSError):
+            return False
+
+    @staticmethod
+    def _discard(connection):
+        connection.pool = None
+        try:
+            connection.quit()
+        except (SMTPException, OSError):
+            connection.close()
@@ -1,6 +1,101 @@
+import copy
 import re
+import ssl
+import tempfile
+import threading
+from email.generator import BytesGenerator, fcre
 
-from smtplib import SMTP, CRLF, SMTPSenderRefused, SMTPRecipientsRefused, SMTPDataError
+from smtplib import (
+    SMTP, CRLF, SMTPSenderRefused, SMTPRecipientsRefused, SMTPDataError, SMTPNotSupportedError,
+    SMTPResponseException, SMTPServerDisconnected, quoteaddr,
+)
+
+from .metrics import metrics
+
+# Por encima de este tamaño el mensaje serializado se vuelca a un fichero temporal
+SPOOL_MAX_SIZE = 1024 * 1024
+# Tamaño de los bloques escritos en el socket durante DATA
+DATA_CHUNK_SIZE = 64 * 1024
+bCRLF = b'\r\n'
+_NLCRE = re.compile(r'\r\n|\r|\n')
+
+# Sesiones TLS por (host, puerto, contexto) para reanudarlas en la siguiente conexión
+_tls_sessions = {}
+_default_ssl_context = None
+_default_ssl_context_lock = threading.Lock()
+
+
+def _get_default_ssl_context():
+    """Contexto SSL que usaría smtplib.starttls() sin contexto, creado una sola vez por proceso"""
+    global _default_ssl_context
+    if _default_ssl_context is None:
+        with _default_ssl_context_lock:
+            if _default_ssl_context is None:
+                _default_ssl_context = ssl._create_stdlib_context()
+    return _default_ssl_context
+
+
+class _StreamingBytesGenerator(BytesGenerator):
+    """BytesGenerator que escribe cada parte directamente en el fichero de salida.
+
+    El generador estándar genera cada parte (y cada subparte) en un buffer intermedio antes
+    de copiarla a la salida, de modo que un adjunto grande llega a existir varias veces en
+    memoria. Aquí solo se usa ese camino para las partes que lo necesitan (texto no ASCII,
+    cuya cabecera Content-Transfer-Encoding puede cambiar al serializarlo).
+    """
+
+    def _write(self, msg):
+        if msg.get_content_maintype() == 'multipart' and isinstance(msg.get_payload(), list):
+            if not msg.get_boundary():
+                msg.set_boundary(self._make_boundary())
+        elif not (isinstance(msg._payload, str) and msg._payload.isascii()):
+            return super()._write(msg)
+        meth = getattr(msg, '_write_headers', None)
+        if meth is None:
+            self._write_headers(msg)
+        else:
+            meth(self)
+        self._dispatch(msg)
+
+    def _handle_text(self, msg):
+        # Un payload ASCII no necesita la comprobación de surrogates (que codifica una copia completa)
+        payload = msg._payload
+        if not (isinstance(payload, str) and payload.isascii()):
+            return super()._handle_text(msg)
+        if self._mangle_from_:
+            payload = fcre.sub('>From ', payload)
+        self._write_lines(payload)
+
+    _writeBody = _handle_text
+
+    def _write_lines(self, lines):
+        # Normaliza los saltos de línea por bloques en vez de partir todo el texto en líneas
+        if len(lines) <= DATA_CHUNK_SIZE:
+            return super()._write_lines(lines)
+        position = 0
+        while position < len(lines):
+            end = lines.find('\n', position + DATA_CHUNK_SIZE)
+            end = len(lines) if end == -1 else end + 1
+            self.write(_NLCRE.sub(self._NL, lines[position:end]))
+            position = end
+
+    def _handle_multipart(self, msg):
+        # Un payload str (multipart mal formado) o sin boundary lo resuelve el generador base
+        boundary = msg.get_boundary()
+        if not isinstance(msg.get_payload(), list) or boundary is None:
+            return super()._handle_multipart(msg)
+        if msg.preamble is not None:
+            self._write_lines(msg.preamble)
+            self.write(self._NL)
+        self.write('--' + boundary + self._NL)
+        for index, part in enumerate(msg.get_payload()):
+            if index:
+                self.write(self._NL + '--' + boundary + self._NL)
+            self.clone(self._fp).flatten(part, unixfrom=False, linesep=self._NL)
+        self.write(self._NL + '--' + boundary + '--' + self._NL)
+        if msg.epilogue is not None:
+            self.write(self._NL)
+            self._write_lines(msg.epilogue)
 
 
 def _fix_eols(data):
@@ -9,6 +104,85 @@ def _fix_eols(data):
 
 class SMTPInherit(SMTP):
 
+    # Estado del pool de conexiones (ver libs/smtp_pool.py)
+    pool = None
+    pool_key = None
+    pool_last_used = 0.0
+    messages_sent = 0
+
+    def quit(self):
+        # Una conexión del pool no se cierra: vuelve al pool para reutilizarse
+        if self.pool is not None:
+            return self.pool.release(self)
+        return super().quit()
+
+    def starttls(self, context=None):
+        """Como SMTP.starttls, reutilizando el contexto SSL por defecto y reanudando la sesión TLS
+        anterior con el mismo servidor (evita el handshake completo en conexiones repetidas)"""
+        if context is None:
+            context = _get_default_ssl_context()
+        if not isinstance(context, ssl.SSLContext):
+            return super().starttls(context=context)
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn("starttls"):
+            raise SMTPNotSupportedError("STARTTLS extension not supported by server.")
+        (resp, reply) = self.docmd("STARTTLS")
+        if resp != 220:
+            raise SMTPResponseException(resp, reply)
+        self._tls_session_key = (self._host, self.sock.getpeername()[1], id(context))
+        try:
+            self.sock = context.wrap_socket(
+                self.sock, server_hostname=self._host, session=_tls_sessions.get(self._tls_session_key))
+        except ValueError:
+            # Sesión no compatible con el contexto: handshake completo
+            self.sock = context.wrap_socket(self.sock, server_hostname=self._host)
+        self._save_tls_session()
+        # RFC 3207: olvidar todo lo aprendido del servidor antes de TLS
+        self.file = None
+        self.helo_resp = None
+        self.ehlo_resp = None
+        self.esmtp_features = {}
+        self.does_esmtp = False
+        return (resp, reply)
+
+    def close(self):
+        self._save_tls_session()
+        super().close()
+
+    def _save_tls_session(self):
+        # Con TLS 1.3 el ticket de sesión llega después del handshake: se guarda también al cerrar
+        key = getattr(self, '_tls_session_key', None)
+        session = getattr(self.sock, 'session', None) if key else None
+        if session is not None:
+            _tls_sessions[key] = session
+
+    def send_message(self, msg, from_addr=None, to_addrs=None, mail_options=(), rcpt_options=()):
+        """Como SMTP.send_message, pero serializa el mensaje una sola vez (bytes con CRLF) en un
+        fichero temporal que se vuelca a disco si es grande, y lo transmite por bloques en DATA"""
+        if from_addr is None or to_addrs is None or msg.get_all('Resent-Date'):
+            return super().send_message(msg, from_addr, to_addrs, mail_options, rcpt_options)
+        self.ehlo_or_helo_if_needed()
+        # Copia superficial para no enviar las cabeceras Bcc (igual que smtplib)
+        msg_copy = copy.copy(msg)
+        del msg_copy['Bcc']
+        del msg_copy['Resent-Bcc']
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+        policy = None
+        try:
+            ''.join([from_addr, *to_addrs]).encode('ascii')
+        except UnicodeEncodeError:
+            if not self.has_extn('smtputf8'):
+                raise SMTPNotSupportedError("One or more source or delivery addresses require"
+                                            " internationalized email support, but the server"
+                                            " does not advertise the required SMTPUTF8 capability")
+            policy = msg.policy.clone(utf8=True)
+            mail_options = (*mail_options, 'SMTPUTF8', 'BODY=8BITMIME')
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+            _StreamingBytesGenerator(spool, policy=policy).flatten(msg_copy, linesep='\r\n')
+            spool.seek(0)
+            return self.sendmail(from_addr, to_addrs, spool, mail_options, rcpt_options)
+
     def sendmail(self, from_addr, to_addrs, msg, mail_options=(),rcpt_options=()):
         self.ehlo_or_helo_if_needed()
         esmtp_opts = []
@@ -16,31 +190,44 @@ class SMTPInherit(SMTP):
             msg = _fix_eols(msg).encode('ascii')
         if self.does_esmtp:
             if self.has_extn('size'):
-                esmtp_opts.append("size=%d" % len(msg))
+                esmtp_opts.append("size=%d" % _message_size(msg))
             for option in mail_options:
                 esmtp_opts.append(option)
-        (code, resp) = self.mail(from_addr, esmtp_opts)
-        if code != 250:
-            if code == 421:
-                self.close()
-            else:
-                self._rset()
-            raise SMTPSenderRefused(code, resp, from_addr)
-        senderrs = {}
         if isinstance(to_addrs, str):
             to_addrs = [to_addrs]
-        for each in to_addrs:
-            (code, resp) = self.rcpt(each, rcpt_options)
-            if (code != 250) and (code != 251):
-                senderrs[each] = (code, resp)
-            if code == 421:
-                self.close()
-                raise SMTPRecipientsRefused(senderrs)
+        if self.does_esmtp and self.has_extn('pipelining'):
+            with metrics.timer('ses_phase_seconds', phase='envelope'):
+                senderrs = self._pipeline_envelope(from_addr, to_addrs, esmtp_opts, rcpt_options)
+        else:
+            with metrics.timer('ses_phase_seconds', phase='mail'):
+                (code, resp) = self.mail(from_addr, esmtp_opts)
+            metrics.inc('ses_replies_total', command='mail', code=code)
+            if code != 250:
+                if code == 421:
+                    self.close()
+                else:
+                    self._rset()
+                raise SMTPSenderRefused(code, resp, from_addr)
+            senderrs = {}
+            with metrics.timer('ses_phase_seconds', phase='rcpt'):
+                for each in to_addrs:
+                    (code, resp) = self.rcpt(each, rcpt_options)
+                    metrics.inc('ses_replies_total', command='rcpt', code=code)
+                    if (code != 250) and (code != 251):
+                        senderrs[each] = (code, resp)
+                    if code == 421:
+                        self.close()
+                        raise SMTPRecipientsRefused(senderrs)
         if len(senderrs) == len(to_addrs):
             # el servidor rechazó todos nuestros destinatarios
             self._rset()
             raise SMTPRecipientsRefused(senderrs)
-        (code, resp) = self.data(msg)
+        with metrics.timer('ses_phase_seconds', phase='data'):
+            if isinstance(msg, bytes):
+                (code, resp) = self.data(msg)
+            else:
+                (code, resp) = self._data_stream(msg)
+        metrics.inc('ses_replies_total', command='data', code=code)
         if code != 250:
             if code == 421:
                 self.close()
@@ -48,5 +235,104 @@ class SMTPInherit(SMTP):
                 self._rset()
             raise SMTPDataError(code, resp)
         # si llegamos aquí, entonces alguien recibió nuestro correo
+        self.messages_sent += 1
+        if metrics.enabled:
+            metrics.inc('ses_messages_total', transport='smtp')
+            metrics.inc('ses_message_bytes_total', _message_size_sent(msg), transport='smtp')
 
         return resp
+
+    def _pipeline_envelope(self, from_addr, to_addrs, mail_options, rcpt_options):
+        """Envía MAIL FROM y todos los RCPT TO en una sola escritura (RFC 2920) y lee luego las respuestas.
+
+        Devuelve los destinatarios rechazados y lanza las mismas excepciones que el envío
+        comando a comando. Todas las respuestas se leen antes de actuar sobre un error para
+        no desincronizar la conexión.
+        """
+        mail_optionlist = ''
+        if mail_options:
+            if any(option.lower() == 'smtputf8' for option in mail_options):
+                if not self.has_extn('smtputf8'):
+                    raise SMTPNotSupportedError('SMTPUTF8 not supported by server')
+                self.command_encoding = 'utf-8'
+            mail_optionlist = ' ' + ' '.join(mail_options)
+        rcpt_optionlist = ' ' + ' '.join(rcpt_options) if rcpt_options else ''
+
+        commands = ["mail FROM:%s%s" % (quoteaddr(from_addr), mail_optionlist)]
+        commands += ["rcpt TO:%s%s" % (quoteaddr(each), rcpt_optionlist) for each in to_addrs]
+        for command in commands:
+            if '\r' in command or '\n' in command:
+                raise ValueError('command and arguments contain prohibited newline characters')
+        self.send(CRLF.join(commands) + CRLF)
+
+        (mail_code, mail_resp) = self.getreply()
+        metrics.inc('ses_replies_total', command='mail', code=mail_code)
+        senderrs = {}
+        for each in to_addrs:
+            try:
+                (code, resp) = self.getreply()
+            except SMTPServerDisconnected:
+                # El servidor cerró tras un 421: no llegarán más respuestas
+                if mail_code == 421:
+                    break
+                raise
+            metrics.inc('ses_replies_total', command='rcpt', code=code)
+            if (code != 250) and (code != 251):
+                senderrs[each] = (code, resp)
+            if code == 421:
+                break
+
+        if mail_code != 250:
+            if mail_code == 421:
+                self.close()
+            else:
+                self._rset()
+            raise SMTPSenderRefused(mail_code, mail_resp, from_addr)
+        if any(code == 421 for code, _resp in senderrs.values()):
+            self.close()
+            raise SMTPRecipientsRefused(senderrs)
+        return senderrs
+
+    def _data_stream(self, fp):
+        """Comando DATA leyendo el mensaje (bytes con CRLF) de un fichero, por bloques.
+
+        Aplica el escapado de puntos por líneas sin construir una copia completa del mensaje.
+        """
+        self.putcmd("data")
+        (code, repl) = self.getreply()
+        if code != 354:
+            raise SMTPDataError(code, repl)
+        chunk = []
+        chunk_size = 0
+        line = bCRLF
+        for line in fp:
+            if line.startswith(b'.'):
+                line = b'.' + line
+            chunk.append(line)
+            chunk_size += len(line)
+            if chunk_size >= DATA_CHUNK_SIZE:
+                self.send(b''.join(chunk))
+                chunk = []
+                chunk_size = 0
+        if not line.endswith(bCRLF):
+            chunk.append(bCRLF)
+        chunk.append(b'.' + bCRLF)
+        self.send(b''.join(chunk))
+        return self.getreply()
+
+
+def _message_size(msg):
+    """Tamaño en bytes del mensaje (bytes o fichero) sin copiarlo"""
+    if isinstance(msg, bytes):
+        return len(msg)
+    position = msg.tell()
+    size = msg.seek(0, 2) - position
+    msg.seek(position)
+    return size
+
+
+def _message_size_sent(msg):
+    """Tamaño en bytes de un mensaje ya enviado (bytes o fichero leído hasta el final)"""
+    if isinstance(msg, bytes):
+        return len(msg)
+    return msg.tell()
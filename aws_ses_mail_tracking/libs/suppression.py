@@ -0,0 +1,65 @@
+import hashlib
+import threading
+from array import array
+from bisect import bisect_left
+
+
+def email_hash(email):
+    """Hash de 64 bits (con signo, como array('q')) de una dirección normalizada"""
+    digest = hashlib.blake2b(email.strip().lower().encode('utf-8', 'surrogateescape'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class SuppressionIndex:
+    """Conjunto compacto de direcciones suprimidas (rebote permanente o queja).
+
+    Las direcciones se guardan como hashes de 64 bits en un array ordenado (8 bytes por
+    dirección, búsqueda binaria) más un set con las añadidas desde la última fusión, de modo
+    que las recargas incrementales no reconstruyen el array. Con 64 bits la probabilidad de
+    colisión es despreciable incluso con decenas de millones de direcciones.
+    El índice es por proceso: cada worker de Odoo mantiene el suyo.
+    """
+
+    def __init__(self, merge_threshold=10000):
+        self.merge_threshold = merge_threshold
+        self._sorted = array('q')
+        self._recent = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sorted) + len(self._recent)
+
+    def __contains__(self, email):
+        return self._contains_hash(email_hash(email))
+
+    def _contains_hash(self, value):
+        if value in self._recent:
+            return True
+        values = self._sorted
+        position = bisect_left(values, value)
+        return position < len(values) and values[position] == value
+
+    def suppressed(self, emails):
+        """Subconjunto de ``emails`` que está suprimido"""
+        return {email for email in emails if email in self}
+
+    def load(self, emails):
+        """Sustituye el contenido del índice (recarga completa)"""
+        values = array('q', sorted({email_hash(email) for email in emails}))
+        with self._lock:
+            self._sorted = values
+            self._recent = set()
+
+    def add(self, emails):
+        """Añade direcciones (recarga incremental); fusiona en el array al superar el umbral"""
+        values = {email_hash(email) for email in emails}
+        with self._lock:
+            self._recent |= {value for value in values if not self._contains_hash(value)}
+            if len(self._recent) >= max(self.merge_threshold, len(self._sorted) // 10):
+                self._merge()
+
+    def _merge(self):
+        merged = array('q', sorted(set(self._sorted) | self._recent))
+        # Reasignación atómica: las búsquedas concurrentes ven el array anterior o el nuevo
+        self._sorted = merged
+        self._recent = set()
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TraceCache:
+    """Caché LRU con caducidad: clave SES (SES Message-ID normalizado) -> (ids de mailing.trace, Message-ID de Odoo).
+
+    Se llena al guardar los SES Message-IDs de los envíos y la consultan primero las
+    correlaciones de rebotes, quejas y respuestas, que llegan en ráfagas para los mismos
+    envíos recientes. Como mucho ``max_size`` claves, cada una válida ``ttl`` segundos.
+    La caché es por proceso: cada worker de Odoo mantiene la suya.
+    """
+
+    def __init__(self, max_size=50000, ttl=86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()
+        # id de rastro -> clave SES, para invalidar por rastro
+        self._keys_by_trace = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def configure(self, max_size, ttl):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self._evict()
+
+    def get_many(self, keys):
+        """{clave: (ids, message_id)} de las claves presentes y no caducadas"""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[2] <= now:
+                    self._remove(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[:2]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Guarda pares (clave, (ids, message_id)); una clave ya presente se reemplaza"""
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, (trace_ids, message_id) in items:
+                if key in self._entries:
+                    self._remove(key)
+                trace_ids = tuple(trace_ids)
+                self._entries[key] = (trace_ids, message_id, expires)
+                for trace_id in trace_ids:
+                    self._keys_by_trace[trace_id] = key
+            self._evict()
+
+    def discard_traces(self, trace_ids):
+        """Olvida las claves de estos rastros"""
+        with self._lock:
+            for trace_id in trace_ids:
+                key = self._keys_by_trace.get(trace_id)
+                if key is not None:
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_trace.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _remove(self, key):
+        trace_ids = self._entries.pop(key)[0]
+        for trace_id in trace_ids:
+            if self._keys_by_trace.get(trace_id) == key:
+                del self._keys_by_trace[trace_id]
+
+    def _evict(self):
+        while len(self._entries) > max(self.max_size, 0):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Filas por lote: cada lote se confirma por separado para no mantener
+# bloqueos de fila sobre mailing_trace durante toda la migración
+BATCH_SIZE = 50000
+
+
+def migrate(cr, version):
+    """Rellena ses_message_key a partir de ses_message_id en lotes por rango de id"""
+    if not version:
+        return
+
+    cr.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM mailing_trace")
+    min_id, max_id = cr.fetchone()
+    updated = 0
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        cr.execute("""
+            UPDATE mailing_trace
+               SET ses_message_key = lower(split_part(btrim(ses_message_id, '<> '), '@', 1))
+             WHERE id >= %s AND id < %s
+               AND ses_message_id IS NOT NULL
+               AND ses_message_key IS NULL
+        """, (start, start + BATCH_SIZE))
+        updated += cr.rowcount
+        cr.commit()
+        _logger.info("[SES MIGRATION] ses_message_key backfill: ids %s-%s done (%s rows updated)",
+                     start, min(start + BATCH_SIZE - 1, max_id), updated)
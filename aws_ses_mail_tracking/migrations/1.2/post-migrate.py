@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import logging
+
+from odoo import tools
+from odoo.addons.aws_ses_mail_tracking.libs.bounce_report import PERMANENT_STATUSES
+
+_logger = logging.getLogger(__name__)
+
+# Filas por lote: cada lote se confirma por separado para no mantener
+# bloqueos de fila sobre mailing_trace durante toda la migración
+BATCH_SIZE = 50000
+
+
+def migrate(cr, version):
+    """Clasifica los rebotes/quejas existentes a partir del texto 'SES Report: ...' de failure_reason,
+    calcula los contadores por campaña y suprime las direcciones que ya rebotaron o se quejaron.
+
+    Odoo guarda failure_reason con html2plaintext del cuerpo del rebote, así que el informe llega
+    como ``*SES Report: Hard Bounce (Code: 5.1.1)*``: los patrones no se anclan al principio.
+    """
+    if not version:
+        return
+
+    cr.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM mailing_trace")
+    min_id, max_id = cr.fetchone()
+    updated = 0
+    for start in range(min_id, max_id + 1, BATCH_SIZE):
+        cr.execute(r"""
+            UPDATE mailing_trace
+               SET ses_bounce_class = CASE
+                       WHEN failure_reason LIKE '%%SES Report: Complaint%%' THEN 'complaint'
+                       WHEN failure_reason LIKE '%%SES Report: Hard Bounce%%'
+                         OR failure_reason LIKE '%%SES Report: Bounce (Permanent)%%' THEN 'hard'
+                       ELSE 'soft'
+                   END,
+                   ses_status_code = substring(failure_reason from '(?:Hard|Soft) Bounce \(Code: ([0-9.]+)\)'),
+                   ses_feedback_type = lower(substring(failure_reason from 'SES Report: Complaint: ([\w-]+)'))
+             WHERE id >= %s AND id < %s
+               AND ses_bounce_class IS NULL
+               AND (failure_reason LIKE '%%SES Report: Complaint%%'
+                    OR failure_reason LIKE '%%SES Report: Hard Bounce%%'
+                    OR failure_reason LIKE '%%SES Report: Soft Bounce%%'
+                    OR failure_reason LIKE '%%SES Report: Bounce (Permanent)%%'
+                    OR failure_reason LIKE '%%SES Report: Bounce (Transient)%%')
+        """, (start, start + BATCH_SIZE))
+        updated += cr.rowcount
+        cr.commit()
+        _logger.info("[SES MIGRATION] bounce classification backfill: ids %s-%s done (%s rows updated)",
+                     start, min(start + BATCH_SIZE - 1, max_id), updated)
+
+    cr.execute("""
+        UPDATE mailing_mailing AS mailing
+           SET ses_hard_bounce_count = counts.hard,
+               ses_soft_bounce_count = counts.soft,
+               ses_complaint_count = counts.complaint
+          FROM (SELECT mass_mailing_id,
+                       count(*) FILTER (WHERE ses_bounce_class = 'hard') AS hard,
+                       count(*) FILTER (WHERE ses_bounce_class = 'soft') AS soft,
+                       count(*) FILTER (WHERE ses_bounce_class = 'complaint') AS complaint
+                  FROM mailing_trace
+                 WHERE ses_bounce_class IS NOT NULL AND mass_mailing_id IS NOT NULL
+                 GROUP BY mass_mailing_id) AS counts
+         WHERE mailing.id = counts.mass_mailing_id
+    """)
+    _logger.info("[SES MIGRATION] SES counters computed for %s mailings", cr.rowcount)
+
+    _seed_suppression(cr)
+
+
+def _seed_suppression(cr):
+    """Lista de supresión a partir de los rastros ya clasificados: quejas y rebotes permanentes de la
+    dirección, con la misma regla que los nuevos (bounce_report.is_permanent_failure o, sin código
+    de estado, el tipo de rebote Permanent de SES)."""
+    cr.execute("""
+        SELECT DISTINCT email, ses_bounce_class
+          FROM mailing_trace
+         WHERE email IS NOT NULL
+           AND (ses_bounce_class = 'complaint'
+                OR (ses_bounce_class = 'hard' AND ses_status_code IN %s)
+                OR (ses_bounce_class = 'hard' AND ses_status_code IS NULL
+                    AND failure_reason LIKE '%%SES Report: Bounce (Permanent)%%'))
+    """, (tuple(sorted(PERMANENT_STATUSES)),))
+    reasons = {}
+    for email, bounce_class in cr.fetchall():
+        email = tools.email_normalize(email)
+        # Una queja prevalece sobre un rebote de la misma dirección
+        if email and reasons.get(email) != 'complaint':
+            reasons[email] = bounce_class
+    rows = sorted(reasons.items())
+    inserted = 0
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        cr.execute("""
+            INSERT INTO aws_ses_suppression (email, reason, create_date) VALUES %s
+            ON CONFLICT (email) DO NOTHING
+        """ % ", ".join(["(%s, %s, now() at time zone 'UTC')"] * len(batch)),
+            [value for row in batch for value in row])
+        inserted += cr.rowcount
+        cr.commit()
+    _logger.info("[SES MIGRATION] %s addresses added to the SES suppression list", inserted)
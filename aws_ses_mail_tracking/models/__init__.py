@@ -1,3 +1,13 @@
 from . import mail_thread
 from . import ir_mail_server
 from . import mailing_trace
+from . import mailing_mailing
+from . import mail_mail
+from . import aws_ses_pending_message
+from . import aws_ses_event
+from . import aws_ses_suppression
+from . import aws_ses_event_fingerprint
+from . import aws_ses_rate_limit
+from . import aws_ses_metric
+from . import aws_ses_trace_deletion
+from . import ir_cron
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import time
+from collections import defaultdict
+
+from odoo import api, fields, models, tools
+from odoo.addons.aws_ses_mail_tracking.libs.bounce_report import bounce_class, is_permanent_failure
+from odoo.addons.aws_ses_mail_tracking.libs.event_dedup import event_fingerprint
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import metrics
+from odoo.addons.aws_ses_mail_tracking.libs.ses_events import parse_ses_event_line
+
+_logger = logging.getLogger(__name__)
+
+
+class AwsSesEvent(models.Model):
+    _name = 'aws.ses.event'
+    _description = 'Evento SES pendiente de aplicar a mailing.trace'
+    _order = 'id'
+    _log_access = False
+
+    ses_message_key = fields.Char("SES Message Key", required=True)
+    event_type = fields.Selection([
+        ('bounce', 'Bounce'),
+        ('complaint', 'Complaint'),
+        ('open', 'Open'),
+        ('click', 'Click'),
+        ('reject', 'Reject'),
+    ], string="Event Type", required=True)
+    event_date = fields.Datetime("Event Date")
+    recipient = fields.Char("Recipient")
+    bounce_type = fields.Char("Bounce Type")
+    status_code = fields.Char("Status Code")
+    diagnostic_code = fields.Char("Diagnostic Code")
+    feedback_type = fields.Char("Feedback Type")
+
+    @api.model
+    def _enqueue(self, events):
+        """Encola eventos ya normalizados (ver libs/ses_events.parse_ses_event)"""
+        if events:
+            self.create(events)
+
+    @api.model
+    def _cron_process_events(self, batch_size=5000, auto_commit=True):
+        """Aplica los eventos encolados a mailing.trace por lotes y los elimina de la cola"""
+        while True:
+            events = self.search([], limit=batch_size)
+            if not events:
+                return
+            events._apply_to_traces(events.read(list(self._get_event_fields())))
+            events.unlink()
+            if auto_commit:
+                self.env.cr.commit()
+            if len(events) < batch_size:
+                return
+
+    @api.model
+    def _import_event_file(self, path, offset=0, batch_size=10000, auto_commit=True):
+        """Importa un fichero JSON-lines de eventos SES exportados (Firehose/S3) sin pasar por la cola.
+
+        Lee el fichero por lotes de ``batch_size`` líneas (memoria acotada) empezando en el byte
+        ``offset``, aplica cada lote con _apply_to_traces y confirma la transacción. El offset
+        registrado tras cada lote permite reanudar una importación interrumpida; reaplicar un lote
+        ya importado no cambia el resultado.
+        """
+        started = time.monotonic()
+        rows = skipped = 0
+        with open(path, 'rb') as event_file:
+            event_file.seek(offset)
+            while True:
+                events = []
+                lines = 0
+                for line in iter(event_file.readline, b''):
+                    lines += 1
+                    try:
+                        events.extend(parse_ses_event_line(line))
+                    except ValueError:
+                        skipped += 1
+                    if lines >= batch_size:
+                        break
+                if not lines:
+                    break
+                if events:
+                    self._apply_to_traces(events, cache_traces=False)
+                if auto_commit:
+                    self.env.cr.commit()
+                offset = event_file.tell()
+                rows += lines
+                elapsed = time.monotonic() - started
+                _logger.info("[SES IMPORT] %s: offset %s, %s rows (%s skipped), %.0f rows/s",
+                             path, offset, rows, skipped, rows / elapsed if elapsed else 0)
+        elapsed = time.monotonic() - started
+        return {
+            'offset': offset,
+            'rows': rows,
+            'skipped': skipped,
+            'seconds': elapsed,
+            'rows_per_second': rows / elapsed if elapsed else 0.0,
+        }
+
+    @api.model
+    def _get_event_fields(self):
+        return ('ses_message_key', 'event_type', 'event_date', 'recipient', 'bounce_type',
+                'status_code', 'diagnostic_code', 'feedback_type')
+
+    @api.model
+    def _apply_to_traces(self, events, cache_traces=True):
+        """Aplica una lista de eventos (dicts) a mailing.trace.
+
+        Como mucho una consulta para resolver los SES Message-IDs (los recientes están en la caché
+        de correlación) y una escritura por tipo de transición (y por motivo de rebote). Las
+        aperturas y clics guardan la fecha del evento (la primera apertura y el último clic), no la
+        de su procesamiento. Las transiciones son idempotentes, así que aplicar dos veces el mismo
+        evento no cambia el resultado. Con ``cache_traces=False`` los rastros buscados no se añaden
+        a la caché de correlación.
+        """
+        events = self._filter_repeated_events(events)
+        Trace = self.env['mailing.trace'].sudo()
+        refs = Trace._get_ses_trace_refs([event['ses_message_key'] for event in events], cache_misses=cache_traces)
+        traces_by_key = {ses_key: Trace.browse(trace_ids) for ses_key, (trace_ids, __) in refs.items()}
+        traces = Trace.browse(Trace._get_ses_trace_ids(refs))
+
+        bounced = defaultdict(lambda: Trace)
+        classified = defaultdict(lambda: Trace)
+        opened = clicked = rejected = Trace
+        open_dates = {}
+        click_dates = {}
+        for event in events:
+            event_traces = traces_by_key.get(event['ses_message_key'])
+            if not event_traces:
+                continue
+            if event['event_type'] in ('bounce', 'complaint'):
+                bounced[self._get_failure_reason(event)] |= event_traces
+                # Clasificación y supresión: solo el rastro del destinatario del evento
+                recipient = tools.email_normalize(event['recipient'] or '')
+                classified[self._get_bounce_info(event)] |= event_traces.filtered(
+                    lambda trace: recipient and tools.email_normalize(trace.email or '') == recipient)
+            elif event['event_type'] == 'open':
+                opened |= event_traces
+                self._merge_event_date(open_dates, event_traces, event['event_date'], min)
+            elif event['event_type'] == 'click':
+                # Un clic implica una apertura
+                clicked |= event_traces
+                opened |= event_traces
+                self._merge_event_date(open_dates, event_traces, event['event_date'], min)
+                self._merge_event_date(click_dates, event_traces, event['event_date'], max)
+            elif event['event_type'] == 'reject':
+                rejected |= event_traces
+
+        for reason, bounced_traces in bounced.items():
+            bounced_traces.set_bounced(bounce_message=reason)
+        for (event_class, status_code, feedback_type, suppress), class_traces in classified.items():
+            class_traces._set_ses_bounce_info(
+                event_class, status_code=status_code, feedback_type=feedback_type, suppress=suppress)
+        opened.set_opened()
+        clicked.set_clicked()
+        Trace._set_ses_event_dates(open_dates, click_dates)
+        rejected.set_failed(failure_type='unknown')
+        _logger.info("[SES EVENTS] Applied %s events to %s mailing.trace records", len(events), len(traces))
+        return traces
+
+    @api.model
+    def _merge_event_date(self, dates, traces, event_date, pick):
+        # {id de rastro: fecha} quedándose con la primera (min) o la última (max) de cada rastro
+        if not event_date:
+            return
+        for trace_id in traces.ids:
+            dates[trace_id] = pick(dates[trace_id], event_date) if trace_id in dates else event_date
+
+    @api.model
+    def _filter_repeated_events(self, events):
+        """Quita los rebotes y quejas ya procesados (misma clave SES, clase, destinatario y código
+        de estado), también los repetidos dentro de la propia lista"""
+        fingerprints = {}
+        for index, event in enumerate(events):
+            if event['event_type'] in ('bounce', 'complaint'):
+                event_class = self._get_bounce_info(event)[0] or event['event_type']
+                fingerprints.setdefault(event_fingerprint(
+                    event['ses_message_key'], event_class, event['recipient'], event['status_code']), index)
+        if not fingerprints:
+            return events
+        new = self.env['aws.ses.event.fingerprint'].sudo()._filter_new(fingerprints)
+        keep = {index for fingerprint, index in fingerprints.items() if fingerprint in new}
+        filtered = [
+            event for index, event in enumerate(events)
+            if event['event_type'] not in ('bounce', 'complaint') or index in keep
+        ]
+        if len(filtered) < len(events):
+            metrics.inc('ses_duplicate_events_total', len(events) - len(filtered), source='sns')
+            _logger.info("[SES EVENTS] Skipping %s repeated bounce/complaint events", len(events) - len(filtered))
+        return filtered
+
+    @api.model
+    def _get_bounce_info(self, event):
+        """(clase, código de estado, tipo de queja, suprimir) de un evento de rebote o queja.
+
+        Se suprimen las quejas y los rebotes permanentes de la dirección: por su código DSN o, si
+        no lo hay, por el tipo de rebote Permanent de SES.
+        """
+        if event['event_type'] == 'complaint':
+            return 'complaint', False, event['feedback_type'] or False, True
+        bounce_type = (event['bounce_type'] or '').lower()
+        event_class = bounce_class(event['status_code'])
+        if event_class:
+            suppress = is_permanent_failure(event['status_code'])
+        else:
+            # Sin código DSN: el tipo de rebote de SES (Permanent/Transient/Undetermined)
+            event_class = {'permanent': 'hard', 'transient': 'soft'}.get(bounce_type)
+            suppress = bounce_type == 'permanent'
+        return event_class, event['status_code'] or False, False, suppress
+
+    @api.model
+    def _get_failure_reason(self, event):
+        """Texto del motivo de rebote, con el mismo formato que el análisis de DSN"""
+        if event['event_type'] == 'complaint':
+            return f"SES Report: Complaint: {event['feedback_type'] or 'Generic/SES'}"
+        status = event['status_code']
+        if status and status.startswith('5'):
+            detail = f"Hard Bounce (Code: {status})"
+        elif status and status.startswith('4'):
+            detail = f"Soft Bounce (Code: {status})"
+        else:
+            detail = f"Bounce ({event['bounce_type'] or 'Generic/SES'})"
+        if event['diagnostic_code']:
+            detail = f"{detail} {event['diagnostic_code']}"
+        return f"SES Report: {detail}"
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import logging
+import threading
+
+from odoo import api, fields, models, tools
+from odoo.addons.aws_ses_mail_tracking.libs.event_dedup import RecentFingerprints
+
+_logger = logging.getLogger(__name__)
+
+# Huellas recientes por base de datos (por worker)
+_recent_fingerprints = {}
+_recent_fingerprints_lock = threading.Lock()
+
+
+class AwsSesEventFingerprint(models.Model):
+    _name = 'aws.ses.event.fingerprint'
+    _description = 'Huella de un rebote o queja SES ya procesado'
+    _order = 'id'
+    _log_access = False
+    _rec_name = 'fingerprint'
+
+    fingerprint = fields.Char("Fingerprint", required=True, size=16)
+    create_date = fields.Datetime("Created on", default=fields.Datetime.now, readonly=True, index=True)
+
+    _sql_constraints = [
+        ('fingerprint_uniq', 'unique(fingerprint)', "The notification fingerprint already exists."),
+    ]
+
+    @api.model
+    def _filter_new(self, fingerprints):
+        """Registra las huellas y devuelve las que no se habían procesado; el resto son repeticiones.
+
+        Primero el conjunto reciente del worker (sin consulta) y, para las demás, un único
+        INSERT ... ON CONFLICT DO NOTHING: si otra transacción está registrando la misma huella,
+        espera a que termine, así que dos copias simultáneas no se procesan las dos. Las huellas
+        nuevas pasan al conjunto reciente tras el commit (si la transacción se deshace, la
+        notificación podrá procesarse de nuevo). Con la deduplicación desactivada
+        (``aws_ses_mail_tracking.event_dedup_enabled``) todas son nuevas.
+        """
+        fingerprints = set(fingerprints)
+        recent = self._get_recent_fingerprints()
+        if recent is None or not fingerprints:
+            return fingerprints
+        candidates = sorted(fingerprint for fingerprint in fingerprints if fingerprint not in recent)
+        if not candidates:
+            return set()
+        query = """
+            INSERT INTO aws_ses_event_fingerprint (fingerprint, create_date) VALUES %s
+            ON CONFLICT (fingerprint) DO NOTHING
+            RETURNING fingerprint
+        """ % ", ".join(["(%s, now() at time zone 'UTC')"] * len(candidates))
+        self.env.cr.execute(query, candidates)
+        new = {row[0] for row in self.env.cr.fetchall()}
+        # Las repeticiones ya están confirmadas en la tabla; las nuevas, cuando se confirme esta transacción
+        recent.add(fingerprint for fingerprint in candidates if fingerprint not in new)
+        if new:
+            self.env.cr.postcommit.add(functools.partial(recent.add, new))
+        return new
+
+    @api.model
+    def _get_recent_fingerprints(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not tools.str2bool(ICP.get_param('aws_ses_mail_tracking.event_dedup_enabled', 'True')):
+            return None
+        with _recent_fingerprints_lock:
+            recent = _recent_fingerprints.get(self.env.cr.dbname)
+            if recent is None:
+                recent = _recent_fingerprints[self.env.cr.dbname] = RecentFingerprints()
+        recent.window = int(ICP.get_param('aws_ses_mail_tracking.event_dedup_window', 3600))
+        return recent
+
+    @api.autovacuum
+    def _gc_fingerprints(self):
+        """Olvida las huellas de más de ``aws_ses_mail_tracking.event_dedup_days`` días"""
+        days = int(self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.event_dedup_days', 30))
+        self.env.cr.execute("""
+            DELETE FROM aws_ses_event_fingerprint
+             WHERE create_date < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, [days])
+        _logger.info("[SES EVENTS] Removed %s notification fingerprints older than %s days", self.env.cr.rowcount, days)
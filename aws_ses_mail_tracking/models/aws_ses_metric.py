@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.tools import SQL
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import MetricsRegistry, metrics
+
+_logger = logging.getLogger(__name__)
+
+# Segundos mínimos entre volcados desde la ruta de envío y de rebotes (los crons vuelcan siempre)
+FLUSH_INTERVAL = 10
+
+
+class AwsSesMetric(models.Model):
+    _name = 'aws.ses.metric'
+    _description = 'Métricas de envío SES acumuladas de todos los procesos'
+    _order = 'id'
+    _log_access = False
+
+    name = fields.Char("Name", required=True)
+    kind = fields.Selection([
+        ('counter', 'Counter'),
+        ('bucket', 'Histogram Bucket'),
+        ('sum', 'Histogram Sum'),
+        ('count', 'Histogram Count'),
+    ], string="Kind", required=True)
+    labels = fields.Char("Labels", required=True, default='[]', help="Etiquetas de la serie (JSON ordenado)")
+    value = fields.Float("Value", required=True, default=0.0)
+
+    _sql_constraints = [
+        ('serie_uniq', 'unique(name, kind, labels)', "The metric serie already exists."),
+    ]
+
+    @api.model
+    def _flush_metrics(self, min_interval=0):
+        """Suma a la tabla las métricas acumuladas por este proceso desde el último volcado.
+
+        Cada worker (HTTP o cron) suma sus incrementos en una transacción propia, así que los
+        totales de la tabla son de todos los procesos y solo crecen, aunque los workers se
+        reinicien. Si la escritura falla, las muestras vuelven al registro del proceso.
+        """
+        samples = metrics.drain(min_interval)
+        if not samples:
+            return
+        try:
+            with self.env.registry.cursor() as cr:
+                cr.execute(SQL("""
+                    INSERT INTO aws_ses_metric AS serie (name, kind, labels, value)
+                    VALUES %s
+                    ON CONFLICT (name, kind, labels) DO UPDATE SET value = serie.value + EXCLUDED.value
+                """, SQL(", ").join(
+                    SQL("(%s, %s, %s, %s)", name, kind, json.dumps(sorted(labels)), value)
+                    for name, kind, labels, value in sorted(samples)
+                )))
+        except Exception as e:
+            metrics.merge(samples)
+            _logger.warning("[SES METRICS] Could not store %s metric samples: %s", len(samples), e)
+
+    @api.model
+    def _get_registry(self):
+        """Registro con las métricas sumadas de todos los procesos, para exportarlas"""
+        self._flush_metrics()
+        self.env.cr.execute("SELECT name, kind, labels, value FROM aws_ses_metric")
+        registry = MetricsRegistry(enabled=tools.str2bool(
+            self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.metrics_enabled', 'False')))
+        registry.merge(
+            (name, kind, tuple(tuple(label) for label in json.loads(labels)), int(value) if value.is_integer() else value)
+            for name, kind, labels, value in self.env.cr.fetchall()
+        )
+        return registry
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AwsSesPendingMessage(models.Model):
+    _name = 'aws.ses.pending.message'
+    _description = 'SES Message-ID pendiente de asociar a mailing.trace'
+    _order = 'id'
+    _log_access = False
+
+    message_id = fields.Char("Message-ID", required=True, index=True)
+    ses_message_id = fields.Char("SES Message-ID", required=True)
+    create_date = fields.Datetime("Created on", default=fields.Datetime.now, readonly=True)
+
+    @api.model
+    def _store_pending(self, pairs, missing_only=False):
+        """Guarda pares (message_id, ses_message_id) aún no escritos en mailing.trace.
+
+        Se usa SQL directo porque puede llamarse desde un hook precommit, después del flush del ORM.
+        Con ``missing_only`` no se repiten los pares que ya están guardados (y confirmados).
+        """
+        if not pairs:
+            return
+        values = ", ".join(["(%s, %s)"] * len(pairs))
+        if missing_only:
+            query = """
+                INSERT INTO aws_ses_pending_message (message_id, ses_message_id, create_date)
+                SELECT data.message_id, data.ses_message_id, now() at time zone 'UTC'
+                  FROM (VALUES %s) AS data(message_id, ses_message_id)
+                 WHERE NOT EXISTS (SELECT 1 FROM aws_ses_pending_message AS pending
+                                    WHERE pending.message_id = data.message_id
+                                      AND pending.ses_message_id = data.ses_message_id)
+            """ % values
+        else:
+            query = "INSERT INTO aws_ses_pending_message (message_id, ses_message_id, create_date) VALUES %s" % ", ".join(
+                ["(%s, %s, now() at time zone 'UTC')"] * len(pairs))
+        self.env.cr.execute(query, [value for pair in pairs for value in pair])
+
+    @api.model
+    def _remove_pending(self, pairs):
+        """Borra los pares (message_id, ses_message_id) ya escritos en mailing.trace"""
+        if not pairs:
+            return
+        query = """
+            DELETE FROM aws_ses_pending_message AS pending
+             USING (VALUES %s) AS data(message_id, ses_message_id)
+             WHERE pending.message_id = data.message_id
+               AND pending.ses_message_id = data.ses_message_id
+        """ % ", ".join(["(%s, %s)"] * len(pairs))
+        self.env.cr.execute(query, [value for pair in pairs for value in pair])
+
+    @api.model
+    def _cron_flush_pending(self, batch_size=5000):
+        """Reintenta escribir en mailing.trace los SES Message-IDs pendientes, por lotes"""
+        while True:
+            pending = self.search([], limit=batch_size)
+            if not pending:
+                return
+            pairs = [(rec.message_id, rec.ses_message_id) for rec in pending]
+            matched = self.env['mailing.trace']._write_ses_message_ids(pairs)
+            _logger.info("[SES SEND] Recovered %s pending SES Message-IDs (%s mailing.trace records matched)",
+                         len(pairs), len(matched))
+            pending.unlink()
+            if len(pending) < batch_size:
+                return
+            self.env.cr.commit()
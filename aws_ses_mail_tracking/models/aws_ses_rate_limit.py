@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+
+class AwsSesRateLimit(models.Model):
+    _name = 'aws.ses.rate.limit'
+    _description = 'Reparto de la tasa máxima de envío SES entre procesos'
+    _order = 'id'
+    _log_access = False
+    _rec_name = 'key'
+
+    key = fields.Char("Key", required=True, help="Cuenta SES a la que se aplica la tasa (región)")
+    next_slot = fields.Float("Next Slot", help="Instante (epoch, reloj de la base de datos) en que queda libre la tasa")
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', "The rate limit key already exists."),
+    ]
+
+    @api.model
+    def _get_reserve(self, key, rate):
+        """Función ``reserve(count)`` de SharedTokenBucket para la cuenta ``key`` a ``rate`` mensajes/s.
+
+        Cada llamada reserva en una transacción propia los ``count`` envíos siguientes al último
+        bloque reservado por cualquier proceso y devuelve los segundos que faltan para que
+        empiece el bloque. Se usa el reloj de la base de datos, común a todos los servidores.
+        Se llama desde los hilos del envío concurrente: solo usa el registro, nunca este entorno.
+        """
+        registry = self.env.registry
+
+        def reserve(count):
+            try:
+                with registry.cursor() as cr:
+                    cr.execute("""
+                        INSERT INTO aws_ses_rate_limit AS slot (key, next_slot)
+                        VALUES (%(key)s, extract(epoch from clock_timestamp()) + %(span)s)
+                        ON CONFLICT (key) DO UPDATE
+                           SET next_slot = greatest(slot.next_slot, extract(epoch from clock_timestamp())) + %(span)s
+                        RETURNING slot.next_slot - %(span)s - extract(epoch from clock_timestamp())
+                    """, {'key': key, 'span': count / rate})
+                    return cr.fetchone()[0]
+            except Exception as e:
+                # Sin la base de datos el proceso sigue limitándose a sí mismo
+                _logger.warning("[SES SEND] Could not reserve send rate for %s: %s", key, e)
+                return 0.0
+
+        return reserve
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+import time
+
+from odoo import api, fields, models, tools
+from odoo.addons.aws_ses_mail_tracking.libs.suppression import SuppressionIndex
+
+_logger = logging.getLogger(__name__)
+
+# Índices de supresión por base de datos (por worker)
+_suppression_indexes = {}
+_suppression_lock = threading.Lock()
+
+# Margen de la recarga incremental: create_date es la hora de inicio de la transacción que
+# insertó la fila, así que una transacción larga puede confirmar filas "antiguas"
+REFRESH_OVERLAP = 3600
+FETCH_SIZE = 10000
+
+
+class AwsSesSuppression(models.Model):
+    _name = 'aws.ses.suppression'
+    _description = 'Dirección suprimida por rebote permanente o queja SES'
+    _order = 'id'
+    _log_access = False
+    _rec_name = 'email'
+
+    email = fields.Char("Email", required=True)
+    reason = fields.Selection([
+        ('hard', 'Hard Bounce'),
+        ('complaint', 'Complaint'),
+        ('manual', 'Manual'),
+    ], string="Reason", required=True, default='manual')
+    create_date = fields.Datetime("Created on", default=fields.Datetime.now, readonly=True, index=True)
+
+    _sql_constraints = [
+        ('email_uniq', 'unique(email)', "The email address is already suppressed."),
+    ]
+
+    @api.model
+    def _suppress(self, emails, reason):
+        """Añade direcciones (normalizadas) a la lista de supresión; las ya suprimidas se ignoran.
+
+        SQL directo, como aws.ses.pending.message, porque se llama desde escrituras por SQL en lote.
+        """
+        emails = {tools.email_normalize(email) for email in emails if email}
+        emails.discard(False)
+        if not emails:
+            return
+        query = """
+            INSERT INTO aws_ses_suppression (email, reason, create_date) VALUES %s
+            ON CONFLICT (email) DO NOTHING
+        """ % ", ".join(["(%s, %s, now() at time zone 'UTC')"] * len(emails))
+        self.env.cr.execute(query, [value for email in sorted(emails) for value in (email, reason)])
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        # Altas manuales: la misma normalización que _suppress y que el índice
+        for vals in vals_list:
+            if vals.get('email'):
+                vals['email'] = tools.email_normalize(vals['email']) or vals['email'].strip().lower()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if vals.get('email'):
+            vals = dict(vals, email=tools.email_normalize(vals['email']) or vals['email'].strip().lower())
+        res = super().write(vals)
+        if 'email' in vals:
+            # La dirección anterior deja de estar suprimida
+            self._invalidate_indexes()
+        return res
+
+    def unlink(self):
+        # Las bajas de la lista invalidan los índices de todos los workers (recarga completa)
+        res = super().unlink()
+        self._invalidate_indexes()
+        return res
+
+    @api.model
+    def _invalidate_indexes(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'aws_ses_mail_tracking.suppression_generation', str(time.time_ns()))
+
+    @api.model
+    def _get_index(self):
+        """Índice de supresión de este worker, recargado si ha pasado el intervalo configurado.
+
+        Devuelve None si la supresión está desactivada
+        (parámetro ``aws_ses_mail_tracking.suppression_enabled``).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if not tools.str2bool(ICP.get_param('aws_ses_mail_tracking.suppression_enabled', 'True')):
+            return None
+        refresh_interval = int(ICP.get_param('aws_ses_mail_tracking.suppression_refresh', 60))
+        generation = ICP.get_param('aws_ses_mail_tracking.suppression_generation', '0')
+
+        with _suppression_lock:
+            state = _suppression_indexes.setdefault(self.env.cr.dbname, {
+                'index': SuppressionIndex(), 'generation': None, 'refreshed_at': None, 'checked': 0.0,
+            })
+            if time.monotonic() - state['checked'] >= refresh_interval or state['generation'] != generation:
+                self._refresh_index(state, full=state['generation'] != generation)
+                state['generation'] = generation
+                state['checked'] = time.monotonic()
+        return state['index']
+
+    @api.model
+    def _refresh_index(self, state, full=False):
+        started = time.monotonic()
+        self.env.cr.execute("SELECT now() at time zone 'UTC'")
+        refreshed_at = self.env.cr.fetchone()[0]
+        if full or state['refreshed_at'] is None:
+            self.env.cr.execute("SELECT email FROM aws_ses_suppression")
+            state['index'].load(self._fetch_emails())
+            kind = 'full'
+        else:
+            self.env.cr.execute("""
+                SELECT email FROM aws_ses_suppression
+                 WHERE create_date >= %s - make_interval(secs => %s)
+            """, (state['refreshed_at'], REFRESH_OVERLAP))
+            state['index'].add(self._fetch_emails())
+            kind = 'incremental'
+        state['refreshed_at'] = refreshed_at
+        _logger.info("[SES SUPPRESSION] %s refresh: %s suppressed addresses (%.3fs)",
+                     kind, len(state['index']), time.monotonic() - started)
+
+    def _fetch_emails(self):
+        while True:
+            rows = self.env.cr.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield row[0]
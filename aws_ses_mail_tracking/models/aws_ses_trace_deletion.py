@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Rastros anotados como mucho por borrado; por encima se anota un vaciado completo de las cachés
+MAX_LOGGED_DELETIONS = 10000
+
+
+class AwsSesTraceDeletion(models.Model):
+    _name = 'aws.ses.trace.deletion'
+    _description = 'Rastro SES borrado, pendiente de quitar de las cachés de correlación'
+    _order = 'id'
+    _auto = False
+    _log_access = False
+    _rec_name = 'trace_id'
+
+    trace_id = fields.Integer("Trace ID", readonly=True, help="Rastro borrado; vacío = vaciar toda la caché")
+    create_date = fields.Datetime("Created on", readonly=True)
+
+    def init(self):
+        # xact: transacción (txid de 64 bits) que borró el rastro, fuera del alcance de fields.Integer
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS aws_ses_trace_deletion (
+                id bigserial PRIMARY KEY,
+                trace_id integer,
+                xact bigint NOT NULL,
+                create_date timestamp without time zone NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS aws_ses_trace_deletion_xact_index ON aws_ses_trace_deletion (xact);
+        """)
+
+    @api.model
+    def _log_deletions(self, trace_ids):
+        """Anota los rastros borrados en la transacción actual (``None``: todos los de la caché)"""
+        if trace_ids is None:
+            trace_ids = [None]
+        if not trace_ids:
+            return
+        self.env.cr.execute("""
+            INSERT INTO aws_ses_trace_deletion (trace_id, xact, create_date)
+            SELECT trace_id, txid_current(), now() at time zone 'UTC' FROM unnest(%s::integer[]) AS trace_id
+        """, [list(trace_ids)])
+
+    @api.model
+    def _read_deletions(self, xmin, applied):
+        """Rastros borrados por transacciones que la instantánea ``xmin`` aún no veía.
+
+        Devuelve (nuevo xmin, {id de anotación: (id de rastro o None, txid)}) sin las anotaciones
+        de ``applied``. Toda transacción no visible en una instantánea tiene un txid >= su xmin, así
+        que ningún borrado confirmado fuera de orden se pierde. Una sola consulta por el índice de xact.
+        """
+        self.env.cr.execute("""
+            SELECT txid_snapshot_xmin(txid_current_snapshot()),
+                   COALESCE(array_agg(id), '{}'), COALESCE(array_agg(trace_id), '{}'), COALESCE(array_agg(xact), '{}')
+              FROM aws_ses_trace_deletion
+             WHERE xact >= %s
+        """, [xmin])
+        new_xmin, ids, trace_ids, xacts = self.env.cr.fetchone()
+        return new_xmin, {
+            deletion_id: (trace_id, xact)
+            for deletion_id, trace_id, xact in zip(ids, trace_ids, xacts) if deletion_id not in applied
+        }
+
+    @api.model
+    def _current_xmin(self):
+        self.env.cr.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return self.env.cr.fetchone()[0]
+
+    @api.autovacuum
+    def _gc_deletions(self):
+        """Olvida las anotaciones más antiguas que la caducidad de la caché (sus entradas ya caducaron)"""
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.trace_cache_ttl', 86400))
+        self.env.cr.execute("""
+            DELETE FROM aws_ses_trace_deletion
+             WHERE create_date < (now() at time zone 'UTC') - make_interval(secs => %s)
+        """, [ttl + 86400])
+        _logger.info("[SES CACHE] Removed %s trace deletion records", self.env.cr.rowcount)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+
+class IrCron(models.Model):
+    _inherit = 'ir.cron'
+
+    def _callback(self, cron_name, server_action_id, *args, **kwargs):
+        """Vuelca las métricas SES del worker tras cada tarea: los workers de cron no sirven HTTP"""
+        try:
+            return super()._callback(cron_name, server_action_id, *args, **kwargs)
+        finally:
+            self.env['aws.ses.metric'].sudo()._flush_metrics()
@@ -1,31 +1,81 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+import hashlib
 import logging
-import re
+import os
 import smtplib
-import sys
 import base64
 import ssl
+import time
 import idna
+import requests
 import copy
 
 from OpenSSL import crypto as SSLCrypto
 from OpenSSL.crypto import Error as SSLCryptoError, FILETYPE_PEM
 from OpenSSL.SSL import Context as SSLContext, Error as SSLError
 
-from odoo import api, models, modules, _, tools
-from odoo.addons.base.models.ir_mail_server import is_ascii, MailDeliveryException, SMTP_TIMEOUT # Eliminamos ustr 
+from odoo import api, fields, models, modules, _, tools
+from odoo.addons.base.models.ir_mail_server import MailDeliveryException, SMTP_TIMEOUT, extract_rfc2822_addresses # Eliminamos ustr 
 from odoo.exceptions import UserError
 from odoo.addons.aws_ses_mail_tracking.libs import smtplib_inherit
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import metrics
+from odoo.addons.aws_ses_mail_tracking.libs.ses_api import SESAPIClient, SESAPIError, SESAPISession
+from odoo.addons.aws_ses_mail_tracking.libs.ses_retry import RetryScheduler, TemporaryFailure, is_temporary_failure
+from odoo.addons.aws_ses_mail_tracking.libs.ses_routing import SESRouter, is_endpoint_failure
+from odoo.addons.aws_ses_mail_tracking.libs.ses_tools import parse_ses_region
+from odoo.addons.aws_ses_mail_tracking.libs.smtp_pool import SMTPConnectionPool
 
 _logger = logging.getLogger(__name__)
 _test_logger = logging.getLogger('odoo.tests')
 
+# Pool de conexiones SMTP autenticadas del proceso, compartido por todas las bases de datos
+_smtp_pool = SMTPConnectionPool()
+
+# Contextos SSL ya construidos, por servidor de correo + hash del certificado / por ficheros de
+# certificado + fecha de modificación. Evita decodificar y parsear el certificado en cada conexión.
+_ssl_context_cache = {}
+
+# Clientes de la API SES del proceso (con su pool HTTP keep-alive), por servidor de correo
+_ses_api_clients = {}
+
+# Reintentos de fallos temporales (4xx, 454 de throttling) y límite de envíos simultáneos por servidor
+_retry_scheduler = RetryScheduler()
+
+# Salud (latencia, errores, circuit breaker) de los servidores de los grupos de enrutado SES
+_ses_router = SESRouter()
+
 
 class IrMailServer(models.Model):
     _inherit = "ir.mail_server"
 
+    ses_transport = fields.Selection([
+        ('smtp', 'SMTP'),
+        ('api', 'SES API (HTTPS)'),
+    ], string="SES Transport", default='smtp', required=True,
+        help="SES API: envía el mensaje completo con SendEmail (Raw) de la API SES v2 en una sola petición "
+             "HTTPS por conexión persistente, y obtiene el SES Message-ID directamente de la respuesta.")
+    ses_region = fields.Char(
+        "SES Region", compute='_compute_ses_region', store=True, readonly=False,
+        help="Región de SES, p. ej. eu-west-1: dominio del SES Message-ID y región de la API. Se obtiene del "
+             "servidor SMTP (email-smtp.<región>.amazonaws.com, endpoints FIPS y VPC incluidos); vacía si el "
+             "servidor no es de SES, salvo que se indique a mano (p. ej. tras un relay con otro nombre).")
+    ses_routing_group = fields.Char(
+        "SES Routing Group",
+        help="Los servidores con el mismo grupo se reparten los envíos según su latencia y tasa de error "
+             "medidas, y se sustituyen entre sí si uno falla.")
+    ses_api_endpoint = fields.Char(
+        "SES API Endpoint", help="Vacío: https://email.<región>.amazonaws.com")
+    ses_access_key = fields.Char("AWS Access Key ID", groups='base.group_system')
+    ses_secret_key = fields.Char("AWS Secret Access Key", groups='base.group_system')
+    ses_configuration_set = fields.Char("SES Configuration Set")
+
+    @api.depends('smtp_host')
+    def _compute_ses_region(self):
+        for server in self:
+            server.ses_region = parse_ses_region(server.smtp_host)
+
     def connect(self, host=None, port=None, user=None, password=None, encryption=None,
                 smtp_from=None, ssl_certificate=None, ssl_private_key=None, smtp_debug=False, mail_server_id=None,
                 allow_archived=False):
@@ -35,6 +85,7 @@ class IrMailServer(models.Model):
         if modules.module.current_test:
             return
 
+        self._configure_ses_metrics()
         mail_server = smtp_encryption = None
         if mail_server_id:
             mail_server = self.sudo().browse(mail_server_id)
@@ -47,6 +98,27 @@ class IrMailServer(models.Model):
             mail_server = self.env['ir.mail_server']
         ssl_context = None
 
+        # Transporte por la API SES: sin diálogo SMTP, conexiones HTTP del cliente compartido
+        if mail_server.ses_transport == 'api':
+            connection = SESAPISession(mail_server._get_ses_api_client())
+            connection.from_filter = mail_server.from_filter
+            connection.smtp_from = smtp_from
+            connection.mail_server_id = mail_server.id
+            return connection
+
+        # Reutilizar una conexión ya autenticada del pool si la hay
+        pool_key = mail_server._get_smtp_pool_key()
+        if pool_key:
+            connection = _smtp_pool.acquire(pool_key)
+            metrics.inc('ses_smtp_pool_total', result='hit' if connection else 'miss')
+            if connection:
+                connection.set_debuglevel(smtp_debug or mail_server.smtp_debug)
+                connection.from_filter = mail_server.from_filter
+                connection.smtp_from = smtp_from
+                connection.mail_server_id = mail_server.id
+                connection.ses_region = mail_server.ses_region
+                return connection
+
         if mail_server and mail_server.smtp_authentication != "cli":
             smtp_server = mail_server.smtp_host
             smtp_port = mail_server.smtp_port
@@ -62,16 +134,22 @@ class IrMailServer(models.Model):
             if (mail_server.smtp_authentication == "certificate"
                and mail_server.smtp_ssl_certificate
                and mail_server.smtp_ssl_private_key):
+                # El contexto SSL se construye una vez por servidor y certificado (ver _ssl_context_cache)
+                cache_key = (self.env.cr.dbname, mail_server.id, hashlib.sha256(
+                    mail_server.smtp_ssl_certificate + b'\0' + mail_server.smtp_ssl_private_key).hexdigest())
+                ssl_context = _ssl_context_cache.get(cache_key)
                 try:
-                    ssl_context = SSLContext(ssl.PROTOCOL_TLS)
-                    smtp_ssl_certificate = base64.b64decode(mail_server.smtp_ssl_certificate)
-                    certificate = SSLCrypto.load_certificate(FILETYPE_PEM, smtp_ssl_certificate)
-                    smtp_ssl_private_key = base64.b64decode(mail_server.smtp_ssl_private_key)
-                    private_key = SSLCrypto.load_privatekey(FILETYPE_PEM, smtp_ssl_private_key)
-                    ssl_context.use_certificate(certificate)
-                    ssl_context.use_privatekey(private_key)
-                    # Verificar que la clave privada coincida con el certificado
-                    ssl_context.check_privatekey()
+                    if ssl_context is None:
+                        ssl_context = SSLContext(ssl.PROTOCOL_TLS)
+                        smtp_ssl_certificate = base64.b64decode(mail_server.smtp_ssl_certificate)
+                        certificate = SSLCrypto.load_certificate(FILETYPE_PEM, smtp_ssl_certificate)
+                        smtp_ssl_private_key = base64.b64decode(mail_server.smtp_ssl_private_key)
+                        private_key = SSLCrypto.load_privatekey(FILETYPE_PEM, smtp_ssl_private_key)
+                        ssl_context.use_certificate(certificate)
+                        ssl_context.use_privatekey(private_key)
+                        # Verificar que la clave privada coincida con el certificado
+                        ssl_context.check_privatekey()
+                        _ssl_context_cache[cache_key] = ssl_context
                 except SSLCryptoError as e:
                     raise UserError(_('The private key or the certificate is not a valid file. \n%s', str(e)))
                 except SSLError as e:
@@ -96,11 +174,23 @@ class IrMailServer(models.Model):
 
             if smtp_ssl_certificate_filename and smtp_ssl_private_key_filename:
                 try:
-                    ssl_context = SSLContext(ssl.PROTOCOL_TLS)
-                    ssl_context.use_certificate_chain_file(smtp_ssl_certificate_filename)
-                    ssl_context.use_privatekey_file(smtp_ssl_private_key_filename)
-                    # Verificar que la clave privada coincida con el certificado
-                    ssl_context.check_privatekey()
+                    # Los ficheros solo se vuelven a leer si cambian en disco
+                    cache_key = (
+                        smtp_ssl_certificate_filename, os.stat(smtp_ssl_certificate_filename).st_mtime_ns,
+                        smtp_ssl_private_key_filename, os.stat(smtp_ssl_private_key_filename).st_mtime_ns,
+                    )
+                except OSError:
+                    cache_key = None
+                ssl_context = _ssl_context_cache.get(cache_key)
+                try:
+                    if ssl_context is None:
+                        ssl_context = SSLContext(ssl.PROTOCOL_TLS)
+                        ssl_context.use_certificate_chain_file(smtp_ssl_certificate_filename)
+                        ssl_context.use_privatekey_file(smtp_ssl_private_key_filename)
+                        # Verificar que la clave privada coincida con el certificado
+                        ssl_context.check_privatekey()
+                        if cache_key:
+                            _ssl_context_cache[cache_key] = ssl_context
                 except SSLCryptoError as e:
                     raise UserError(_('The private key or the certificate is not a valid file. \n%s', str(e)))
                 except SSLError as e:
@@ -119,10 +209,12 @@ class IrMailServer(models.Model):
                       "You could use STARTTLS instead. "
                        "If SSL is needed, an upgrade to Python 2.6 on the server-side "
                        "should do the trick."))
-            connection = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
+            with metrics.timer('ses_phase_seconds', phase='tcp'):
+                connection = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
         else:
             # Cambio aquí: usar smtplib_inherit para funcionalidad extendida
-            connection = smtplib_inherit.SMTPInherit(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
+            with metrics.timer('ses_phase_seconds', phase='tcp'):
+                connection = smtplib_inherit.SMTPInherit(smtp_server, smtp_port, timeout=SMTP_TIMEOUT)
             #####
 
         connection.set_debuglevel(smtp_debug)
@@ -133,14 +225,16 @@ class IrMailServer(models.Model):
             # (según RFC 3207) así que por ejemplo cualquier capacidad AUTH
             # que aparezca solo en canales encriptados
             # será detectada correctamente para el siguiente paso
-            connection.starttls(context=ssl_context)
+            with metrics.timer('ses_phase_seconds', phase='starttls'):
+                connection.starttls(context=ssl_context)
 
         if smtp_user:
             # Intentar autenticación - lanzará excepción si el servicio AUTH no es soportado
             local, at, domain = smtp_user.rpartition('@')
             if at:
                 smtp_user = local + at + idna.encode(domain).decode('ascii')
-            mail_server._smtp_login(connection, smtp_user, smtp_password or '')
+            with metrics.timer('ses_phase_seconds', phase='auth'):
+                mail_server._smtp_login(connection, smtp_user, smtp_password or '')
 
         # Algunos métodos SMTP no verifican si EHLO/HELO fue enviado.
         # De todos modos, como puede haber sido enviado por login(), todos los usos subsiguientes deberían considerar este comando como enviado.
@@ -150,9 +244,131 @@ class IrMailServer(models.Model):
         # necesitamos cambiar las cabeceras FROM o no cuando preparemos el mensaje de correo
         connection.from_filter = from_filter
         connection.smtp_from = smtp_from
+        # Región SES (dominio del SES Message-ID), resuelta una vez por conexión y no en cada envío
+        connection.mail_server_id = mail_server.id
+        connection.ses_region = mail_server.ses_region if mail_server else parse_ses_region(smtp_server)
+
+        if pool_key and isinstance(connection, smtplib_inherit.SMTPInherit):
+            _smtp_pool.attach(connection, pool_key)
 
         return connection
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        servers = super().create(vals_list)
+        if any(vals.get('ses_routing_group') for vals in vals_list):
+            self.env.registry.clear_cache()
+        return servers
+
+    def write(self, vals):
+        res = super().write(vals)
+        self._clear_ssl_context_cache()
+        self._clear_ses_api_clients()
+        if 'ses_routing_group' in vals or 'active' in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        self._clear_ssl_context_cache()
+        self._clear_ses_api_clients()
+        routed = any(self.mapped('ses_routing_group'))
+        res = super().unlink()
+        if routed:
+            self.env.registry.clear_cache()
+        return res
+
+    def test_smtp_connection(self):
+        """Los servidores con transporte API se comprueban con una petición firmada (GetAccount)"""
+        api_servers = self.filtered(lambda server: server.ses_transport == 'api')
+        for server in api_servers:
+            try:
+                server._get_ses_api_client().get_account()
+            except (SESAPIError, requests.RequestException) as e:
+                raise UserError(_("Connection Test Failed! Here is what we got instead:\n %s", e))
+        if self - api_servers:
+            return super(IrMailServer, self - api_servers).test_smtp_connection()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': _("Connection Test Successful!"),
+                'type': 'success',
+                'sticky': False,
+            },
+        }
+
+    def _get_ses_routing_server_ids(self):
+        """Servidores activos del grupo de enrutado de este servidor (él incluido)"""
+        self.ensure_one()
+        if not self.ses_routing_group:
+            return (self.id,)
+        return self._get_ses_routing_group_ids(self.ses_routing_group)
+
+    @api.model
+    @tools.ormcache('group')
+    def _get_ses_routing_group_ids(self, group):
+        return tuple(self.sudo().search([('ses_routing_group', '=', group)], order='sequence, id').ids)
+
+    def _get_ses_api_client(self):
+        """Cliente de la API SES de este servidor, compartido por todas las conexiones del proceso"""
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id, self.write_date)
+        client = _ses_api_clients.get(key)
+        if client is None:
+            server = self.sudo()
+            region = server.ses_region
+            if not region or not server.ses_access_key or not server.ses_secret_key:
+                raise UserError(_("The SES API transport of server \"%s\" needs a region and AWS access keys.",
+                                  server.display_name))
+            ICP = self.env['ir.config_parameter'].sudo()
+            client = SESAPIClient(
+                region, server.ses_access_key, server.ses_secret_key,
+                endpoint=server.ses_api_endpoint or None,
+                configuration_set=server.ses_configuration_set or None,
+                timeout=SMTP_TIMEOUT,
+                # Una conexión HTTP por hilo del envío concurrente
+                pool_size=max(10, int(ICP.get_param('aws_ses_mail_tracking.concurrent_connections', 1))),
+            )
+            _ses_api_clients[key] = client
+        return client
+
+    def _clear_ses_api_clients(self):
+        """Cierra los clientes de la API SES de estos servidores (en este proceso)"""
+        keys = {(self.env.cr.dbname, server_id) for server_id in self.ids}
+        for cache_key in list(_ses_api_clients):
+            if cache_key[:2] in keys:
+                client = _ses_api_clients.pop(cache_key, None)
+                if client:
+                    client.close()
+
+    def _clear_ssl_context_cache(self):
+        """Olvida los contextos SSL de estos servidores (en este proceso)"""
+        keys = {(self.env.cr.dbname, server_id) for server_id in self.ids}
+        for cache_key in list(_ssl_context_cache):
+            if cache_key[:2] in keys:
+                _ssl_context_cache.pop(cache_key, None)
+
+    def _get_smtp_pool_key(self):
+        """Clave del pool de conexiones para este servidor, o None si no debe agruparse.
+
+        Solo se agrupan servidores configurados en registros (no los de línea de comandos)
+        y con conexiones SMTPInherit. La fecha de escritura forma parte de la clave para que
+        un cambio en la configuración del servidor no reutilice conexiones antiguas.
+        """
+        if not self or self.smtp_authentication == 'cli' or self.smtp_encryption == 'ssl':
+            return None
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_size = int(ICP.get_param('aws_ses_mail_tracking.smtp_pool_size', 4))
+        if max_size <= 0:
+            return None
+        _smtp_pool.configure(
+            max_size=max_size,
+            max_idle=int(ICP.get_param('aws_ses_mail_tracking.smtp_pool_max_idle', 60)),
+            max_messages=int(ICP.get_param('aws_ses_mail_tracking.smtp_pool_max_messages', 100)),
+            noop_interval=int(ICP.get_param('aws_ses_mail_tracking.smtp_pool_noop_interval', 15)),
+        )
+        return (self.env.cr.dbname, self.id, self.write_date)
+
     @api.model
     def send_email(self, message, mail_server_id=None, smtp_server=None, smtp_port=None,
                    smtp_user=None, smtp_password=None, smtp_encryption=None,
@@ -160,6 +376,11 @@ class IrMailServer(models.Model):
                    smtp_debug=False, smtp_session=None):
         """Reescribir el método send_mail para cambiar el message_id"""
 
+        self._configure_ses_metrics()
+        # Supresión previa a la conexión: sin ida y vuelta SMTP para destinatarios suprimidos
+        suppressed = self._get_suppressed_recipients(
+            message, mail_server_id=mail_server_id, smtp_server=smtp_server, smtp_session=smtp_session)
+
         smtp = smtp_session
         if not smtp:
             smtp = self.connect(
@@ -167,7 +388,13 @@ class IrMailServer(models.Model):
                 smtp_from=message['From'], ssl_certificate=smtp_ssl_certificate, ssl_private_key=smtp_ssl_private_key,
                 smtp_debug=smtp_debug, mail_server_id=mail_server_id,)
 
-        smtp_from, smtp_to_list, message = self._prepare_email_message(message, smtp)
+        # Cabeceras tal como llegan: _prepare_email_message las adapta al servidor de ``smtp`` y el
+        # failover a otro servidor del grupo de enrutado tiene que prepararlas de nuevo
+        original_headers = list(message._headers)
+        with metrics.timer('ses_phase_seconds', phase='prepare'):
+            smtp_from, smtp_to_list, message = self._prepare_email_message(message, smtp)
+        if suppressed:
+            smtp_to_list = [address for address in smtp_to_list if address.strip().lower() not in suppressed]
 
         # ¡No enviar correos realmente en modo test!
         if modules.module.current_test:
@@ -177,44 +404,237 @@ class IrMailServer(models.Model):
         try:
             message_id = message['Message-Id']
 
-            if sys.version_info < (3, 7, 4):
-                # el código de plegado de cabeceras tiene errores y añade retornos de carro redundantes,
-                # se arregló en 3.7.4 gracias a bpo-34424
-                message_str = message.as_string()
-                message_str = re.sub('\r+(?!\n)', '', message_str)
-
-                mail_options = []
-                if any((not is_ascii(addr) for addr in smtp_to_list + [smtp_from])):
-                    # email no ascii encontrado, requiere extensión SMTPUTF8,
-                    # el relay podría rechazarlo
-                    mail_options.append("SMTPUTF8")
-                smtp.sendmail(smtp_from, smtp_to_list, message_str, mail_options=mail_options)
-            else:
-                resp = smtp.send_message(message, smtp_from, smtp_to_list)
-                # Cambio aquí: Actualizar SES Message-ID
-                host_split = smtp._host.split(".")
-                (region, domain) = host_split[1], f"{host_split[2]}.{host_split[3]}"
-                if domain == "amazonaws.com":
-                    ses_message_id = f"<{resp.decode().split(' ')[1]}@{region}.amazonses.com>"
-                    _logger.info(f"[SES SEND DEBUG] Original message_id: {message_id}")
-                    _logger.info(f"[SES SEND DEBUG] Generated ses_message_id: {ses_message_id}")
-                    trace = self.env['mailing.trace'].search([('message_id', '=', message_id)])
-                    _logger.info(f"[SES SEND DEBUG] Found {len(trace)} mailing.trace records for message_id")
-                    if trace:
-                        trace[0].ses_message_id = ses_message_id
-                        _logger.info(f"[SES SEND DEBUG] Stored ses_message_id in trace ID: {trace[0].id}")
-                    else:
-                        _logger.warning(f"[SES SEND DEBUG] No mailing.trace found for message_id: {message_id} - ses_message_id not stored!")
-                #####
+            sender = self.env.context.get('ses_concurrent_sender')
+            if sender and smtp_session in sender.connections:
+                # Envío concurrente: un hilo trabajador envía el mensaje; el SES Message-ID y el
+                # estado del correo se registran al terminar el lote (ver mail.mail._send_ses_batch).
+                # Un mismo correo puede enviarse a varios destinatarios con el mismo Message-ID
+                sender.submit((message_id, sender.submitted), message, smtp_from, smtp_to_list)
+                return message_id
+            # SMTPInherit serializa el mensaje una sola vez y lo transmite por bloques.
+            # Los 4xx se reintentan aquí mismo, por la misma conexión, con espera exponencial
+            resp, smtp_used = self._send_ses_routed(
+                smtp, message, smtp_from, smtp_to_list, original_headers=original_headers)
+            # Cambio aquí: Actualizar SES Message-ID
+            self._store_ses_message_id(smtp_used, message_id, resp)
+            #####
 
             # do not quit() a pre-established smtp_session
             if not smtp_session:
                 smtp.quit()
-        except smtplib.SMTPServerDisconnected:
+        except smtplib.SMTPServerDisconnected as e:
+            metrics.inc('ses_send_failures_total', code=self._get_ses_failure_code(e))
             raise
         except Exception as e:
+            metrics.inc('ses_send_failures_total', code=self._get_ses_failure_code(e))
+            # No devolver al pool una conexión en estado desconocido
+            if not smtp_session:
+                smtp.close()
+            if is_temporary_failure(e):
+                # Servidor sin aceptar correo (throttling que sigue tras la espera máxima, 421):
+                # mail.mail deja solo este correo en cola, con la hora de su siguiente intento
+                retry_after = self._get_ses_requeue_delay(smtp)
+                _logger.info("[SES SEND] Temporary failure for %s, leaving it in the queue for %ss: %s",
+                             message_id, retry_after, e)
+                raise TemporaryFailure(
+                    f"{e.__class__.__name__}: {e}", message_id=message_id, retry_after=retry_after) from e
             params = (str(smtp_server), e.__class__.__name__, str(e)) # modificamos ustr por str
             msg = _("Mail delivery failed via SMTP server '%s'.\n%s: %s", *params)
             _logger.info(msg)
             raise MailDeliveryException(_("Mail Delivery Failed"), msg)
         return message_id
+
+    @api.model
+    def _send_ses_routed(self, smtp, message, smtp_from, smtp_to_list, original_headers=None):
+        """Envía el mensaje y devuelve (respuesta, conexión usada).
+
+        Si el servidor de la conexión pertenece a un grupo de enrutado, el mensaje sale por el
+        miembro que elige _ses_router según la salud medida (conexiones del pool, o la propia
+        ``smtp`` si es el elegido) y, si ese endpoint falla, por el siguiente. Por otro servidor
+        se envía con el remitente (sobre y cabecera From) que corresponde a su from_filter,
+        preparado de nuevo a partir de ``original_headers``.
+        """
+        scheduler = self._get_ses_retry_scheduler()
+        max_wait = self._get_ses_retry_max_wait()
+        mail_server = self.sudo().browse(getattr(smtp, 'mail_server_id', None) or [])
+        server_ids = mail_server._get_ses_routing_server_ids() if mail_server else ()
+        if len(server_ids) < 2:
+            return scheduler.send(
+                self._get_ses_retry_key(smtp), smtp.send_message, message, smtp_from, smtp_to_list,
+                max_wait=max_wait), smtp
+
+        dbname = self.env.cr.dbname
+        last_error = None
+        for __, server_id in _ses_router.choose([(dbname, server_id) for server_id in server_ids]):
+            connection = smtp if server_id == mail_server.id else None
+            started = time.monotonic()
+            try:
+                if connection is None:
+                    connection, send_args = self._prepare_ses_failover_send(
+                        server_id, message, original_headers, smtp_to_list)
+                else:
+                    send_args = (message, smtp_from, smtp_to_list)
+                resp = scheduler.send(
+                    self._get_ses_retry_key(connection), connection.send_message, *send_args, max_wait=max_wait)
+            except Exception as e:
+                endpoint_failure = is_endpoint_failure(e)
+                _ses_router.record((dbname, server_id), time.monotonic() - started, not endpoint_failure)
+                if connection is not None and connection is not smtp:
+                    if endpoint_failure:
+                        connection.close()
+                    else:
+                        connection.quit()
+                if not endpoint_failure:
+                    raise
+                _logger.warning("[SES ROUTING] Mail server %s failed (%s: %s), failing over",
+                                server_id, e.__class__.__name__, e)
+                last_error = e
+                continue
+            _ses_router.record((dbname, server_id), time.monotonic() - started, True)
+            if connection is not smtp:
+                # Devuelve la conexión al pool
+                connection.quit()
+            return resp, connection
+        raise last_error
+
+    @api.model
+    def _prepare_ses_failover_send(self, server_id, message, original_headers, smtp_to_list):
+        """Conexión al servidor ``server_id`` del grupo y argumentos de send_message para él.
+
+        El mensaje ya preparado lleva el remitente adaptado al from_filter del servidor original;
+        se rehace una copia con las cabeceras originales para el remitente que le corresponde a
+        este servidor. Los destinatarios son los ya filtrados (supresión) de ``smtp_to_list``.
+        """
+        target = self.sudo().browse(server_id)
+        if original_headers is None:
+            original_headers = list(message._headers)
+        target_message = copy.copy(message)
+        target_message._headers = list(original_headers)
+        __, target_from = self.sudo()._find_mail_server(target_message['From'], mail_servers=target)
+        connection = self.connect(mail_server_id=server_id, smtp_from=target_from)
+        try:
+            smtp_from, target_to_list, target_message = self._prepare_email_message(target_message, connection)
+        except Exception:
+            connection.quit()
+            raise
+        allowed = set(smtp_to_list)
+        return connection, (target_message, smtp_from, [address for address in target_to_list if address in allowed])
+
+    @api.model
+    def _get_ses_retry_scheduler(self):
+        """Planificador de reintentos del proceso, con la configuración de los parámetros del sistema"""
+        ICP = self.env['ir.config_parameter'].sudo()
+        _retry_scheduler.configure(
+            max_retries=int(ICP.get_param('aws_ses_mail_tracking.retry_max_attempts', 5)),
+            backoff=float(ICP.get_param('aws_ses_mail_tracking.retry_backoff', 1.0)),
+            max_backoff=float(ICP.get_param('aws_ses_mail_tracking.retry_max_backoff', 30)),
+            concurrency=int(ICP.get_param('aws_ses_mail_tracking.server_concurrency', 8)),
+        )
+        return _retry_scheduler
+
+    @api.model
+    def _get_ses_retry_max_wait(self):
+        """Segundos que un envío puede esperar a sus reintentos dentro de la transacción (el cron de
+        correo mantiene abierta la suya): pasado ese tiempo el correo vuelve a la cola"""
+        return float(self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.retry_max_wait', 10))
+
+    @api.model
+    def _get_ses_requeue_delay(self, connection=None):
+        """Segundos hasta el siguiente intento de un correo devuelto a la cola por un fallo temporal:
+        aws_ses_mail_tracking.retry_requeue_delay o, si es mayor, la pausa que le queda al servidor"""
+        delay = float(self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.retry_requeue_delay', 60))
+        if connection is not None:
+            throttle = self._get_ses_retry_scheduler().throttle(self._get_ses_retry_key(connection))
+            delay = max(delay, throttle.remaining())
+        return delay
+
+    @api.model
+    def _get_ses_retry_key(self, connection):
+        """Servidor al que se aplican la pausa por throttling y el límite de envíos simultáneos"""
+        if isinstance(connection, SESAPISession):
+            return ('api', connection.client.endpoint)
+        return ('smtp', getattr(connection, '_host', None))
+
+    @api.model
+    def _get_ses_failure_code(self, exception):
+        """Etiqueta de un envío fallido en las métricas: código de respuesta o tipo de excepción"""
+        code = getattr(exception, 'smtp_code', None)
+        if code is None and isinstance(exception, smtplib.SMTPRecipientsRefused):
+            code = max((code for code, _message in exception.recipients.values()), default=None)
+        return code or exception.__class__.__name__
+
+    @api.model
+    def _configure_ses_metrics(self):
+        """Activa o desactiva las métricas de envío del proceso según el parámetro del sistema"""
+        metrics.enabled = tools.str2bool(
+            self.env['ir.config_parameter'].sudo().get_param('aws_ses_mail_tracking.metrics_enabled', 'False'))
+        return metrics
+
+    @api.model
+    def _get_suppressed_recipients(self, message, mail_server_id=None, smtp_server=None, smtp_session=None):
+        """Direcciones (normalizadas) del mensaje que están en la lista de supresión SES.
+
+        Solo se aplica a los envíos por SES y a los de campañas de mass mailing: el correo
+        transaccional que sale por otro servidor no se ve afectado. Si todos los destinatarios
+        están suprimidos, el correo falla sin conectar con el servidor.
+        """
+        index = self.env['aws.ses.suppression']._get_index()
+        if not index:
+            return set()
+        recipients = {
+            address.strip().lower()
+            for header in ('To', 'Cc', 'Bcc')
+            for address in extract_rfc2822_addresses(message[header] or '')
+        }
+        suppressed = index.suppressed(recipients)
+        if suppressed and not (
+                self._is_ses_send(message, mail_server_id, smtp_server, smtp_session)
+                or self._is_mass_mailing_message(message)):
+            return set()
+        if suppressed:
+            _logger.info("[SES SUPPRESSION] Skipping suppressed recipients: %s", ', '.join(sorted(suppressed)))
+            if suppressed == recipients:
+                raise MailDeliveryException(
+                    _("Mail Delivery Failed"),
+                    _("All recipients are in the SES suppression list (hard bounce or complaint): %s",
+                      ', '.join(sorted(suppressed))))
+        return suppressed
+
+    @api.model
+    def _is_ses_send(self, message, mail_server_id=None, smtp_server=None, smtp_session=None):
+        """True si el mensaje saldrá por SES: por la conexión recibida o por el servidor que elegirá connect()"""
+        if smtp_session is not None:
+            return isinstance(smtp_session, SESAPISession) or bool(getattr(smtp_session, 'ses_region', False))
+        if mail_server_id:
+            mail_server = self.sudo().browse(mail_server_id)
+        elif smtp_server:
+            return bool(parse_ses_region(smtp_server))
+        else:
+            mail_server, __ = self.sudo()._find_mail_server(message['From'])
+        if mail_server:
+            return mail_server.ses_transport == 'api' or bool(mail_server.ses_region)
+        return bool(parse_ses_region(tools.config.get('smtp_server')))
+
+    @api.model
+    def _is_mass_mailing_message(self, message):
+        """True si el mensaje es de una campaña de mass mailing (tiene rastro por su Message-ID)"""
+        message_id = message['Message-Id']
+        return bool(message_id) and bool(
+            self.env['mailing.trace'].sudo().search_count([('message_id', '=', message_id)], limit=1))
+
+    @api.model
+    def _store_ses_message_id(self, smtp, message_id, resp):
+        """Extrae el SES Message-ID de la respuesta a DATA (o de la API) y lo deja pendiente de guardar en mailing.trace"""
+        if isinstance(smtp, SESAPISession):
+            # La API devuelve directamente el MessageId
+            ses_id, region = resp, smtp.region
+        else:
+            # "Ok <id>"; la región se resolvió al conectar (ver connect / ses_region)
+            region = getattr(smtp, 'ses_region', False)
+            reply = resp.decode(errors='replace').split() if region and resp else []
+            ses_id = reply[1] if len(reply) > 1 else None
+        if region and ses_id:
+            ses_message_id = f"<{ses_id}@{region}.amazonses.com>"
+            _logger.debug("[SES SEND] Message %s sent as SES Message-ID %s", message_id, ses_message_id)
+            # Escritura diferida: se guarda en bloque al final del lote / transacción
+            self.env['mailing.trace']._buffer_ses_message_id(message_id, ses_message_id)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+import logging
+from datetime import timedelta
+
+from odoo import fields, models, modules
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import metrics
+from odoo.addons.aws_ses_mail_tracking.libs.ses_api import SESAPISession
+from odoo.addons.aws_ses_mail_tracking.libs.ses_retry import TemporaryFailure, is_temporary_failure
+from odoo.addons.aws_ses_mail_tracking.libs.ses_sender import ConcurrentSender
+from odoo.addons.aws_ses_mail_tracking.libs.smtplib_inherit import SMTPInherit
+from .aws_ses_metric import FLUSH_INTERVAL
+from .mailing_trace import WRITEBACK_BATCH_SIZE
+
+_logger = logging.getLogger(__name__)
+
+
+class MailMail(models.Model):
+    _inherit = 'mail.mail'
+
+    def _send(self, auto_commit=False, raise_exception=False, smtp_session=None, **kwargs):
+        """Envía el lote por varias conexiones en paralelo si está configurado y escribe los
+        SES Message-IDs registrados por send_email en bloque.
+
+        El buffer de SES Message-IDs es del lote, no de la transacción: el cron confirma cada
+        correo por separado (``auto_commit``) y un buffer de transacción se vaciaría en cada
+        commit, un UPDATE por mensaje. Se vacía al terminar el lote (o cada
+        ``aws_ses_mail_tracking.writeback_batch_size`` mensajes). Cada par se confirma con su
+        correo en aws.ses.pending.message, así que un proceso que muere no pierde ninguno; si el
+        lote falla, los que aún no estaban confirmados se guardan en una transacción propia.
+        """
+        buffer = {}
+        flush_size = int(self.env['ir.config_parameter'].sudo().get_param(
+            'aws_ses_mail_tracking.writeback_batch_size', WRITEBACK_BATCH_SIZE))
+        mails = self.with_context(ses_message_id_buffer=buffer, ses_message_id_flush_size=max(flush_size, 1))
+        try:
+            res = mails._send_ses_batch(
+                auto_commit=auto_commit, raise_exception=raise_exception, smtp_session=smtp_session, **kwargs)
+        except Exception:
+            if buffer:
+                with self.env.registry.cursor() as cr:
+                    self.env(cr=cr)['aws.ses.pending.message']._store_pending(list(buffer.items()), missing_only=True)
+            raise
+        self.env['mailing.trace']._flush_ses_message_ids(buffer)
+        if auto_commit is True:
+            self.env.cr.commit()
+        self.env['aws.ses.metric'].sudo()._flush_metrics(FLUSH_INTERVAL)
+        return res
+
+    def _send_ses_batch(self, auto_commit=False, raise_exception=False, smtp_session=None, **kwargs):
+        """Envía el lote, por varias conexiones en paralelo si está configurado.
+
+        En modo concurrente send_email solo encola cada mensaje, así que el lote se procesa sin
+        commits intermedios y el post-proceso de cada correo (notificaciones, rastros, borrado
+        automático) se aplaza hasta conocer su resultado: nada se confirma como enviado antes de
+        que el envío termine. Si el proceso cae a mitad de lote, los correos siguen en cola y se
+        reenvían (como mucho un envío de más, nunca uno perdido).
+        """
+        sender = self._get_ses_concurrent_sender(smtp_session, kwargs.get('mail_server'))
+        if not sender:
+            return self._send_ses_sequential(
+                auto_commit=auto_commit, raise_exception=raise_exception, smtp_session=smtp_session, **kwargs)
+        deferred = []
+        try:
+            res = super(MailMail, self.with_context(ses_concurrent_sender=sender, ses_concurrent_deferred=deferred))._send(
+                auto_commit=False, raise_exception=raise_exception, smtp_session=smtp_session, **kwargs)
+        finally:
+            results = sender.join()
+            # La conexión del lote la cierra quien la abrió; las adicionales son nuestras
+            for connection in sender.connections[1:]:
+                connection.quit()
+            self._store_ses_concurrent_results(smtp_session, results)
+        _logger.info("[SES SEND] Concurrent batch: %s sent, %s failed, %s throttled in %.2fs (%.1f msg/s)",
+                     sender.sent, sender.failed, sender.throttled, sender.elapsed, sender.send_rate)
+        self._postprocess_ses_concurrent_results(results, deferred)
+        return res
+
+    def _send_ses_sequential(self, auto_commit=False, raise_exception=False, smtp_session=None, **kwargs):
+        """Envío estándar, correo a correo, que no abandona el lote por un fallo temporal.
+
+        mail.mail._send trata SMTPServerDisconnected como una conexión perdida y deja sin enviar el
+        resto del lote. Un fallo temporal que dura más que la espera máxima (TemporaryFailure, ver
+        ir.mail_server.send_email) solo afecta a su correo: vuelve a la cola con la hora de su
+        siguiente intento y el envío sigue con los correos posteriores del lote.
+        """
+        mails = self
+        while mails:
+            try:
+                return super(MailMail, mails)._send(
+                    auto_commit=auto_commit, raise_exception=raise_exception, smtp_session=smtp_session, **kwargs)
+            except TemporaryFailure as e:
+                mail = mails.filtered(lambda m: m.message_id == e.message_id)[:1]
+                if not mail:
+                    raise
+                mail._requeue_ses_mails(e.retry_after, reason=str(e))
+                if auto_commit is True:
+                    self.env.cr.commit()
+                mails = mails.browse(mails.ids[mails.ids.index(mail.id) + 1:])
+        return True
+
+    def _requeue_ses_mails(self, retry_after, reason=None):
+        """Devuelve los correos a la cola tras un fallo temporal, para reintentarlos en ``retry_after`` segundos"""
+        scheduled_date = fields.Datetime.now() + timedelta(seconds=retry_after)
+        values = {'state': 'outgoing', 'scheduled_date': scheduled_date}
+        if reason:
+            values['failure_reason'] = reason
+        self.write(values)
+        cron = self.env.ref('mail.ir_cron_mail_scheduler_action', raise_if_not_found=False)
+        if cron:
+            cron._trigger(scheduled_date)
+        _logger.info("[SES SEND] %s mails left in the queue after temporary failures, retrying them at %s",
+                     len(self), scheduled_date)
+
+    def _postprocess_sent_message(self, success_pids, failure_reason=False, failure_type=None):
+        deferred = self.env.context.get('ses_concurrent_deferred')
+        sender = self.env.context.get('ses_concurrent_sender')
+        if deferred is None or sender is None:
+            return super()._postprocess_sent_message(success_pids, failure_reason=failure_reason, failure_type=failure_type)
+        # Envío concurrente: se aplica al terminar el lote, con el resultado real de sus envíos
+        deferred.append((self.ids, sender.take_pending(), success_pids, failure_reason, failure_type))
+        return True
+
+    def _get_ses_concurrent_sender(self, smtp_session, mail_server):
+        """Prepara el envío concurrente para el lote o devuelve None si no aplica.
+
+        Se activa con el parámetro aws_ses_mail_tracking.concurrent_connections > 1; la
+        tasa se limita con aws_ses_mail_tracking.max_send_rate (mensajes/s por cuenta SES y
+        región, repartidos entre todos los procesos: ver aws.ses.rate.limit).
+        """
+        if modules.module.current_test or len(self) < 2 or not isinstance(smtp_session, (SMTPInherit, SESAPISession)):
+            return None
+        ICP = self.env['ir.config_parameter'].sudo()
+        workers = min(int(ICP.get_param('aws_ses_mail_tracking.concurrent_connections', 1)), len(self))
+        if workers < 2:
+            return None
+        connections = [smtp_session]
+        try:
+            for _i in range(workers - 1):
+                connections.append(self.env['ir.mail_server'].connect(
+                    mail_server_id=mail_server.id if mail_server else None, smtp_from=smtp_session.smtp_from))
+        except Exception as e:
+            # Con las conexiones que se hayan podido abrir es suficiente
+            _logger.warning("[SES SEND] Could only open %s concurrent SMTP connections: %s", len(connections), e)
+        if len(connections) < 2:
+            return None
+        IrMailServer = self.env['ir.mail_server']
+        rate = float(ICP.get_param('aws_ses_mail_tracking.max_send_rate', 0))
+        region = getattr(smtp_session, 'region', None) or getattr(smtp_session, 'ses_region', None) or 'default'
+        return ConcurrentSender(
+            connections, rate=rate,
+            scheduler=IrMailServer._get_ses_retry_scheduler(),
+            throttle_key=IrMailServer._get_ses_retry_key(smtp_session),
+            max_wait=IrMailServer._get_ses_retry_max_wait(),
+            reserve=self.env['aws.ses.rate.limit'].sudo()._get_reserve(region, rate) if rate > 0 else None)
+
+    def _store_ses_concurrent_results(self, smtp_session, results):
+        """Registra los SES Message-IDs de los envíos concurrentes que terminaron bien"""
+        IrMailServer = self.env['ir.mail_server']
+        for (message_id, __), result in results.items():
+            if isinstance(result, Exception):
+                metrics.inc('ses_send_failures_total', code=IrMailServer._get_ses_failure_code(result))
+            else:
+                IrMailServer._store_ses_message_id(smtp_session, message_id, result)
+
+    def _postprocess_ses_concurrent_results(self, results, deferred):
+        """Aplica el post-proceso aplazado de cada correo según el resultado de sus envíos.
+
+        Enviados: el post-proceso estándar. Con algún envío fallido: ``exception`` y post-proceso
+        de fallo (notificaciones y rastros en error), salvo que todos sus envíos fallaran por un
+        motivo temporal (throttling, conexión perdida): entonces el correo vuelve a la cola
+        hasta su siguiente intento.
+        """
+        requeued = self.browse()
+        for mail_ids, keys, success_pids, failure_reason, failure_type in deferred:
+            mails = self.browse(mail_ids).with_context(ses_concurrent_sender=None, ses_concurrent_deferred=None)
+            errors = [results[key] for key in keys if isinstance(results.get(key), Exception)]
+            if not errors:
+                mails._postprocess_sent_message(success_pids, failure_reason=failure_reason, failure_type=failure_type)
+                continue
+            reason = f"{errors[0].__class__.__name__}: {errors[0]}"
+            if len(errors) == len(keys) and all(is_temporary_failure(error) for error in errors):
+                mails.write({'failure_reason': reason})
+                requeued |= mails
+                continue
+            mails.write({'state': 'exception', 'failure_type': 'mail_smtp', 'failure_reason': reason})
+            mails._postprocess_sent_message(success_pids=[], failure_reason=reason, failure_type='mail_smtp')
+        if requeued:
+            requeued._requeue_ses_mails(self.env['ir.mail_server']._get_ses_requeue_delay())
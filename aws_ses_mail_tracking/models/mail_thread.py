@@ -1,9 +1,16 @@
 import logging
 import re
 import html
+from collections import defaultdict
 
 from odoo import api, models, tools, fields
 
+from ..libs import bounce_report
+from ..libs.event_dedup import event_fingerprint
+from ..libs.metrics import metrics
+from ..libs.ses_tools import normalize_message_id
+from .aws_ses_metric import FLUSH_INTERVAL
+
 _logger = logging.getLogger(__name__)
 
 
@@ -12,31 +19,26 @@ class MailThread(models.AbstractModel):
 
     MAIL_HEADER_MSGID_RE = re.compile(r'<([^>]+)>')
 
+    @api.model
+    def message_process(self, model, message, custom_values=None, save_original=False, strip_attachments=False,
+                        thread_id=None):
+        res = super().message_process(model, message, custom_values=custom_values, save_original=save_original,
+                                      strip_attachments=strip_attachments, thread_id=thread_id)
+        # Rebotes recibidos por la pasarela de correo en un worker HTTP: métricas de correlación y duplicados
+        self.env['aws.ses.metric'].sudo()._flush_metrics(FLUSH_INTERVAL)
+        return res
+
     @api.model
     def _message_route_process(self, message, message_dict, routes):
         if routes:
             thread_references = message_dict['references'] or message_dict['in_reply_to']
             msg_references = self.MAIL_HEADER_MSGID_RE.findall(thread_references or "")
 
-            # Normalizar IDs entrantes eliminando el dominio
-            normalized_refs = [ref.split('@')[0] for ref in msg_references]
-
-            # Buscar coincidencias en message_id
-            self.env['mailing.trace'].set_opened(domain=[
-                ('message_id', 'in', msg_references)
-            ])
-            self.env['mailing.trace'].set_replied(domain=[
-                ('message_id', 'in', msg_references)
-            ])
-
-            # Buscar coincidencias en SES message ID normalizado
-            if normalized_refs:
-                self.env['mailing.trace'].set_opened(domain=[
-                    ('ses_message_id', 'ilike', normalized_refs[0])
-                ])
-                self.env['mailing.trace'].set_replied(domain=[
-                    ('ses_message_id', 'ilike', normalized_refs[0])
-                ])
+            # Todas las referencias, por Message-ID de Odoo o por SES Message-ID normalizado
+            # (cualquiera de ellas, no solo la primera), en una consulta y una escritura
+            if msg_references:
+                self.env['mailing.trace']._get_traces_from_references(
+                    [f"<{ref}>" for ref in msg_references])._set_replied_opened()
 
         return super()._message_route_process(message, message_dict, routes)
 
@@ -47,134 +49,175 @@ class MailThread(models.AbstractModel):
 
         bounced_msg_ids = message_dict.get('bounced_msg_ids', [])
 
-        # Análisis de Rebotes/Quejas SES (RFC 3464 y RFC 5965)
-        bounce_details = []
+        # Análisis de Rebotes/Quejas SES (RFC 3464 y RFC 5965): solo las partes del informe
+        report = None
         try:
-            # Verificar cabeceras raíz para tipo de reporte (Respaldo)
-            is_generic_complaint = False
-            is_generic_bounce = False
-            
-            if email_message.get_content_type() == 'multipart/report':
-                report_type = email_message.get_param('report-type')
-                if report_type == 'feedback-report':
-                    is_generic_complaint = True
-                elif report_type == 'delivery-status':
-                    is_generic_bounce = True
-
-            if email_message.is_multipart():
-                from email.parser import HeaderParser
-                
-                for part in email_message.walk():
-                    content_type = part.get_content_type()
-                    
-                    # 1. RFC 5965: Reporte de Retroalimentación (Queja)
-                    if content_type == 'message/feedback-report':
-                        feedback_type = part.get('Feedback-Type')
-                        # Si no se encuentra la cabecera en la parte misma, analizar la carga útil
-                        if not feedback_type:
-                            payload = part.get_payload()
-                            if isinstance(payload, str):
-                                msg_block = HeaderParser().parsestr(payload)
-                                feedback_type = msg_block.get('Feedback-Type')
-                        
-                        if feedback_type:
-                            bounce_details.append(f"Complaint: {feedback_type}")
-                            _logger.info(f"[SES BOUNCE] RFC 5965 Complaint: {feedback_type}")
-
-                    # 2. RFC 3464: Notificación de Estado de Entrega (Rebote)
-                    elif content_type == 'message/delivery-status':
-                        payload = part.get_payload()
-                        status_code = None
-                        
-                        if isinstance(payload, list):
-                            # Raro, pero si es multiparte
-                            for subpart in payload:
-                                if subpart.get('Status'):
-                                    status_code = subpart.get('Status')
-                        elif isinstance(payload, str):
-                            # Formato DSN: Bloques de cabecera separados por líneas en blanco
-                            # Bloque 1: Campos por mensaje
-                            # Bloque 2+: Campos por destinatario (contiene Action, Status)
-                            blocks = payload.split('\n\n')
-                            for block in blocks:
-                                msg_block = HeaderParser().parsestr(block)
-                                if msg_block.get('Status'):
-                                    status_code = msg_block.get('Status')
-                                    # Tomamos el primer estado encontrado en un bloque de destinatario
-                                    break
-                                    
-                        if status_code:
-                            # 5.X.X = Hard, 4.X.X = Soft
-                            if status_code.startswith('5'):
-                                bounce_details.append(f"Hard Bounce (Code: {status_code})")
-                            elif status_code.startswith('4'):
-                                bounce_details.append(f"Soft Bounce (Code: {status_code})")
-                            _logger.info(f"[SES BOUNCE] RFC 3464 Status: {status_code}")
-
-            # Respaldos si el análisis detallado no encontró nada pero las cabeceras coincidieron
-            if not bounce_details:
-                if is_generic_complaint:
-                    bounce_details.append("Complaint (Generic/SES)")
-                elif is_generic_bounce:
-                    bounce_details.append("Bounce (Generic/SES)")
+            report = bounce_report.parse_report(email_message)
+        except Exception as e:
+            _logger.error("[SES BOUNCE] Error analyzing bounce details: %s", e)
 
+        # Copias repetidas del mismo rebote/queja (SES, el MTA o ya llegado por SNS): se descartan
+        # antes de tocar mail.mail, mailing.trace o el contador de rebotes del contacto; si solo
+        # algunos destinatarios son nuevos, se sigue con ellos
+        if report:
+            report = self._filter_repeated_bounce_report(report, bounced_msg_ids, message_dict.get('bounced_email'))
+            if report is None:
+                return
+
+        try:
+            bounce_details = self._get_bounce_report_details(report) if report else []
             if bounce_details:
                 detail_str = " | ".join(bounce_details)
                 current_body = message_dict.get('body') or ''
                 message_dict['body'] = f"<p><b>SES Report: {detail_str}</b></p><br/>{current_body}"
-                _logger.info(f"[SES BOUNCE] Updated failure reason with: {detail_str}")
+                _logger.info("[SES BOUNCE] Updated failure reason with: %s", detail_str)
 
         except Exception as e:
-            _logger.error(f"[SES BOUNCE] Error analyzing bounce details: {e}")
-        
-        # DEBUG: Registrar lo que estamos buscando
-        _logger.info(f"[SES BOUNCE DEBUG] bounced_msg_ids from Odoo: {bounced_msg_ids}")
-        
+            _logger.error("[SES BOUNCE] Error analyzing bounce details: %s", e)
+
         # Traducir IDs de mensajes SES a IDs de Odoo originales antes de llamar a super()
         # Esto permite que el manejador de rebotes estándar de Odoo encuentre los registros mail.mail correctamente
+        Trace = self.env['mailing.trace']
+        traces_with_ses_ids = Trace
+        ses_refs = {}
         if bounced_msg_ids:
             # SES cambia el dominio: almacenado como @us-east-1.amazonses.com pero los rebotes llegan como @email.amazonses.com
-            # Así que necesitamos buscar solo por la parte del ID del mensaje (antes de @)
-            traces_with_ses_ids = self.env['mailing.trace']
-            
-            for bounced_id in bounced_msg_ids:
-                # Extraer solo la porción del ID de mensaje (antes de @)
-                # Example: <0100019ae9321ea7-...@email.amazonses.com> -> 0100019ae9321ea7-...
-                msg_id_part = bounced_id.strip('<>').split('@')[0]
-                _logger.info(f"[SES BOUNCE DEBUG] Searching for message ID part: {msg_id_part}")
-                
-                # Buscar rastros donde ses_message_id contenga esta parte del ID
-                traces = self.env['mailing.trace'].search([
-                    ('ses_message_id', 'ilike', msg_id_part)
-                ])
-                traces_with_ses_ids |= traces
-            
-            # DEBUG: Registrar lo que encontramos
-            _logger.info(f"[SES BOUNCE DEBUG] Found {len(traces_with_ses_ids)} traces with SES IDs")
-            if traces_with_ses_ids:
-                _logger.info(f"[SES BOUNCE DEBUG] Trace ses_message_ids: {traces_with_ses_ids.mapped('ses_message_id')}")
-                _logger.info(f"[SES BOUNCE DEBUG] Trace message_ids: {traces_with_ses_ids.mapped('message_id')}")
-            
-            # Extraer los Message-IDs originales de Odoo de los rastros coincidentes
-            original_msg_ids = traces_with_ses_ids.mapped('message_id')
-            
+            # Así que buscamos solo por la clave normalizada (antes de @): caché de correlación del worker
+            # y, para las claves que no estén, una única consulta
+            ses_refs = Trace._get_ses_trace_refs(bounced_msg_ids)
+            traces_with_ses_ids = Trace.browse(Trace._get_ses_trace_ids(ses_refs))
+
+            # Message-IDs originales de Odoo de los rastros coincidentes (sin leer los rastros)
+            original_msg_ids = [msg_id for __, msg_id in ses_refs.values() if msg_id]
+            _logger.debug("[SES BOUNCE] Bounced Message-IDs %s matched SES traces %s (original Message-IDs: %s)",
+                          bounced_msg_ids, traces_with_ses_ids.ids, original_msg_ids)
+
             # Añadir Message-IDs originales a bounced_msg_ids para que el manejador de Odoo los encuentre
             if original_msg_ids:
                 # Extender la lista con IDs originales (evitar duplicados)
-                extended_bounced_msg_ids = list(set(bounced_msg_ids + original_msg_ids))
-                message_dict['bounced_msg_ids'] = extended_bounced_msg_ids
-                _logger.info(f"[SES BOUNCE DEBUG] Extended bounced_msg_ids: {extended_bounced_msg_ids}")
+                message_dict['bounced_msg_ids'] = list(set(bounced_msg_ids + original_msg_ids))
 
         super(MailThread, self)._routing_handle_bounce(email_message, message_dict)
 
         # Respaldo: manejar rebotes directamente en mailing.trace si no se encuentran en mail.mail
+        # Los rastros SES ya se resolvieron arriba: un único write para todo el lote
         bounced_msg_ids = message_dict.get('bounced_msg_ids', [])
-        traces_by_message_id = self.env['mailing.trace'].search([('message_id', 'in', bounced_msg_ids)])
-        if bounced_msg_ids and not traces_by_message_id:
-            # Misma lógica: buscar solo por la parte del ID de mensaje
-            for bounced_id in bounced_msg_ids:
-                msg_id_part = bounced_id.strip('<>').split('@')[0]
-                self.env['mailing.trace'].set_bounced(
-                    domain=[('ses_message_id', 'ilike', msg_id_part)],
-                    bounce_message=tools.html2plaintext(message_dict.get('body') or '')
-                )
+        bounced_traces = Trace
+        if bounced_msg_ids:
+            # Los rastros de los Message-IDs originales ya se conocen y los SES Message-IDs no son
+            # Message-IDs de ningún rastro: solo se buscan los demás
+            resolved = {msg_id: trace_ids for trace_ids, msg_id in ses_refs.values() if msg_id}
+            bounced_traces = Trace.browse([trace_id for trace_ids in resolved.values() for trace_id in trace_ids])
+            unresolved = [
+                msg_id for msg_id in bounced_msg_ids
+                if msg_id not in resolved and normalize_message_id(msg_id) not in ses_refs
+            ]
+            if unresolved:
+                bounced_traces |= Trace.search([('message_id', 'in', unresolved)])
+        if bounced_msg_ids and traces_with_ses_ids and not bounced_traces:
+            traces_with_ses_ids.set_bounced(
+                bounce_message=tools.html2plaintext(message_dict.get('body') or '')
+            )
+
+        # Clasificación estructurada del rebote/queja y contadores de la campaña
+        if report and (bounced_traces or traces_with_ses_ids):
+            self._set_bounce_report_info(
+                bounced_traces | traces_with_ses_ids, report, bounced_email=message_dict.get('bounced_email'))
+
+    @api.model
+    def _filter_repeated_bounce_report(self, report, bounced_msg_ids, bounced_email):
+        """El informe sin los destinatarios ya procesados, o None si ya se procesó entero.
+
+        Cada destinatario deja una huella (Message-ID rebotado normalizado, clase, destinatario,
+        código de estado) por cada Message-ID rebotado, la misma que el evento SNS equivalente para
+        el SES Message-ID: un rebote permanente que sigue a uno temporal del mismo mensaje es nuevo.
+        Un destinatario es una repetición si alguna de sus huellas ya estaba registrada (el evento
+        SNS solo registra la del SES Message-ID). Sin consultar mailing.trace.
+        """
+        bounced_email = tools.email_normalize(bounced_email or '')
+        keys = {normalize_message_id(msg_id) for msg_id in bounced_msg_ids or []}
+        keys.discard(False)
+        if not keys:
+            return report
+        if report.report_type == 'feedback-report' or report.feedback_type:
+            entries = [(None, 'complaint', tools.email_normalize(recipient.recipient or '') or bounced_email, None)
+                       for recipient in report.recipients] or [(None, 'complaint', bounced_email, None)]
+        else:
+            entries = [(recipient, bounce_report.bounce_class(recipient.status),
+                        tools.email_normalize(recipient.recipient or '') or bounced_email, recipient.status)
+                       for recipient in report.recipients if bounce_report.bounce_class(recipient.status)]
+        if not entries:
+            return report
+        fingerprints = defaultdict(set)
+        for recipient, event_class, email, status in entries:
+            fingerprints[recipient].update(event_fingerprint(key, event_class, email, status) for key in keys)
+        new = self.env['aws.ses.event.fingerprint'].sudo()._filter_new(set().union(*fingerprints.values()))
+        new_recipients = {recipient for recipient, recipient_fingerprints in fingerprints.items()
+                          if recipient_fingerprints <= new}
+        if not new_recipients:
+            metrics.inc('ses_duplicate_events_total', source='dsn')
+            _logger.info("[SES BOUNCE] Skipping repeated notification for %s (%s)", bounced_email, ', '.join(sorted(keys)))
+            return None
+        if None in new_recipients:
+            return report
+        return report._replace(recipients=[recipient for recipient in report.recipients if recipient in new_recipients])
+
+    @api.model
+    def _get_bounce_report_details(self, report):
+        """Textos del motivo de fallo a partir del informe analizado"""
+        bounce_details = []
+        if report.feedback_type:
+            bounce_details.append(f"Complaint: {report.feedback_type}")
+            _logger.info("[SES BOUNCE] RFC 5965 Complaint: %s", report.feedback_type)
+
+        for recipient in report.recipients:
+            bounce_class = bounce_report.bounce_class(recipient.status)
+            if not bounce_class:
+                continue
+            detail = f"{bounce_class.capitalize()} Bounce (Code: {recipient.status})"
+            # Un único texto por estado aunque varios destinatarios compartan el mismo
+            if detail not in bounce_details:
+                bounce_details.append(detail)
+            _logger.info("[SES BOUNCE] RFC 3464 Status: %s (%s)", recipient.status, recipient.recipient)
+
+        # Respaldos si el análisis detallado no encontró nada pero las cabeceras coincidieron
+        if not bounce_details:
+            if report.report_type == 'feedback-report':
+                bounce_details.append("Complaint (Generic/SES)")
+            elif report.report_type == 'delivery-status':
+                bounce_details.append("Bounce (Generic/SES)")
+        return bounce_details
+
+    @api.model
+    def _set_bounce_report_info(self, traces, report, bounced_email=False):
+        """Guarda en los rastros la clase, el código de estado y el tipo de queja del informe.
+
+        Solo se clasifican (y suprimen) los rastros cuyo email es un destinatario del informe; un
+        destinatario sin dirección en el informe es el ``bounced_email`` detectado por Odoo. Solo
+        las quejas y los rebotes permanentes de la dirección (ver bounce_report.is_permanent_failure)
+        pasan a la lista de supresión.
+        """
+        bounced_email = tools.email_normalize(bounced_email or '')
+        traces_by_email = defaultdict(lambda: self.env['mailing.trace'])
+        for trace in traces:
+            traces_by_email[tools.email_normalize(trace.email or '')] |= trace
+        traces_by_email.pop(False, None)
+
+        if report.report_type == 'feedback-report' or report.feedback_type:
+            emails = {tools.email_normalize(recipient.recipient or '') or bounced_email
+                      for recipient in report.recipients} or {bounced_email}
+            complained = self.env['mailing.trace'].union(
+                *(traces_by_email[email] for email in emails if email in traces_by_email))
+            complained._set_ses_bounce_info('complaint', feedback_type=report.feedback_type, suppress=True)
+            return
+        traces_by_status = defaultdict(lambda: self.env['mailing.trace'])
+        for recipient in report.recipients:
+            if not bounce_report.bounce_class(recipient.status):
+                continue
+            email = tools.email_normalize(recipient.recipient or '') or bounced_email
+            if email in traces_by_email:
+                traces_by_status[recipient.status] |= traces_by_email[email]
+        for status, status_traces in traces_by_status.items():
+            status_traces._set_ses_bounce_info(
+                bounce_report.bounce_class(status), status_code=status,
+                suppress=bounce_report.is_permanent_failure(status))
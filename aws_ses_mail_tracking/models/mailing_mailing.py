@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.tools import SQL
+from .aws_ses_trace_deletion import MAX_LOGGED_DELETIONS
+
+# Clase de rebote de mailing.trace -> contador de mailing.mailing
+SES_COUNTER_FIELDS = {
+    'hard': 'ses_hard_bounce_count',
+    'soft': 'ses_soft_bounce_count',
+    'complaint': 'ses_complaint_count',
+}
+
+
+class MailingMailing(models.Model):
+    _inherit = 'mailing.mailing'
+
+    # Contadores agregados: se incrementan por SQL al aplicar cada rebote/queja,
+    # para no recorrer todos los rastros de la campaña con read_group
+    ses_hard_bounce_count = fields.Integer("SES Hard Bounces", default=0, readonly=True, copy=False)
+    ses_soft_bounce_count = fields.Integer("SES Soft Bounces", default=0, readonly=True, copy=False)
+    ses_complaint_count = fields.Integer("SES Complaints", default=0, readonly=True, copy=False)
+
+    def unlink(self):
+        # Sus rastros se borran en cascada (SQL): quitar de la caché de correlación los que tienen clave SES
+        # (más de MAX_LOGGED_DELETIONS: vaciado completo, ver mailing.trace._invalidate_ses_trace_cache)
+        if self:
+            self.env.cr.execute("""
+                SELECT id FROM mailing_trace
+                 WHERE mass_mailing_id IN %s AND ses_message_key IS NOT NULL
+                 LIMIT %s
+            """, (tuple(self.ids), MAX_LOGGED_DELETIONS + 1))
+            trace_ids = [row[0] for row in self.env.cr.fetchall()]
+            if trace_ids:
+                self.env['mailing.trace'].sudo().browse(trace_ids)._invalidate_ses_trace_cache()
+        return super().unlink()
+
+    @api.model
+    def _increment_ses_counters(self, deltas):
+        """Suma a los contadores SES las diferencias {mailing_id: {clase: delta}} en un único UPDATE"""
+        rows = [
+            (mailing_id, counts.get('hard', 0), counts.get('soft', 0), counts.get('complaint', 0))
+            for mailing_id, counts in deltas.items()
+        ]
+        if not rows:
+            return
+        self.flush_model(list(SES_COUNTER_FIELDS.values()))
+        self.env.cr.execute(SQL("""
+            UPDATE mailing_mailing AS mailing
+               SET ses_hard_bounce_count = mailing.ses_hard_bounce_count + data.hard,
+                   ses_soft_bounce_count = mailing.ses_soft_bounce_count + data.soft,
+                   ses_complaint_count = mailing.ses_complaint_count + data.complaint
+              FROM (VALUES %s) AS data(id, hard, soft, complaint)
+             WHERE mailing.id = data.id
+        """, SQL(", ").join(SQL("(%s, %s, %s, %s)", *row) for row in rows)))
+        self.invalidate_model(list(SES_COUNTER_FIELDS.values()))
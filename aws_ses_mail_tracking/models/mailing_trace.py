@@ -1,11 +1,338 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See LICENSE file for full copyright and licensing details.
 
+import functools
+import logging
+import threading
+from collections import defaultdict
+
 from odoo import api, fields, models
+from odoo.tools import SQL
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import metrics
+from odoo.addons.aws_ses_mail_tracking.libs.ses_tools import normalize_message_id
+from odoo.addons.aws_ses_mail_tracking.libs.trace_cache import TraceCache
+from .aws_ses_trace_deletion import MAX_LOGGED_DELETIONS
+
+_logger = logging.getLogger(__name__)
+
+# Clave del buffer de SES Message-IDs pendientes de escribir en cr.precommit.data
+SES_BUFFER_KEY = 'aws_ses_mail_tracking.ses_message_ids'
+# Pares acumulados como máximo en el buffer de un lote de mail.mail antes de escribirlos
+WRITEBACK_BATCH_SIZE = 500
+
+# Cachés de correlación SES -> rastros por base de datos (por worker)
+_trace_caches = {}
+_trace_cache_lock = threading.Lock()
 
 
 class MailingTrace(models.Model):
     _inherit = 'mailing.trace'
     _description = 'Rastreo de Correo con Soporte SES'
     
-    ses_message_id = fields.Char("SES Message-ID", index=True, help="ID de Mensaje de Amazon SES para rastreo")
\ No newline at end of file
+    ses_message_id = fields.Char("SES Message-ID", index=True, help="ID de Mensaje de Amazon SES para rastreo")
+    ses_message_key = fields.Char(
+        "SES Message Key", index='btree_not_null', readonly=True,
+        help="Parte local del SES Message-ID (sin dominio), usada para correlacionar rebotes y respuestas por igualdad exacta")
+    ses_bounce_class = fields.Selection([
+        ('hard', 'Hard Bounce'),
+        ('soft', 'Soft Bounce'),
+        ('complaint', 'Complaint'),
+    ], string="SES Bounce Class", index='btree_not_null', readonly=True)
+    ses_status_code = fields.Char("SES Status Code", index='btree_not_null', readonly=True,
+                                  help="Código de estado DSN (RFC 3464) del rebote, p. ej. 5.1.1")
+    ses_feedback_type = fields.Char("SES Feedback Type", index='btree_not_null', readonly=True,
+                                    help="Tipo de queja (RFC 5965), p. ej. abuse")
+
+    def unlink(self):
+        # Los rastros SES borrados no deben seguir en la caché de correlación de ningún worker;
+        # los que no tienen clave SES nunca entran en ella
+        ses_traces = self.filtered('ses_message_key')
+        if ses_traces:
+            ses_traces._invalidate_ses_trace_cache()
+        return super().unlink()
+
+    @api.model
+    def _get_traces_from_ses_ids(self, message_ids):
+        """Traduce una lista de Message-IDs (con o sin dominio) a rastros SES; como mucho una consulta"""
+        return self.browse(self._get_ses_trace_ids(self._get_ses_trace_refs(message_ids)))
+
+    @api.model
+    def _get_ses_trace_refs(self, message_ids, cache_misses=True):
+        """{clave SES: (ids de rastros, Message-ID de Odoo)} de una lista de Message-IDs (con o sin dominio).
+
+        Primero la caché de correlación del worker; las claves que no están se buscan en una sola
+        consulta y, salvo con ``cache_misses=False`` (importaciones históricas, que solo
+        desplazarían de la caché los envíos recientes), se añaden a la caché.
+        """
+        ses_keys = {normalize_message_id(message_id) for message_id in message_ids or []}
+        ses_keys.discard(False)
+        if not ses_keys:
+            return {}
+        cache = self._get_ses_trace_cache()
+        refs = self._get_cached_ses_trace_refs(cache, ses_keys)
+        missing = ses_keys.difference(refs)
+        if missing:
+            found = self._group_ses_trace_refs(self.search_fetch(
+                [('ses_message_key', 'in', list(missing))], ['message_id', 'ses_message_key']))
+            if cache and cache_misses:
+                cache.put_many(found.items())
+            refs.update(found)
+        return refs
+
+    @api.model
+    def _get_traces_from_references(self, message_ids):
+        """Rastros cuyo Message-ID de Odoo o SES Message-ID coincide con alguna referencia.
+
+        Las referencias que están en la caché de correlación no se consultan; el resto, en una sola consulta.
+        """
+        message_ids = [message_id for message_id in message_ids or [] if message_id]
+        if not message_ids:
+            return self.browse()
+        keys = {message_id: normalize_message_id(message_id) for message_id in message_ids}
+        cache = self._get_ses_trace_cache()
+        refs = self._get_cached_ses_trace_refs(cache, set(keys.values()) - {False})
+        traces = self.browse(self._get_ses_trace_ids(refs))
+        remaining = [message_id for message_id in message_ids if keys[message_id] not in refs]
+        if remaining:
+            ses_keys = list({keys[message_id] for message_id in remaining} - {False})
+            found = self.search_fetch(
+                ['|', ('message_id', 'in', remaining), ('ses_message_key', 'in', ses_keys)],
+                ['message_id', 'ses_message_key'])
+            if cache:
+                # Solo las claves buscadas por clave SES tienen todos sus rastros en el resultado
+                cache.put_many(item for item in self._group_ses_trace_refs(found).items() if item[0] in ses_keys)
+            traces |= found
+        return traces
+
+    @api.model
+    def _get_ses_trace_cache(self):
+        """Caché de correlación de este worker para la base de datos actual.
+
+        Devuelve None si está desactivada (parámetro ``aws_ses_mail_tracking.trace_cache_size`` = 0).
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_size = int(ICP.get_param('aws_ses_mail_tracking.trace_cache_size', 50000))
+        if max_size <= 0:
+            return None
+        ttl = int(ICP.get_param('aws_ses_mail_tracking.trace_cache_ttl', 86400))
+        Deletion = self.env['aws.ses.trace.deletion']
+        with _trace_cache_lock:
+            state = _trace_caches.get(self.env.cr.dbname)
+            if state is None:
+                state = _trace_caches[self.env.cr.dbname] = {
+                    'cache': TraceCache(max_size, ttl), 'xmin': Deletion._current_xmin(), 'applied': {},
+                }
+            cache = state['cache']
+            # Rastros borrados por otros workers: solo esos ids salen de la caché
+            xmin, deletions = Deletion._read_deletions(state['xmin'], state['applied'])
+            # Un cursor con una instantánea más antigua no ve nada que la del estado no viera
+            xmin = max(xmin, state['xmin'])
+            trace_ids = [trace_id for trace_id, __ in deletions.values()]
+            if None in trace_ids:
+                cache.clear()
+            elif trace_ids:
+                cache.discard_traces(trace_ids)
+            # Las anotaciones ya aplicadas se recuerdan mientras la consulta pueda devolverlas
+            applied = {deletion_id: xact for deletion_id, xact in state['applied'].items() if xact >= xmin}
+            applied.update((deletion_id, xact) for deletion_id, (__, xact) in deletions.items())
+            state['applied'] = applied
+            state['xmin'] = xmin
+            if (cache.max_size, cache.ttl) != (max_size, ttl):
+                cache.configure(max_size, ttl)
+        return cache
+
+    @api.model
+    def _get_cached_ses_trace_refs(self, cache, ses_keys):
+        if not cache or not ses_keys:
+            return {}
+        refs = cache.get_many(ses_keys)
+        metrics.inc('ses_trace_cache_total', len(refs), result='hit')
+        metrics.inc('ses_trace_cache_total', len(ses_keys) - len(refs), result='miss')
+        return refs
+
+    def _invalidate_ses_trace_cache(self):
+        """Quita estos rastros de la caché de este worker y los anota para que los quiten los demás.
+
+        Solo se invalidan estos ids: el resto de las cachés sigue intacto. Por encima de
+        MAX_LOGGED_DELETIONS rastros se anota un vaciado completo en lugar de cada id.
+        """
+        state = _trace_caches.get(self.env.cr.dbname)
+        if len(self) > MAX_LOGGED_DELETIONS:
+            if state:
+                state['cache'].clear()
+            self.env['aws.ses.trace.deletion']._log_deletions(None)
+            return
+        if state:
+            state['cache'].discard_traces(self.ids)
+        self.env['aws.ses.trace.deletion']._log_deletions(self.ids)
+
+    @api.model
+    def _group_ses_trace_refs(self, traces):
+        """{clave SES: (ids, Message-ID de Odoo)} de unos rastros ya leídos"""
+        refs = {}
+        for trace in traces:
+            if trace.ses_message_key:
+                trace_ids = refs.get(trace.ses_message_key, ((), trace.message_id))[0]
+                refs[trace.ses_message_key] = (trace_ids + (trace.id,), trace.message_id)
+        return refs
+
+    @api.model
+    def _get_ses_trace_ids(self, refs):
+        return [trace_id for trace_ids, __ in refs.values() for trace_id in trace_ids]
+
+    def _set_replied_opened(self):
+        """Equivale a set_opened() seguido de set_replied(), escribiendo ambos estados a la vez.
+
+        Solo los rastros aún no abiertos reciben open_datetime, como en set_opened().
+        """
+        now = fields.Datetime.now()
+        not_opened = self.filtered(lambda trace: trace.trace_status not in ('open', 'reply'))
+        not_opened.write({'trace_status': 'reply', 'open_datetime': now, 'reply_datetime': now})
+        (self - not_opened).write({'trace_status': 'reply', 'reply_datetime': now})
+        return self
+
+    @api.model
+    def _set_ses_event_dates(self, open_dates, click_dates):
+        """Sustituye las fechas de apertura y clic que acaban de poner set_opened()/set_clicked()
+        por las de los eventos SES, en un único UPDATE.
+
+        ``open_dates`` y ``click_dates`` son {id de rastro: fecha del evento}. La apertura se queda
+        con la más antigua entre la guardada y la del evento; el clic, con la del evento.
+        """
+        trace_ids = set(open_dates) | set(click_dates)
+        if not trace_ids:
+            return
+        self.flush_model(['open_datetime', 'links_click_datetime'])
+        self.env.cr.execute(SQL("""
+            UPDATE mailing_trace AS trace
+               SET open_datetime = LEAST(trace.open_datetime, data.opened),
+                   links_click_datetime = COALESCE(data.clicked, trace.links_click_datetime)
+              FROM (VALUES %s) AS data(id, opened, clicked)
+             WHERE trace.id = data.id
+        """, SQL(", ").join(
+            SQL("(%s, %s::timestamp, %s::timestamp)", trace_id, open_dates.get(trace_id), click_dates.get(trace_id))
+            for trace_id in sorted(trace_ids))))
+        self.browse(trace_ids).invalidate_recordset(['open_datetime', 'links_click_datetime'])
+
+    @api.model
+    def _buffer_ses_message_id(self, message_id, ses_message_id):
+        """Acumula el par (Message-ID de Odoo -> SES Message-ID) para escribirlo en bloque.
+
+        Dentro de un lote de mail.mail (contexto ``ses_message_id_buffer``, ver mail.mail._send)
+        el buffer es del lote: sobrevive a los commits del cron tras cada correo y se vacía al
+        terminar el lote o al llegar a ``ses_message_id_flush_size`` pares. Cada par se guarda
+        además en aws.ses.pending.message (un INSERT sin índices de mailing.trace) en la misma
+        transacción que marca el correo como enviado: si el proceso muere antes de vaciar el
+        buffer, el cron de pendientes lo recupera. Fuera de un lote vive en la transacción actual
+        y se vacía justo antes del commit.
+        """
+        buffer = self.env.context.get('ses_message_id_buffer')
+        if buffer is None:
+            data = self.env.cr.precommit.data
+            if SES_BUFFER_KEY not in data:
+                data[SES_BUFFER_KEY] = {}
+                self.env.cr.precommit.add(self._flush_ses_message_ids)
+            data[SES_BUFFER_KEY][message_id] = ses_message_id
+            return
+        self.env['aws.ses.pending.message']._store_pending([(message_id, ses_message_id)])
+        buffer[message_id] = ses_message_id
+        if len(buffer) >= self.env.context.get('ses_message_id_flush_size', WRITEBACK_BATCH_SIZE):
+            self._flush_ses_message_ids(buffer)
+
+    def _flush_ses_message_ids(self, buffer=None):
+        """Escribe en un único UPDATE los SES Message-IDs de ``buffer`` (o los acumulados en la transacción).
+
+        Los pares de un buffer de lote ya están en aws.ses.pending.message: se borran de allí en la
+        misma transacción que el UPDATE.
+        """
+        persisted = buffer is not None
+        if buffer is None:
+            buffer = self.env.cr.precommit.data.pop(SES_BUFFER_KEY, None)
+        if not buffer:
+            return
+        pairs = list(buffer.items())
+        buffer.clear()
+        Pending = self.env['aws.ses.pending.message']
+        try:
+            with self.env.cr.savepoint(flush=False):
+                matched = self._write_ses_message_ids(pairs)
+                if persisted:
+                    Pending._remove_pending(pairs)
+        except Exception as e:
+            # No perder la correspondencia: queda guardada para que el cron la reintente
+            _logger.error("[SES SEND] Could not store %s SES Message-IDs, keeping them as pending: %s", len(pairs), e)
+            if not persisted:
+                Pending._store_pending(pairs)
+            return
+        _logger.info("[SES SEND] Stored %s SES Message-IDs (%s mailing.trace records matched)", len(pairs), len(matched))
+
+    @api.model
+    def _write_ses_message_ids(self, pairs):
+        """UPDATE en bloque de ses_message_id/ses_message_key a partir de pares (message_id, ses_message_id).
+
+        Devuelve el conjunto de Message-IDs de Odoo que encontraron algún rastro. Tras el commit,
+        los rastros actualizados pasan a la caché de correlación, donde los buscarán sus rebotes.
+        """
+        rows = [(message_id, ses_message_id, normalize_message_id(ses_message_id))
+                for message_id, ses_message_id in pairs]
+        with metrics.timer('ses_phase_seconds', phase='writeback'):
+            self.env.cr.execute(SQL("""
+                UPDATE mailing_trace AS trace
+                   SET ses_message_id = data.ses_message_id,
+                       ses_message_key = data.ses_message_key,
+                       write_uid = %s,
+                       write_date = (now() at time zone 'UTC')
+                  FROM (VALUES %s) AS data(message_id, ses_message_id, ses_message_key)
+                 WHERE trace.message_id = data.message_id
+             RETURNING trace.message_id, trace.id, data.ses_message_key
+            """, self.env.uid, SQL(", ").join(SQL("(%s, %s, %s)", *row) for row in rows)))
+            matched = self.env.cr.fetchall()
+        metrics.inc('ses_traces_written_total', len(matched))
+        self.invalidate_model(['ses_message_id', 'ses_message_key', 'write_uid', 'write_date'])
+        cache = self._get_ses_trace_cache()
+        if cache and matched:
+            refs = {}
+            for message_id, trace_id, ses_key in matched:
+                refs[ses_key] = (refs.get(ses_key, ((),))[0] + (trace_id,), message_id)
+            self.env.cr.postcommit.add(functools.partial(cache.put_many, list(refs.items())))
+        return {row[0] for row in matched}
+
+    def _set_ses_bounce_info(self, bounce_class, status_code=False, feedback_type=False, suppress=False):
+        """Guarda la clasificación del rebote/queja y actualiza los contadores de mailing.mailing.
+
+        Un único UPDATE sobre los rastros devuelve la clase anterior de cada uno, de modo que los
+        contadores de la campaña se ajustan por diferencia (una clase que cambia resta de la
+        anterior y suma a la nueva) y reaplicar el mismo evento no los altera. Con ``suppress``
+        (rebote permanente de la dirección o queja) sus direcciones pasan a la lista de supresión.
+        """
+        if not self or not bounce_class:
+            return
+        self.flush_recordset(['mass_mailing_id', 'ses_bounce_class', 'ses_status_code', 'ses_feedback_type'])
+        self.env.cr.execute("""
+            UPDATE mailing_trace AS trace
+               SET ses_bounce_class = %s,
+                   ses_status_code = %s,
+                   ses_feedback_type = %s
+              FROM (SELECT id, ses_bounce_class FROM mailing_trace WHERE id IN %s FOR UPDATE) AS old
+             WHERE trace.id = old.id
+               AND (trace.ses_bounce_class, trace.ses_status_code, trace.ses_feedback_type)
+                   IS DISTINCT FROM (%s, %s, %s)
+         RETURNING trace.mass_mailing_id, old.ses_bounce_class
+        """, (bounce_class, status_code or None, feedback_type or None, tuple(self.ids),
+              bounce_class, status_code or None, feedback_type or None))
+        rows = self.env.cr.fetchall()
+        self.invalidate_recordset(['ses_bounce_class', 'ses_status_code', 'ses_feedback_type'])
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for mailing_id, old_class in rows:
+            if not mailing_id or old_class == bounce_class:
+                continue
+            deltas[mailing_id][bounce_class] += 1
+            if old_class:
+                deltas[mailing_id][old_class] -= 1
+        if deltas:
+            self.env['mailing.mailing']._increment_ses_counters(deltas)
+
+        # Rebote permanente o queja: no volver a enviar a esas direcciones
+        if suppress:
+            self.env['aws.ses.suppression']._suppress(self.mapped('email'), bounce_class)
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+from . import test_ses_events
+from . import test_bounce_report
+from . import test_smtplib_inherit
+from . import test_smtp_pool
+from . import test_aws_ses_event
+from . import test_aws_ses_suppression
+from . import test_aws_ses_metric
+from . import test_sns_controller
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import base64
+import datetime
+import email
+import email.policy
+import json
+import socketserver
+import threading
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import NameOID
+
+from odoo.tools import file_open
+from odoo.addons.aws_ses_mail_tracking.libs.ses_events import SNS_SIGNATURE_HASHES, SNS_SIGNED_KEYS
+
+
+def load_sns_fixture(name):
+    """Sobre SNS grabado de tests/data/<name>.json (con la firma original de AWS)"""
+    with file_open(f'aws_ses_mail_tracking/tests/data/{name}.json') as fixture:
+        return json.load(fixture)
+
+
+def load_eml_fixture(name):
+    """Correo de tests/data/<name>.eml (copia de benchmarks/corpus), parseado como el correo entrante de Odoo"""
+    with file_open(f'aws_ses_mail_tracking/tests/data/{name}.eml', 'rb') as fixture:
+        return email.message_from_bytes(fixture.read(), policy=email.policy.SMTP)
+
+
+class SnsSigner:
+    """Sustituto de la firma de SNS: una clave RSA y un certificado autofirmado propios.
+
+    ``sign`` vuelve a firmar un sobre grabado como lo haría SNS y ``get_certificate`` sustituye
+    a la descarga del certificado de SigningCertURL.
+    """
+
+    CERT_URL = 'https://sns.us-east-1.amazonaws.com/SimpleNotificationService-odoo-test.pem'
+
+    def __init__(self):
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'sns.amazonaws.com')])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self.key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(self.key, hashes.SHA256())
+        )
+        self.certificate = certificate.public_bytes(serialization.Encoding.PEM)
+        self.requested_urls = []
+
+    def sign(self, message, version='1'):
+        signed = dict(message, SignatureVersion=version, SigningCertURL=self.CERT_URL)
+        string_to_sign = ''.join(
+            f"{key}\n{signed[key]}\n" for key in SNS_SIGNED_KEYS[signed['Type']] if key in signed)
+        signature = self.key.sign(
+            string_to_sign.encode('utf-8'), padding.PKCS1v15(), SNS_SIGNATURE_HASHES[version]())
+        signed['Signature'] = base64.b64encode(signature).decode()
+        return signed
+
+    def get_certificate(self, url):
+        self.requested_urls.append(url)
+        return self.certificate
+
+
+class StubSMTPServer:
+    """Servidor SMTP mínimo en un hilo, con respuestas configurables por comando.
+
+    ``replies`` sustituye la respuesta por defecto de un verbo (``'MAIL'``, ``'DATA'``...) o de
+    un destinatario concreto (``'RCPT <addr>'``); la de ``'DATA'`` es la del final del mensaje.
+    Registra los comandos recibidos, los que llegaron en cada lectura del socket (``chunks``,
+    para comprobar el pipelining) y el contenido de DATA tal como llegó (``data``, con el
+    escapado de puntos).
+    """
+
+    def __init__(self, pipelining=True, replies=None):
+        self.pipelining = pipelining
+        self.replies = dict(replies or {})
+        self.commands = []
+        self.chunks = []
+        self.data = []
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+
+            def handle(self):
+                stub._handle(self.request)
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _reply(self, key, default):
+        return self.replies.get(key, default)
+
+    def _handle(self, sock):
+        buffer = b''
+        data = None
+
+        def send(line):
+            sock.sendall(line.encode('ascii') + b'\r\n')
+
+        send("220 stub.example.com ESMTP")
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                return
+            buffer += chunk
+            *lines, buffer = buffer.split(b'\r\n')
+            commands = []
+            for line in lines:
+                if data is not None:
+                    if line == b'.':
+                        self.data.append(b'\r\n'.join(data) + b'\r\n')
+                        data = None
+                        send(self._reply('DATA', "250 Ok 0100018c2b4e5f6a-stub-000000"))
+                    else:
+                        data.append(line)
+                    continue
+                command = line.decode('ascii', 'replace')
+                commands.append(command)
+                self.commands.append(command)
+                verb = command.split(' ', 1)[0].upper()
+                if verb == 'EHLO':
+                    extensions = ['250-stub.example.com', '250-8BITMIME', '250-SIZE 10485760']
+                    if self.pipelining:
+                        extensions.append('250-PIPELINING')
+                    sock.sendall('\r\n'.join(extensions).encode('ascii') + b'\r\n')
+                    send("250 HELP")
+                elif verb == 'MAIL':
+                    send(self._reply('MAIL', "250 Ok"))
+                elif verb == 'RCPT':
+                    address = command.split(':', 1)[1].strip()
+                    send(self._reply('RCPT %s' % address, self._reply('RCPT', "250 Ok")))
+                elif verb == 'DATA':
+                    reply = self._reply('DATA_START', "354 End data with <CR><LF>.<CR><LF>")
+                    send(reply)
+                    if reply.startswith('354'):
+                        data = []
+                elif verb == 'QUIT':
+                    send("221 Bye")
+                    return
+                else:
+                    send(self._reply(verb, "250 Ok"))
+                if self._reply(verb, '').startswith('421'):
+                    return
+            if commands:
+                self.chunks.append(commands)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+import email
+import json
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase, tagged
+from odoo.tools import mute_logger
+from odoo.addons.aws_ses_mail_tracking.libs.bounce_report import BounceReport, RecipientStatus
+from odoo.addons.aws_ses_mail_tracking.libs.ses_events import parse_ses_event
+from odoo.addons.aws_ses_mail_tracking.libs.ses_retry import TemporaryFailure
+from odoo.addons.aws_ses_mail_tracking.models import aws_ses_event_fingerprint, mailing_trace
+from .common import load_sns_fixture
+
+SES_MESSAGE_ID = '<0100018c2b4e5f6a-1a2b3c4d-5e6f-4a7b-8c9d-0e1f2a3b4c5d-000000@email.amazonses.com>'
+ODOO_MESSAGE_ID = '<157.1710234903.841752529411478-openerp-mailing-12@odoo.example.com>'
+
+DSN = """From: MAILER-DAEMON@amazonses.com
+To: bounce@odoo.example.com
+Subject: Delivery Status Notification (Failure)
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="dsn"
+
+--dsn
+Content-Type: text/plain
+
+An error occurred while trying to deliver the mail to the following recipients:
+recipient@example.net
+
+--dsn
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; a8-30.smtp-out.amazonses.com
+
+Final-Recipient: rfc822; recipient@example.net
+Action: failed
+Status: 5.1.1
+Diagnostic-Code: smtp; 550 5.1.1 user unknown
+
+--dsn
+Content-Type: text/rfc822-headers
+
+Message-ID: %s
+
+--dsn--
+""" % SES_MESSAGE_ID
+
+
+@tagged('aws_ses')
+class TestAwsSesEvent(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partner = cls.env['res.partner'].create({'name': 'Recipient', 'email': 'recipient@example.net'})
+        cls.mailing = cls.env['mailing.mailing'].create({
+            'subject': 'Spring offers',
+            'mailing_model_id': cls.env['ir.model']._get_id('res.partner'),
+            'body_html': '<p>Spring offers</p>',
+        })
+        cls.trace = cls.env['mailing.trace'].create({
+            'trace_type': 'mail',
+            'trace_status': 'sent',
+            'model': 'res.partner',
+            'res_id': cls.partner.id,
+            'mass_mailing_id': cls.mailing.id,
+            'email': cls.partner.email,
+            'message_id': ODOO_MESSAGE_ID,
+        })
+        cls.env['mailing.trace']._write_ses_message_ids([(ODOO_MESSAGE_ID, SES_MESSAGE_ID)])
+
+    def setUp(self):
+        super().setUp()
+        # Cachés por worker: no deben arrastrar rastros ni huellas de otros tests (que se deshacen)
+        self.patch(mailing_trace, '_trace_caches', {})
+        self.patch(aws_ses_event_fingerprint, '_recent_fingerprints', {})
+
+    def _apply(self, *names):
+        events = [event for name in names for event in parse_ses_event(json.loads(load_sns_fixture(name)['Message']))]
+        return self.env['aws.ses.event']._apply_to_traces(events)
+
+    def test_write_ses_message_id(self):
+        self.assertEqual(self.trace.ses_message_id, SES_MESSAGE_ID)
+        self.assertEqual(self.trace.ses_message_key, '0100018c2b4e5f6a-1a2b3c4d-5e6f-4a7b-8c9d-0e1f2a3b4c5d-000000')
+
+    def test_apply_hard_bounce(self):
+        self.assertEqual(self._apply('sns_bounce_permanent'), self.trace)
+        self.assertEqual(self.trace.trace_status, 'bounce')
+        self.assertIn('SES Report: Hard Bounce (Code: 5.1.1)', self.trace.failure_reason)
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_status_code), ('hard', '5.1.1'))
+        self.assertEqual(self.mailing.ses_hard_bounce_count, 1)
+        self.assertTrue(self.env['aws.ses.suppression'].search([('email', '=', 'recipient@example.net')]))
+
+    def test_apply_soft_bounce(self):
+        self._apply('sns_bounce_transient')
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_status_code), ('soft', '4.2.2'))
+        self.assertEqual(self.mailing.ses_soft_bounce_count, 1)
+        self.assertFalse(self.env['aws.ses.suppression'].search([('email', '=', 'recipient@example.net')]))
+
+    def test_apply_policy_bounce_not_suppressed(self):
+        # 5.7.1 (rechazo por política) depende del mensaje, no de la dirección
+        envelope = load_sns_fixture('sns_bounce_permanent')
+        events = parse_ses_event(json.loads(envelope['Message']))
+        events[0].update(status_code='5.7.1', diagnostic_code='smtp; 550 5.7.1 Message rejected')
+        self.env['aws.ses.event']._apply_to_traces(events)
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_status_code), ('hard', '5.7.1'))
+        self.assertFalse(self.env['aws.ses.suppression'].search([('email', '=', 'recipient@example.net')]))
+
+    def test_apply_bounce_other_recipient(self):
+        # Solo se clasifica y suprime el rastro del destinatario del evento
+        envelope = load_sns_fixture('sns_bounce_permanent')
+        events = parse_ses_event(json.loads(envelope['Message']))
+        events[0]['recipient'] = 'someone.else@example.net'
+        self.env['aws.ses.event']._apply_to_traces(events)
+        self.assertFalse(self.trace.ses_bounce_class)
+        self.assertFalse(self.env['aws.ses.suppression'].search([]))
+
+    def test_apply_complaint(self):
+        self._apply('sns_complaint')
+        self.assertEqual(self.trace.trace_status, 'bounce')
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_feedback_type), ('complaint', 'abuse'))
+        self.assertEqual(self.mailing.ses_complaint_count, 1)
+
+    def test_apply_repeated_bounce(self):
+        self._apply('sns_bounce_permanent', 'sns_bounce_permanent')
+        self._apply('sns_bounce_permanent')
+        self.assertEqual(self.mailing.ses_hard_bounce_count, 1)
+        self.assertEqual(self.env['aws.ses.event.fingerprint'].search_count([]), 1)
+
+    def test_apply_hard_after_soft_bounce(self):
+        # Un rebote permanente del mismo mensaje y destinatario tras uno temporal no es una repetición
+        self._apply('sns_bounce_transient')
+        self._apply('sns_bounce_permanent')
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_status_code), ('hard', '5.1.1'))
+        self.assertEqual((self.mailing.ses_soft_bounce_count, self.mailing.ses_hard_bounce_count), (0, 1))
+        self.assertEqual(self.env['aws.ses.event.fingerprint'].search_count([]), 2)
+
+    def test_dsn_repeated_report(self):
+        MailThread = self.env['mail.thread']
+        keys = [SES_MESSAGE_ID]
+        soft = BounceReport('delivery-status', None, [RecipientStatus('recipient@example.net', 'delayed', '4.2.2', None)])
+        hard = BounceReport('delivery-status', None, [RecipientStatus('recipient@example.net', 'failed', '5.1.1', None)])
+        self.assertEqual(MailThread._filter_repeated_bounce_report(soft, keys, 'recipient@example.net'), soft)
+        self.assertIsNone(MailThread._filter_repeated_bounce_report(soft, keys, 'recipient@example.net'))
+        self.assertEqual(MailThread._filter_repeated_bounce_report(hard, keys, 'recipient@example.net'), hard)
+        # Ya llegado por SNS: misma huella
+        self._apply('sns_bounce_permanent')
+        self.assertEqual(self.env['aws.ses.event.fingerprint'].search_count([]), 2)
+
+    def test_dsn_repeated_routing(self):
+        # La segunda copia del mismo DSN sale antes del manejo estándar: sin escribir rastros ni el contacto
+        def message_dict():
+            return {
+                'bounced_email': 'recipient@example.net',
+                'bounced_partner': self.partner,
+                'bounced_msg_ids': [SES_MESSAGE_ID],
+                'bounced_message': self.env['mail.message'],
+                'body': '',
+            }
+
+        Trace, Partner = type(self.env['mailing.trace']), type(self.env['res.partner'])
+        MailThread = self.env['mail.thread']
+        with patch.object(Trace, 'write', autospec=True, side_effect=Trace.write) as trace_write, \
+                patch.object(Partner, 'write', autospec=True, side_effect=Partner.write) as partner_write:
+            MailThread._routing_handle_bounce(email.message_from_string(DSN), message_dict())
+            self.assertTrue(trace_write.called)
+            self.assertEqual(self.trace.trace_status, 'bounce')
+            self.assertEqual(self.mailing.ses_hard_bounce_count, 1)
+            message_bounce = self.partner.message_bounce
+            trace_write.reset_mock()
+            partner_write.reset_mock()
+            MailThread._routing_handle_bounce(email.message_from_string(DSN), message_dict())
+            self.assertFalse(trace_write.called)
+            self.assertFalse(partner_write.called)
+        self.assertEqual(self.partner.message_bounce, message_bounce)
+        self.assertEqual(self.mailing.ses_hard_bounce_count, 1)
+
+    def test_apply_open_click_dates(self):
+        # Las fechas son las de los eventos, no las de su procesamiento
+        self._apply('sns_open')
+        self.assertEqual(self.trace.trace_status, 'open')
+        self.assertEqual(self.trace.open_datetime, datetime(2024, 3, 12, 10, 42, 30))
+        self._apply('sns_click')
+        self.assertEqual(self.trace.open_datetime, datetime(2024, 3, 12, 10, 42, 30))
+        self.assertEqual(self.trace.links_click_datetime, datetime(2024, 3, 12, 10, 43, 12))
+
+    def test_apply_click_before_open(self):
+        # El clic llega antes que la apertura (orden de SNS no garantizado): la apertura es la más antigua
+        self._apply('sns_click', 'sns_open')
+        self.assertEqual(self.trace.open_datetime, datetime(2024, 3, 12, 10, 42, 30))
+        self.assertEqual(self.trace.links_click_datetime, datetime(2024, 3, 12, 10, 43, 12))
+
+    def test_dsn_report_recipients(self):
+        # DSN: solo el rastro del destinatario del informe, y solo un estado permanente suprime
+        other = self.env['mailing.trace'].create({
+            'trace_type': 'mail',
+            'model': 'res.partner',
+            'res_id': self.partner.id,
+            'mass_mailing_id': self.mailing.id,
+            'email': 'other@example.net',
+            'message_id': '<other@odoo.example.com>',
+        })
+        report = BounceReport('delivery-status', None, [
+            RecipientStatus('Recipient@Example.net', 'failed', '5.1.1', None),
+            RecipientStatus(None, 'failed', '5.7.1', None),
+        ])
+        self.env['mail.thread']._set_bounce_report_info(self.trace | other, report, bounced_email='other@example.net')
+        self.assertEqual((self.trace.ses_bounce_class, self.trace.ses_status_code), ('hard', '5.1.1'))
+        self.assertEqual((other.ses_bounce_class, other.ses_status_code), ('hard', '5.7.1'))
+        self.assertEqual(self.env['aws.ses.suppression'].search([]).mapped('email'), ['recipient@example.net'])
+
+    def test_cron_process_events(self):
+        envelope = load_sns_fixture('sns_bounce_permanent')
+        self.env['aws.ses.event']._enqueue(parse_ses_event(json.loads(envelope['Message'])))
+        self.env['aws.ses.event']._cron_process_events(auto_commit=False)
+        self.assertFalse(self.env['aws.ses.event'].search([]))
+        self.assertEqual(self.trace.ses_bounce_class, 'hard')
+
+    def test_import_event_file_not_cached(self):
+        # Una importación histórica no debe llenar la caché de correlación de los envíos recientes
+        envelope = load_sns_fixture('sns_bounce_permanent')
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as event_file:
+            event_file.write(envelope['Message'] + '\n')
+        self.addCleanup(os.unlink, event_file.name)
+        result = self.env['aws.ses.event']._import_event_file(event_file.name, auto_commit=False)
+        self.assertEqual(result['rows'], 1)
+        self.assertEqual(self.trace.ses_bounce_class, 'hard')
+        self.assertFalse(len(self.env['mailing.trace']._get_ses_trace_cache()))
+
+    def test_unlink_cache_invalidation(self):
+        Deletion = self.env['aws.ses.trace.deletion']
+        # Sin rastros SES (o sin rastros) no se anota nada para los demás workers
+        self.env['mailing.trace'].browse().unlink()
+        self.env['mailing.trace'].create({
+            'trace_type': 'mail', 'model': 'res.partner', 'res_id': self.partner.id, 'email': self.partner.email,
+        }).unlink()
+        self.env['mailing.mailing'].create({
+            'subject': 'Without SES', 'mailing_model_id': self.env['ir.model']._get_id('res.partner'),
+        }).unlink()
+        self.assertFalse(Deletion.search_count([]))
+        self.mailing.unlink()
+        self.assertEqual(Deletion.search([]).mapped('trace_id'), [self.trace.id])
+
+    def test_cache_other_worker_deletion(self):
+        # Un borrado en otro worker solo quita de esta caché los rastros borrados
+        Trace = self.env['mailing.trace']
+        other = Trace.create({
+            'trace_type': 'mail', 'model': 'res.partner', 'res_id': self.partner.id,
+            'mass_mailing_id': self.mailing.id, 'email': 'other@example.net', 'message_id': '<other@odoo.example.com>',
+        })
+        Trace._write_ses_message_ids([('<other@odoo.example.com>', '<ses-other@eu-west-1.amazonses.com>')])
+        Trace._get_ses_trace_refs([SES_MESSAGE_ID, '<ses-other@eu-west-1.amazonses.com>'])
+        self.assertEqual(len(Trace._get_ses_trace_cache()), 2)
+        self.env['aws.ses.trace.deletion']._log_deletions(other.ids)
+        cache = Trace._get_ses_trace_cache()
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(list(cache.get_many(['ses-other', SES_MESSAGE_ID[1:SES_MESSAGE_ID.index('@')]]).values()),
+                         [((self.trace.id,), ODOO_MESSAGE_ID)])
+        # Borrado por encima de MAX_LOGGED_DELETIONS: vaciado completo
+        self.env['aws.ses.trace.deletion']._log_deletions(None)
+        self.assertFalse(len(Trace._get_ses_trace_cache()))
+
+    def test_writeback_batch_pending(self):
+        # Cada par de un lote se guarda como pendiente con su correo: un proceso que muere antes de
+        # vaciar el buffer no lo pierde
+        Trace, Pending = self.env['mailing.trace'], self.env['aws.ses.pending.message']
+        traces = Trace.create([{
+            'trace_type': 'mail', 'model': 'res.partner', 'res_id': self.partner.id,
+            'mass_mailing_id': self.mailing.id, 'email': self.partner.email,
+            'message_id': '<batch.%s@odoo.example.com>' % index,
+        } for index in range(2)])
+        buffer = {}
+        batch = Trace.with_context(ses_message_id_buffer=buffer, ses_message_id_flush_size=500)
+        for index in range(2):
+            batch._buffer_ses_message_id('<batch.%s@odoo.example.com>' % index, '<ses-batch-%s@eu-west-1.amazonses.com>' % index)
+        self.assertEqual(Pending.search_count([]), 2)
+        self.assertFalse(any(traces.mapped('ses_message_id')))
+        # Proceso muerto: el buffer se pierde, el cron de pendientes recupera los pares
+        Pending._cron_flush_pending()
+        self.assertEqual(traces[0].ses_message_key, 'ses-batch-0')
+        self.assertFalse(Pending.search_count([]))
+
+        batch._buffer_ses_message_id('<batch.1@odoo.example.com>', '<ses-batch-1b@eu-west-1.amazonses.com>')
+        Trace._flush_ses_message_ids(buffer)
+        self.assertEqual(traces[1].ses_message_key, 'ses-batch-1b')
+        self.assertFalse(Pending.search_count([]))
+
+    def test_send_temporary_failure(self):
+        # Un correo con throttling más allá de la espera máxima vuelve a la cola sin abandonar el lote
+        mails = self.env['mail.mail'].create([{
+            'subject': 'Spring offers',
+            'body_html': '<p>Spring offers</p>',
+            'email_to': 'user%s@example.net' % index,
+            'auto_delete': False,
+        } for index in range(3)])
+        throttled = mails[1].message_id
+
+        def send_email(mail_server, message, *args, **kwargs):
+            if message['Message-Id'] == throttled:
+                raise TemporaryFailure("SMTPSenderRefused: (454, b'Throttling failure: Maximum sending rate exceeded.')",
+                                       message_id=throttled, retry_after=120)
+            return message['Message-Id']
+
+        MailServer = type(self.env['ir.mail_server'])
+        with patch.object(MailServer, 'send_email', autospec=True, side_effect=send_email) as send, \
+                mute_logger('odoo.addons.mail.models.mail_mail'):
+            mails._send()
+        self.assertEqual(send.call_count, 3)
+        self.assertEqual(mails.mapped('state'), ['sent', 'outgoing', 'sent'])
+        self.assertIn('Throttling failure', mails[1].failure_reason)
+        self.assertGreater(mails[1].scheduled_date, datetime.now())
+        self.assertFalse(mails[0].scheduled_date)
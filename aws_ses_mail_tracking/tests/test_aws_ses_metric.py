@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import MetricsRegistry
+from odoo.addons.aws_ses_mail_tracking.models import aws_ses_metric
+
+
+@tagged('aws_ses')
+class TestAwsSesMetric(TransactionCase):
+
+    def setUp(self):
+        super().setUp()
+        self.worker = MetricsRegistry(enabled=True)
+        self.patch(aws_ses_metric, 'metrics', self.worker)
+
+    def test_drain_merge(self):
+        other = MetricsRegistry(enabled=True)
+        for registry in (self.worker, other):
+            registry.inc('ses_messages_total')
+            registry.inc('ses_replies_total', command='data', code=250)
+        self.worker.observe('ses_phase_seconds', 0.003, phase='data')
+        other.observe('ses_phase_seconds', 20, phase='data')
+        total = MetricsRegistry()
+        total.merge(self.worker.drain())
+        total.merge(other.drain())
+        self.assertFalse(self.worker.drain())
+        snapshot = total.snapshot()
+        self.assertEqual(snapshot['counters']['ses_messages_total'], [{'labels': {}, 'value': 2}])
+        histogram = snapshot['histograms']['ses_phase_seconds'][0]
+        self.assertEqual(histogram['count'], 2)
+        self.assertEqual(histogram['buckets']['0.005'], 1)
+        self.assertEqual(histogram['buckets']['+Inf'], 2)
+
+    def test_flush_accumulates(self):
+        """Los volcados de varios procesos se suman y los totales no retroceden al reiniciar un worker"""
+        Metric = self.env['aws.ses.metric']
+        self.worker.inc('ses_messages_total', value=3)
+        Metric._flush_metrics()
+        # Worker reiniciado: registro nuevo, los totales siguen en la tabla
+        self.worker.reset()
+        self.worker.inc('ses_messages_total', value=2)
+        self.worker.observe('ses_phase_seconds', 0.2, phase='writeback')
+        registry = Metric._get_registry()
+        self.assertEqual(registry.snapshot()['counters']['ses_messages_total'], [{'labels': {}, 'value': 5}])
+        self.assertIn('ses_phase_seconds_count{phase="writeback"} 1', registry.render_prometheus())
+        self.assertFalse(self.worker.drain())
+
+    def test_flush_interval(self):
+        Metric = self.env['aws.ses.metric']
+        self.worker.inc('ses_messages_total')
+        Metric._flush_metrics(min_interval=3600)
+        self.assertFalse(Metric.search_count([]))
+        Metric._flush_metrics()
+        self.assertEqual(Metric.search([('name', '=', 'ses_messages_total')]).value, 1)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+from email.message import EmailMessage
+
+from odoo.addons.base.models.ir_mail_server import MailDeliveryException
+from odoo.tests import TransactionCase, tagged
+from odoo.addons.aws_ses_mail_tracking.models import aws_ses_suppression
+
+
+@tagged('aws_ses')
+class TestAwsSesSuppression(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.ses_server = cls.env['ir.mail_server'].create({
+            'name': 'SES',
+            'smtp_host': 'email-smtp.eu-west-1.amazonaws.com',
+            'smtp_encryption': 'starttls',
+            'smtp_port': 587,
+        })
+        cls.other_server = cls.env['ir.mail_server'].create({
+            'name': 'Relay',
+            'smtp_host': 'smtp.example.com',
+            'smtp_port': 25,
+        })
+        cls.env['aws.ses.suppression'].create({'email': ' Bounced@Example.NET ', 'reason': 'hard'})
+
+    def setUp(self):
+        super().setUp()
+        self.patch(aws_ses_suppression, '_suppression_indexes', {})
+
+    def _message(self, to, message_id='<transactional.1@odoo.example.com>'):
+        message = EmailMessage()
+        message['From'] = 'news@example.com'
+        message['To'] = to
+        message['Message-Id'] = message_id
+        return message
+
+    def test_normalized(self):
+        self.assertEqual(self.env['aws.ses.suppression'].search([]).email, 'bounced@example.net')
+
+    def test_ses_server(self):
+        IrMailServer = self.env['ir.mail_server']
+        suppressed = IrMailServer._get_suppressed_recipients(
+            self._message('bounced@example.net, ok@example.net'), mail_server_id=self.ses_server.id)
+        self.assertEqual(suppressed, {'bounced@example.net'})
+        with self.assertRaises(MailDeliveryException):
+            IrMailServer._get_suppressed_recipients(
+                self._message('bounced@example.net'), mail_server_id=self.ses_server.id)
+
+    def test_other_server(self):
+        # Correo transaccional por un servidor que no es SES: no se filtra
+        suppressed = self.env['ir.mail_server']._get_suppressed_recipients(
+            self._message('bounced@example.net'), mail_server_id=self.other_server.id)
+        self.assertEqual(suppressed, set())
+
+    def test_mass_mailing_other_server(self):
+        message_id = '<mailing.1@odoo.example.com>'
+        partner = self.env['res.partner'].create({'name': 'Bounced', 'email': 'bounced@example.net'})
+        self.env['mailing.trace'].create({
+            'trace_type': 'mail',
+            'model': 'res.partner',
+            'res_id': partner.id,
+            'email': partner.email,
+            'message_id': message_id,
+        })
+        with self.assertRaises(MailDeliveryException):
+            self.env['ir.mail_server']._get_suppressed_recipients(
+                self._message('bounced@example.net', message_id), mail_server_id=self.other_server.id)
+
+    def test_unsuppress(self):
+        IrMailServer = self.env['ir.mail_server']
+        IrMailServer._get_suppressed_recipients(self._message('ok@example.net'), mail_server_id=self.ses_server.id)
+        self.env['aws.ses.suppression'].search([('email', '=', 'bounced@example.net')]).unlink()
+        suppressed = IrMailServer._get_suppressed_recipients(
+            self._message('bounced@example.net'), mail_server_id=self.ses_server.id)
+        self.assertEqual(suppressed, set())
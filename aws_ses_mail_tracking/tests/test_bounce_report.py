@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+import email
+import email.policy
+
+from odoo.tests import BaseCase, tagged
+from odoo.addons.aws_ses_mail_tracking.libs.bounce_report import (
+    BounceReport, RecipientStatus, bounce_class, is_permanent_failure, parse_report,
+)
+from .common import load_eml_fixture
+
+
+def _message(raw):
+    return email.message_from_string(raw.replace('\n', '\r\n'), policy=email.policy.SMTP)
+
+
+@tagged('aws_ses')
+class TestBounceReport(BaseCase):
+
+    def test_delivery_status(self):
+        report = parse_report(load_eml_fixture('ses_hard_bounce'))
+        self.assertEqual(report, BounceReport('delivery-status', None, [
+            RecipientStatus('nobody@example.org', 'failed', '5.1.1', 'smtp; 550 5.1.1 user unknown'),
+        ]))
+
+        report = parse_report(load_eml_fixture('ses_soft_bounce'))
+        self.assertEqual(report.report_type, 'delivery-status')
+        self.assertEqual([(r.recipient, r.action, r.status) for r in report.recipients],
+                         [('nobody@example.org', 'delayed', '4.2.2')])
+
+    def test_delivery_status_multi_recipient(self):
+        report = parse_report(load_eml_fixture('ses_multi_recipient_bounce'))
+        # El bloque por mensaje (Reporting-MTA) no es un destinatario
+        self.assertEqual([(r.recipient, r.status) for r in report.recipients],
+                         [('user%s@example.org' % i, '5.1.1') for i in range(5)])
+
+    def test_feedback_report(self):
+        report = parse_report(load_eml_fixture('ses_complaint'))
+        self.assertEqual(report, BounceReport('feedback-report', 'abuse', [
+            RecipientStatus('recipient@example.net', None, None, None),
+        ]))
+
+    def test_feedback_report_headers_in_part(self):
+        # Informe ARF sin multipart: las cabeceras del informe son las de la propia parte
+        report = parse_report(_message("""\
+From: complaints@email-abuse.amazonses.com
+Content-Type: message/feedback-report
+Feedback-Type: Fraud
+
+Original-Rcpt-To: recipient@example.net
+"""))
+        self.assertEqual(report.report_type, 'feedback-report')
+        self.assertEqual(report.feedback_type, 'fraud')
+        self.assertEqual([r.recipient for r in report.recipients], ['recipient@example.net'])
+
+    def test_not_a_report(self):
+        message = _message("""\
+From: someone@example.net
+To: news@example.com
+Subject: Re: Spring offers
+Content-Type: multipart/mixed; boundary="bnd"
+
+--bnd
+Content-Type: text/plain
+
+Please remove me. Status: 5.1.1
+--bnd
+Content-Type: message/rfc822
+
+Content-Type: message/delivery-status
+
+Final-Recipient: rfc822; nobody@example.org
+Status: 5.1.1
+--bnd--
+""")
+        # Sin parte de informe de primer nivel no hay destinatarios, aunque el mensaje adjunto la tenga
+        self.assertEqual(parse_report(message), BounceReport(None, None, []))
+        self.assertEqual(parse_report(_message("From: someone@example.net\n\nHola\n")), BounceReport(None, None, []))
+
+    def test_not_a_report_early_exit(self):
+        message = load_eml_fixture('ses_hard_bounce')
+        parts = message.get_payload()
+        visited = []
+        for part in parts:
+            original = part.raw_items
+            part.raw_items = lambda original=original, part=part: visited.append(part) or original()
+        # El recorrido termina en la parte del informe y nunca llega al mensaje devuelto
+        parse_report(message)
+        self.assertEqual(visited, parts[:2])
+
+        plain = _message("From: someone@example.net\nContent-Type: text/plain\n\nHola\n")
+        plain.get_payload = lambda *args, **kwargs: self.fail("The body of a non report message must not be read")
+        self.assertEqual(parse_report(plain), BounceReport(None, None, []))
+
+    def test_report_without_report_part(self):
+        message = _message("""\
+From: MAILER-DAEMON@email-smtp.amazonaws.com
+Content-Type: multipart/report; report-type=delivery-status; boundary="bnd"
+
+--bnd
+Content-Type: text/plain
+
+Delivery failed
+--bnd--
+""")
+        self.assertEqual(parse_report(message), BounceReport('delivery-status', None, []))
+
+    def test_malformed_delivery_status(self):
+        report = parse_report(_message("""\
+From: MAILER-DAEMON@email-smtp.amazonaws.com
+Content-Type: multipart/report; report-type=delivery-status; boundary="bnd"
+
+--bnd
+Content-Type: message/delivery-status
+
+this is not a header block
+Final-Recipient nobody@example.org
+--bnd--
+"""))
+        self.assertEqual(report, BounceReport('delivery-status', None, []))
+
+        # Sin bloque por mensaje, con un Status con comentario y sin Action ni Diagnostic-Code
+        report = parse_report(_message("""\
+From: MAILER-DAEMON@email-smtp.amazonaws.com
+Content-Type: multipart/report; report-type=delivery-status; boundary="bnd"
+
+--bnd
+Content-Type: message/delivery-status
+
+Original-Recipient: rfc822;nobody@example.org
+Status: 5.1.1 (user unknown)
+
+Status: 4.4.7
+--bnd--
+"""))
+        self.assertEqual(report.recipients, [
+            RecipientStatus('nobody@example.org', None, '5.1.1', None),
+            RecipientStatus(None, None, '4.4.7', None),
+        ])
+
+        # Parte del informe vacía
+        report = parse_report(_message("""\
+From: MAILER-DAEMON@email-smtp.amazonaws.com
+Content-Type: multipart/report; report-type=delivery-status; boundary="bnd"
+
+--bnd
+Content-Type: message/delivery-status
+
+--bnd--
+"""))
+        self.assertEqual(report, BounceReport('delivery-status', None, []))
+
+    def test_bounce_class(self):
+        self.assertEqual(bounce_class('5.1.1'), 'hard')
+        self.assertEqual(bounce_class('4.2.2'), 'soft')
+        self.assertIsNone(bounce_class('2.0.0'))
+        self.assertIsNone(bounce_class(None))
+        self.assertIsNone(bounce_class(''))
+
+    def test_is_permanent_failure(self):
+        self.assertTrue(is_permanent_failure('5.1.1'))
+        self.assertTrue(is_permanent_failure(' 5.1.10 '))
+        # Fallos del mensaje o del servidor, no de la dirección
+        self.assertFalse(is_permanent_failure('5.7.1'))
+        self.assertFalse(is_permanent_failure('5.2.2'))
+        self.assertFalse(is_permanent_failure('4.2.2'))
+        self.assertFalse(is_permanent_failure(None))
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import json
+from datetime import datetime
+
+from odoo.tests import BaseCase, tagged
+from odoo.addons.aws_ses_mail_tracking.libs.ses_events import (
+    parse_ses_event, parse_ses_event_line, verify_sns_signature,
+)
+from .common import SnsSigner, load_sns_fixture
+
+SES_MESSAGE_KEY = '0100018c2b4e5f6a-1a2b3c4d-5e6f-4a7b-8c9d-0e1f2a3b4c5d-000000'
+
+
+@tagged('aws_ses')
+class TestSesEvents(BaseCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer = SnsSigner()
+
+    def _parse(self, name):
+        return parse_ses_event(json.loads(load_sns_fixture(name)['Message']))
+
+    def test_verify_sns_signature(self):
+        for version in ('1', '2'):
+            message = self.signer.sign(load_sns_fixture('sns_bounce_permanent'), version=version)
+            self.assertTrue(verify_sns_signature(message, self.signer.get_certificate))
+        subscription = self.signer.sign(load_sns_fixture('sns_subscription_confirmation'))
+        self.assertTrue(verify_sns_signature(subscription, self.signer.get_certificate))
+
+    def test_verify_sns_signature_rejected(self):
+        message = self.signer.sign(load_sns_fixture('sns_bounce_permanent'))
+        # Mensaje modificado tras la firma
+        tampered = dict(message, Message=message['Message'].replace('Permanent', 'Transient'))
+        self.assertFalse(verify_sns_signature(tampered, self.signer.get_certificate))
+        # Firma de otra clave (la grabada de AWS)
+        recorded = dict(load_sns_fixture('sns_bounce_permanent'), SigningCertURL=self.signer.CERT_URL)
+        self.assertFalse(verify_sns_signature(recorded, self.signer.get_certificate))
+        # Versión de firma desconocida
+        self.assertFalse(verify_sns_signature(dict(message, SignatureVersion='3'), self.signer.get_certificate))
+        # El certificado solo se descarga de SNS
+        self.signer.requested_urls.clear()
+        foreign = dict(message, SigningCertURL='https://attacker.example.com/cert.pem')
+        self.assertFalse(verify_sns_signature(foreign, self.signer.get_certificate))
+        self.assertEqual(self.signer.requested_urls, [])
+
+    def test_parse_bounce(self):
+        [event] = self._parse('sns_bounce_permanent')
+        self.assertEqual(event['ses_message_key'], SES_MESSAGE_KEY)
+        self.assertEqual(event['event_type'], 'bounce')
+        self.assertEqual(event['event_date'], datetime(2024, 3, 12, 9, 15, 6))
+        self.assertEqual(event['recipient'], 'recipient@example.net')
+        self.assertEqual(event['bounce_type'], 'Permanent')
+        self.assertEqual(event['status_code'], '5.1.1')
+        self.assertIn('User unknown', event['diagnostic_code'])
+
+    def test_parse_complaint(self):
+        [event] = self._parse('sns_complaint')
+        self.assertEqual(event['event_type'], 'complaint')
+        self.assertEqual(event['recipient'], 'recipient@example.net')
+        self.assertEqual(event['feedback_type'], 'abuse')
+        self.assertEqual(event['event_date'], datetime(2024, 3, 13, 17, 2, 17))
+
+    def test_parse_open_click(self):
+        [opened] = self._parse('sns_open')
+        [clicked] = self._parse('sns_click')
+        self.assertEqual((opened['event_type'], opened['event_date']), ('open', datetime(2024, 3, 12, 10, 42, 30)))
+        self.assertEqual((clicked['event_type'], clicked['event_date']), ('click', datetime(2024, 3, 12, 10, 43, 12)))
+
+    def test_parse_delivery_ignored(self):
+        # El rastro ya es "entregado" al aceptarlo SES: Delivery no se aplica
+        self.assertEqual(self._parse('sns_delivery'), [])
+
+    def test_parse_event_line(self):
+        envelope = load_sns_fixture('sns_open')
+        from_envelope = parse_ses_event_line(json.dumps(envelope))
+        from_event = parse_ses_event_line(envelope['Message'])
+        self.assertEqual(from_envelope, from_event)
+        self.assertEqual(len(from_event), 1)
+        with self.assertRaises(ValueError):
+            parse_ses_event_line('{"eventType": ')
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import time
+from datetime import datetime
+
+from odoo.tests import BaseCase, tagged
+from odoo.addons.aws_ses_mail_tracking.libs.smtp_pool import SMTPConnectionPool
+from odoo.addons.aws_ses_mail_tracking.libs.smtplib_inherit import SMTPInherit
+from .common import StubSMTPServer
+
+MESSAGE = b"From: news@example.com\r\nTo: a@example.net\r\nSubject: Spring offers\r\n\r\nHola\r\n"
+
+# Claves como las de ir.mail_server._get_smtp_pool_key: (base de datos, servidor, fecha de escritura)
+WRITE_DATE = datetime(2024, 3, 1, 10, 0, 0)
+KEY = ('ses_db', 1, WRITE_DATE)
+
+
+def _verbs(server):
+    return [command.split(' ', 1)[0].upper() for command in server.commands]
+
+
+@tagged('aws_ses')
+class TestSMTPConnectionPool(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pool = SMTPConnectionPool(max_size=2, max_idle=60, max_messages=100, noop_interval=15)
+        self.addCleanup(self.pool.clear)
+
+    def _connect(self, key=KEY, **kwargs):
+        """Abre una conexión contra un servidor stub y la asocia al pool, como send_email"""
+        server = StubSMTPServer(**kwargs)
+        self.addCleanup(server.stop)
+        connection = SMTPInherit('127.0.0.1', server.port)
+        self.addCleanup(connection.close)
+        connection.ehlo()
+        self.pool.attach(connection, key)
+        return server, connection
+
+    def _send(self, connection):
+        connection.sendmail('news@example.com', ['a@example.net'], MESSAGE)
+
+    def test_reuse(self):
+        server, connection = self._connect()
+        self._send(connection)
+        # quit() devuelve la conexión al pool sin cerrarla
+        connection.quit()
+        self.assertIsNone(connection.pool)
+        self.assertIsNotNone(connection.sock)
+
+        reused = self.pool.acquire(KEY)
+        self.assertIs(reused, connection)
+        self.assertIs(reused.pool, self.pool)
+        self._send(reused)
+        reused.quit()
+        self.assertEqual(_verbs(server), ['EHLO', 'MAIL', 'RCPT', 'DATA', 'MAIL', 'RCPT', 'DATA'])
+        # Sin conexiones inactivas hay que abrir una nueva
+        self.assertIs(self.pool.acquire(KEY), connection)
+        self.assertIsNone(self.pool.acquire(KEY))
+
+    def test_reuse_lifo(self):
+        _server, first = self._connect()
+        _server, second = self._connect()
+        first.quit()
+        second.quit()
+        self.assertIs(self.pool.acquire(KEY), second)
+        self.assertIs(self.pool.acquire(KEY), first)
+
+    def test_release_max_messages(self):
+        self.pool.configure(max_messages=2)
+        server, connection = self._connect()
+        self._send(connection)
+        connection.quit()
+        connection = self.pool.acquire(KEY)
+        self._send(connection)
+        # Al alcanzar max_messages la conexión se cierra en vez de volver al pool
+        connection.quit()
+        self.assertIsNone(connection.sock)
+        self.assertEqual(_verbs(server)[-1], 'QUIT')
+        self.assertIsNone(self.pool.acquire(KEY))
+
+    def test_release_max_size(self):
+        servers, connections = zip(*(self._connect() for _i in range(3)))
+        for connection in connections:
+            connection.quit()
+        # Solo caben max_size conexiones inactivas por clave: se cierra la más antigua
+        self.assertIsNone(connections[0].sock)
+        self.assertEqual(_verbs(servers[0])[-1], 'QUIT')
+        self.assertIs(self.pool.acquire(KEY), connections[2])
+        self.assertIs(self.pool.acquire(KEY), connections[1])
+        self.assertIsNone(self.pool.acquire(KEY))
+
+    def test_release_closed_connection(self):
+        _server, connection = self._connect()
+        connection.close()
+        connection.quit()
+        self.assertIsNone(self.pool.acquire(KEY))
+
+    def test_release_disabled(self):
+        self.pool.configure(max_size=0)
+        server, connection = self._connect()
+        connection.quit()
+        self.assertIsNone(connection.sock)
+        self.assertEqual(_verbs(server)[-1], 'QUIT')
+
+    def test_max_idle_eviction(self):
+        server, connection = self._connect()
+        connection.quit()
+        connection.pool_last_used = time.monotonic() - 61
+        self.assertIsNone(self.pool.acquire(KEY))
+        self.assertIsNone(connection.sock)
+        # Descartada sin NOOP: solo se cierra
+        self.assertEqual(_verbs(server), ['EHLO', 'QUIT'])
+
+    def test_max_idle_eviction_other_keys(self):
+        # La purga de inactivas recorre todas las claves, no solo la pedida
+        other_key = ('ses_db', 2, WRITE_DATE)
+        _server, connection = self._connect(key=other_key)
+        connection.quit()
+        connection.pool_last_used = time.monotonic() - 61
+        self.assertIsNone(self.pool.acquire(KEY))
+        self.assertIsNone(connection.sock)
+        self.assertIsNone(self.pool.acquire(other_key))
+
+    def test_noop_recent(self):
+        server, connection = self._connect()
+        connection.quit()
+        self.assertIs(self.pool.acquire(KEY), connection)
+        # Usada hace menos de noop_interval: se reutiliza sin comprobarla
+        self.assertNotIn('NOOP', _verbs(server))
+
+    def test_noop_alive(self):
+        server, connection = self._connect()
+        connection.quit()
+        connection.pool_last_used = time.monotonic() - 20
+        self.assertIs(self.pool.acquire(KEY), connection)
+        self.assertEqual(_verbs(server)[-1], 'NOOP')
+
+    def test_noop_dead(self):
+        server, connection = self._connect(replies={'NOOP': "421 4.4.2 Timeout waiting for data"})
+        connection.quit()
+        connection.pool_last_used = time.monotonic() - 20
+        # El servidor cerró la conexión: se descarta y no queda ninguna para reutilizar
+        self.assertIsNone(self.pool.acquire(KEY))
+        self.assertIsNone(connection.sock)
+        self.assertIsNone(connection.pool)
+        self.assertEqual(_verbs(server)[-1], 'NOOP')
+
+    def test_noop_dead_falls_back(self):
+        _server, fresh = self._connect()
+        _server, dead = self._connect(replies={'NOOP': "421 4.4.2 Timeout waiting for data"})
+        fresh.quit()
+        dead.quit()
+        dead.pool_last_used = time.monotonic() - 20
+        # La conexión muerta se descarta y acquire sigue con la siguiente inactiva
+        self.assertIs(self.pool.acquire(KEY), fresh)
+        self.assertIsNone(dead.sock)
+
+    def test_noop_socket_error(self):
+        _server, connection = self._connect()
+        connection.quit()
+        # Conexión cortada mientras estaba inactiva en el pool
+        connection.sock.shutdown(socket.SHUT_RDWR)
+        connection.pool_last_used = time.monotonic() - 20
+        self.assertIsNone(self.pool.acquire(KEY))
+        self.assertIsNone(connection.sock)
+
+    def test_keying(self):
+        keys = [
+            KEY,
+            # Otro servidor de correo
+            ('ses_db', 2, WRITE_DATE),
+            # El mismo servidor tras cambiar su configuración (credenciales, host...)
+            ('ses_db', 1, datetime(2024, 3, 2, 9, 30, 0)),
+            # El mismo servidor en otra base de datos
+            ('other_db', 1, WRITE_DATE),
+        ]
+        connections = {}
+        for key in keys:
+            _server, connection = self._connect(key=key)
+            connection.quit()
+            connections[key] = connection
+        for key in keys:
+            self.assertIs(self.pool.acquire(key), connections[key])
+            self.assertIsNone(self.pool.acquire(key))
+
+    def test_keying_stale_credentials(self):
+        _server, connection = self._connect()
+        connection.quit()
+        # Tras editar el servidor la clave cambia y la conexión antigua no se reutiliza
+        self.assertIsNone(self.pool.acquire(('ses_db', 1, datetime(2024, 3, 2, 9, 30, 0))))
+        self.assertIs(self.pool.acquire(KEY), connection)
+
+    def test_clear(self):
+        other_key = ('ses_db', 2, WRITE_DATE)
+        _server, connection = self._connect()
+        _server, other = self._connect(key=other_key)
+        connection.quit()
+        other.quit()
+        self.pool.clear(KEY)
+        self.assertIsNone(connection.sock)
+        self.assertIsNone(self.pool.acquire(KEY))
+        self.assertIs(self.pool.acquire(other_key), other)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+from email.message import EmailMessage
+from smtplib import SMTP, SMTPRecipientsRefused, SMTPSenderRefused, SMTPServerDisconnected
+
+from odoo.tests import BaseCase, tagged
+from odoo.addons.aws_ses_mail_tracking.libs.smtplib_inherit import SPOOL_MAX_SIZE, SMTPInherit
+from .common import StubSMTPServer
+
+MESSAGE = b"From: news@example.com\r\nTo: a@example.net\r\nSubject: Spring offers\r\n\r\nHola\r\n"
+
+
+@tagged('aws_ses')
+class TestSMTPInheritPipelining(BaseCase):
+
+    def _connect(self, **kwargs):
+        server = StubSMTPServer(**kwargs)
+        self.addCleanup(server.stop)
+        connection = SMTPInherit('127.0.0.1', server.port)
+        self.addCleanup(connection.close)
+        connection.ehlo()
+        return server, connection
+
+    def _envelope_chunks(self, server):
+        return [chunk for chunk in server.chunks if chunk[0].upper().startswith(('MAIL', 'RCPT'))]
+
+    def test_pipelined_envelope(self):
+        server, connection = self._connect()
+        resp = connection.sendmail('news@example.com', ['a@example.net', 'b@example.net'], MESSAGE)
+        self.assertEqual(resp, b'Ok 0100018c2b4e5f6a-stub-000000')
+        # MAIL FROM y todos los RCPT TO en una sola escritura
+        self.assertEqual(self._envelope_chunks(server), [[
+            'mail FROM:<news@example.com> size=%d' % len(MESSAGE),
+            'rcpt TO:<a@example.net>',
+            'rcpt TO:<b@example.net>',
+        ]])
+        self.assertEqual(server.data, [MESSAGE])
+
+    def test_partial_rcpt_refused(self):
+        server, connection = self._connect(replies={'RCPT <b@example.net>': "550 5.1.1 User unknown"})
+        resp = connection.sendmail('news@example.com', ['a@example.net', 'b@example.net', 'c@example.net'], MESSAGE)
+        self.assertTrue(resp.startswith(b'Ok '))
+        self.assertEqual(server.data, [MESSAGE])
+
+    def test_all_rcpt_refused(self):
+        server, connection = self._connect(replies={'RCPT': "550 5.1.1 User unknown"})
+        with self.assertRaises(SMTPRecipientsRefused) as error:
+            connection.sendmail('news@example.com', ['a@example.net', 'b@example.net'], MESSAGE)
+        self.assertEqual(set(error.exception.recipients), {'a@example.net', 'b@example.net'})
+        self.assertEqual(server.commands[-1].lower(), 'rset')
+        self.assertFalse(server.data)
+        # La conexión sigue sincronizada: el siguiente comando recibe su propia respuesta
+        self.assertEqual(connection.noop()[0], 250)
+
+    def test_mail_from_temporary_failure(self):
+        server, connection = self._connect(replies={'MAIL': "451 4.3.0 Temporary failure"})
+        with self.assertRaises(SMTPSenderRefused) as error:
+            connection.sendmail('news@example.com', ['a@example.net', 'b@example.net'], MESSAGE)
+        self.assertEqual(error.exception.smtp_code, 451)
+        # Se leyeron las respuestas de los RCPT en vuelo antes del RSET
+        self.assertEqual(server.commands[-1].lower(), 'rset')
+        self.assertFalse(server.data)
+        self.assertEqual(connection.noop()[0], 250)
+
+    def test_mail_from_421_closes(self):
+        server, connection = self._connect(replies={'MAIL': "421 4.4.2 Service not available"})
+        with self.assertRaises(SMTPSenderRefused) as error:
+            connection.sendmail('news@example.com', ['a@example.net'], MESSAGE)
+        self.assertEqual(error.exception.smtp_code, 421)
+        self.assertIsNone(connection.sock)
+        with self.assertRaises(SMTPServerDisconnected):
+            connection.noop()
+
+    def test_without_pipelining(self):
+        # Sin PIPELINING anunciado: un comando por ida y vuelta, con los mismos errores
+        server, connection = self._connect(pipelining=False, replies={'RCPT <b@example.net>': "550 5.1.1 User unknown"})
+        resp = connection.sendmail('news@example.com', ['a@example.net', 'b@example.net'], MESSAGE)
+        self.assertTrue(resp.startswith(b'Ok '))
+        self.assertEqual([len(chunk) for chunk in self._envelope_chunks(server)], [1, 1, 1])
+        server.replies['MAIL'] = "451 4.3.0 Temporary failure"
+        with self.assertRaises(SMTPSenderRefused):
+            connection.sendmail('news@example.com', ['a@example.net'], MESSAGE)
+        self.assertEqual(server.commands[-1].lower(), 'rset')
+
+
+@tagged('aws_ses')
+class TestSMTPInheritData(BaseCase):
+    """DATA por bloques desde el fichero temporal: mismo contenido que smtplib.SMTP.send_message"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubSMTPServer()
+        self.addCleanup(self.server.stop)
+
+    def _send(self, smtp_class, message, to_addrs=('a@example.net',)):
+        connection = smtp_class('127.0.0.1', self.server.port)
+        try:
+            connection.send_message(message, 'news@example.com', list(to_addrs))
+        finally:
+            connection.close()
+        return self.server.data[-1]
+
+    def _message(self, body):
+        message = EmailMessage()
+        message['From'] = 'news@example.com'
+        message['To'] = 'a@example.net'
+        message['Bcc'] = 'hidden@example.net'
+        message['Subject'] = 'Ofertas de primavera'
+        message.set_content(body)
+        return message
+
+    def _assert_same_as_stdlib(self, message):
+        streamed = self._send(SMTPInherit, message)
+        self.assertEqual(streamed, self._send(SMTP, message))
+        return streamed
+
+    def test_dot_stuffing(self):
+        data = self._assert_same_as_stdlib(self._message(".hidden line\nsecond\n.\n..double\n"))
+        self.assertIn(b'\r\n..hidden line\r\n', data)
+        self.assertIn(b'\r\n..\r\n...double\r\n', data)
+
+    def test_crlf_normalization(self):
+        data = self._assert_same_as_stdlib(self._message("unix\nmac\rwindows\r\nend"))
+        self.assertNotIn(b'\r\r', data)
+        self.assertEqual(data.count(b'\n'), data.count(b'\r\n'))
+        self.assertIn(b'unix\r\nmac\r\nwindows\r\nend\r\n', data)
+
+    def test_bcc_stripped(self):
+        message = self._message("Hola\n")
+        message['Resent-Bcc'] = 'resent-hidden@example.net'
+        data = self._send(SMTPInherit, message, to_addrs=('a@example.net', 'hidden@example.net'))
+        self.assertNotIn(b'hidden@example.net', data)
+        self.assertIn(b'rcpt TO:<hidden@example.net>', [command.encode() for command in self.server.commands])
+        # El mensaje original conserva su Bcc
+        self.assertEqual(message['Bcc'], 'hidden@example.net')
+
+    def test_same_bytes_as_stdlib(self):
+        # Multipart con texto no ASCII, un adjunto y un cuerpo por encima del tamaño de bloque y del spool
+        message = self._message("Año nuevo, ofertas nuevas.\n.punto inicial\n")
+        message.add_alternative("<p>Año <b>nuevo</b></p>\n" * 10, subtype='html')
+        message.add_attachment(bytes(range(256)) * 8192, maintype='application', subtype='octet-stream',
+                               filename='catalogo.bin')
+        message.add_attachment(("x" * 70 + "\n.linea\n") * 20000, subtype='plain', filename='large.txt')
+        # Boundaries fijos: si no, cada serialización genera unos aleatorios
+        for index, part in enumerate(part for part in message.walk() if part.is_multipart()):
+            part.set_boundary('boundary-%s' % index)
+        data = self._assert_same_as_stdlib(message)
+        self.assertGreater(len(data), SPOOL_MAX_SIZE)
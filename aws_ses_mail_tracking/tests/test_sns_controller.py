@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+
+import json
+from unittest.mock import patch
+
+from odoo.tests import HttpCase, tagged
+from odoo.addons.aws_ses_mail_tracking.controllers import main
+from .common import SnsSigner, load_sns_fixture
+
+
+@tagged('aws_ses', 'post_install', '-at_install')
+class TestSnsController(HttpCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer = SnsSigner()
+
+    def setUp(self):
+        super().setUp()
+        self.patch(main, '_get_sns_certificate', self.signer.get_certificate)
+
+    def _post(self, message):
+        return self.url_open('/aws_ses/sns', data=json.dumps(message), headers={'Content-Type': 'text/plain'})
+
+    def test_notification_enqueued(self):
+        response = self._post(self.signer.sign(load_sns_fixture('sns_bounce_permanent')))
+        self.assertEqual(response.status_code, 200)
+        event = self.env['aws.ses.event'].search([])
+        self.assertEqual(len(event), 1)
+        self.assertEqual((event.event_type, event.recipient, event.status_code),
+                         ('bounce', 'recipient@example.net', '5.1.1'))
+
+    def test_delivery_not_enqueued(self):
+        response = self._post(self.signer.sign(load_sns_fixture('sns_delivery')))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.env['aws.ses.event'].search([]))
+
+    def test_invalid_signature(self):
+        # Firma grabada de AWS: no corresponde al certificado sustituto
+        recorded = dict(load_sns_fixture('sns_bounce_permanent'), SigningCertURL=self.signer.CERT_URL)
+        self.assertEqual(self._post(recorded).status_code, 403)
+        signed = self.signer.sign(load_sns_fixture('sns_complaint'))
+        tampered = dict(signed, Message=signed['Message'].replace('abuse', 'not-spam'))
+        self.assertEqual(self._post(tampered).status_code, 403)
+        self.assertFalse(self.env['aws.ses.event'].search([]))
+
+    def test_unknown_topic(self):
+        self.env['ir.config_parameter'].sudo().set_param(
+            'aws_ses_mail_tracking.sns_topic_arns', 'arn:aws:sns:eu-west-1:123456789012:other')
+        response = self._post(self.signer.sign(load_sns_fixture('sns_open')))
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(self.env['aws.ses.event'].search([]))
+
+    def test_subscription_confirmation(self):
+        message = self.signer.sign(load_sns_fixture('sns_subscription_confirmation'))
+        with patch.object(main.requests, 'get') as get:
+            response = self._post(message)
+        self.assertEqual(response.status_code, 200)
+        get.assert_called_once_with(message['SubscribeURL'], timeout=10)
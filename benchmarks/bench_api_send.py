@@ -0,0 +1,64 @@
+"""Mensajes por segundo: SMTP (SMTPInherit) frente a la API SES (SESAPISession), contra los SES simulados.
+
+La latencia es la misma por ida y vuelta en ambos: SMTP necesita varias por mensaje
+(MAIL/RCPT con PIPELINING, DATA, fin de datos) y la API una sola petición HTTP keep-alive.
+
+    python benchmarks/bench_api_send.py --messages 300 --latency 0.01 --workers 1 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from bench_concurrent_send import _message  # noqa: E402
+from fake_ses_api import ACCESS_KEY, REGION, SECRET_KEY, FakeSESAPIServer  # noqa: E402
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from libs.ses_api import SESAPIClient, SESAPISession  # noqa: E402
+from libs.ses_sender import ConcurrentSender  # noqa: E402
+from libs.smtplib_inherit import SMTPInherit  # noqa: E402
+
+
+def run(connections, messages):
+    started = time.perf_counter()
+    sender = ConcurrentSender(connections, backoff=0.05)
+    for index in range(messages):
+        sender.submit(index, _message(index), 'bench@example.com', ['rcpt%s@example.com' % index])
+    results = sender.join()
+    elapsed = time.perf_counter() - started
+    return elapsed, sum(isinstance(result, Exception) for result in results.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=0.01)
+    parser.add_argument('--throttle', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    smtp_server = FakeSESServer(latency=args.latency, throttle=args.throttle)
+    smtp_port = smtp_server.start()
+    api_server = FakeSESAPIServer(latency=args.latency, throttle=args.throttle)
+    api_server.start()
+
+    print("%6s %8s %10s %10s %8s" % ("mode", "workers", "seconds", "msg/s", "failed"))
+    for workers in args.workers:
+        connections = [SMTPInherit('127.0.0.1', smtp_port) for _i in range(workers)]
+        elapsed, failed = run(connections, args.messages)
+        for connection in connections:
+            connection.quit()
+        print("%6s %8d %10.2f %10.1f %8d" % ("smtp", workers, elapsed, args.messages / elapsed, failed))
+
+        client = SESAPIClient(REGION, ACCESS_KEY, SECRET_KEY, endpoint=api_server.endpoint, pool_size=workers)
+        elapsed, failed = run([SESAPISession(client) for _i in range(workers)], args.messages)
+        client.close()
+        print("%6s %8d %10.2f %10.1f %8d" % ("api", workers, elapsed, args.messages / elapsed, failed))
+    print("API: %s requests over %s TCP connections" % (api_server.requests, len(api_server.connections)))
+    smtp_server.stop()
+    api_server.stop()
+
+
+if __name__ == '__main__':
+    main()
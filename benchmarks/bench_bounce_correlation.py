@@ -0,0 +1,62 @@
+"""Número de consultas de la correlación de rebotes SES en función del número de IDs.
+
+Se ejecuta dentro de un shell de Odoo con el módulo instalado:
+
+    odoo-bin shell -d <db> < benchmarks/bench_bounce_correlation.py
+
+Crea rastros sintéticos, mide las consultas SQL de ``_get_traces_from_ses_ids`` y del
+``set_bounced`` por lote, y deshace todo al terminar. El número de consultas debe
+mantenerse constante cuando crece el número de IDs rebotados.
+"""
+import time
+import uuid
+
+SIZES = (1, 10, 100, 1000)
+
+
+def _create_traces(env, count):
+    vals_list = []
+    for _i in range(count):
+        ses_id = '%016x-%s-000000' % (uuid.uuid4().int >> 64, uuid.uuid4())
+        vals_list.append({
+            'trace_type': 'mail',
+            'model': 'res.partner',
+            'res_id': env.user.partner_id.id,
+            'email': 'bench@example.com',
+            'message_id': '<%s@odoo.example.com>' % uuid.uuid4(),
+            'ses_message_id': '<%s@us-east-1.amazonses.com>' % ses_id,
+            'ses_message_key': ses_id,
+        })
+    return env['mailing.trace'].create(vals_list)
+
+
+def run(env):
+    Trace = env['mailing.trace']
+    results = []
+    try:
+        for size in SIZES:
+            traces = _create_traces(env, size)
+            # Los rebotes llegan con el dominio genérico de SES
+            bounced_msg_ids = ['<%s@email.amazonses.com>' % key for key in traces.mapped('ses_message_key')]
+            env.invalidate_all()
+
+            queries_before = env.cr.sql_log_count
+            started = time.perf_counter()
+            found = Trace._get_traces_from_ses_ids(bounced_msg_ids)
+            found.set_bounced(bounce_message='benchmark')
+            env.flush_all()
+            elapsed = time.perf_counter() - started
+            queries = env.cr.sql_log_count - queries_before
+
+            assert len(found) == size, "expected %s traces, found %s" % (size, len(found))
+            results.append((size, queries, elapsed))
+    finally:
+        env.cr.rollback()
+
+    print("%8s %10s %12s" % ("ids", "queries", "ms"))
+    for size, queries, elapsed in results:
+        print("%8d %10d %12.2f" % (size, queries, elapsed * 1000))
+    return results
+
+
+run(env)  # noqa: F821 - `env` lo proporciona el shell de Odoo
@@ -0,0 +1,84 @@
+"""Análisis de informes de rebote/queja: recorrido completo con walk() frente a bounce_report.
+
+Los mensajes de benchmarks/corpus se parsean una vez; solo se mide el análisis del informe.
+
+    python benchmarks/bench_bounce_report.py --iterations 20000
+"""
+import argparse
+import email
+import email.policy
+import glob
+import os
+import sys
+import time
+from email.parser import HeaderParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from libs.bounce_report import bounce_class, parse_report  # noqa: E402
+
+
+def legacy_details(email_message):
+    # Análisis anterior de mail.thread._routing_handle_bounce: recorre todas las partes
+    bounce_details = []
+    for part in email_message.walk():
+        content_type = part.get_content_type()
+        if content_type == 'message/feedback-report':
+            feedback_type = part.get('Feedback-Type')
+            if not feedback_type:
+                payload = part.get_payload()
+                if isinstance(payload, str):
+                    feedback_type = HeaderParser().parsestr(payload).get('Feedback-Type')
+                elif isinstance(payload, list):
+                    feedback_type = payload[0].get('Feedback-Type')
+            if feedback_type:
+                bounce_details.append(f"Complaint: {feedback_type}")
+        elif content_type == 'message/delivery-status':
+            payload = part.get_payload()
+            status_code = None
+            if isinstance(payload, list):
+                for subpart in payload:
+                    if subpart.get('Status'):
+                        status_code = subpart.get('Status')
+            elif isinstance(payload, str):
+                for block in payload.split('\n\n'):
+                    status_code = HeaderParser().parsestr(block).get('Status')
+                    if status_code:
+                        break
+            if status_code:
+                bounce_details.append(f"Bounce (Code: {status_code})")
+    return bounce_details
+
+
+def report_details(email_message):
+    report = parse_report(email_message)
+    bounce_details = [f"Complaint: {report.feedback_type}"] if report.feedback_type else []
+    bounce_details += [f"{bounce_class(r.status)} (Code: {r.status})" for r in report.recipients if r.status]
+    return bounce_details
+
+
+def timed(function, message, iterations):
+    start = time.perf_counter()
+    for __ in range(iterations):
+        function(message)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--corpus', default=os.path.join(os.path.dirname(__file__), 'corpus'))
+    args = parser.parse_args()
+
+    print(f"{'message':<32} {'walk us':>10} {'report us':>10} {'speedup':>8}  result")
+    for path in sorted(glob.glob(os.path.join(args.corpus, '*.eml'))):
+        with open(path, 'rb') as f:
+            message = email.message_from_binary_file(f, policy=email.policy.SMTP)
+        legacy = timed(legacy_details, message, args.iterations)
+        current = timed(report_details, message, args.iterations)
+        print(f"{os.path.basename(path):<32} {legacy:>10.2f} {current:>10.2f} {legacy / current:>7.1f}x  "
+              f"{parse_report(message)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Mensajes por segundo del envío secuencial frente al ConcurrentSender, contra el SES simulado.
+
+    python benchmarks/bench_concurrent_send.py --messages 500 --latency 0.01 --workers 1 4 8
+"""
+import argparse
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from libs.ses_retry import RetryScheduler  # noqa: E402
+from libs.ses_sender import ConcurrentSender  # noqa: E402
+from libs.smtplib_inherit import SMTPInherit  # noqa: E402
+
+
+def _message(index):
+    message = EmailMessage()
+    message['From'] = 'bench@example.com'
+    message['To'] = 'rcpt%s@example.com' % index
+    message['Subject'] = 'Benchmark %s' % index
+    message['Message-Id'] = '<bench.%s@example.com>' % index
+    message.set_content('Hola\n' * 50)
+    return message
+
+
+def run(port, messages, workers, rate):
+    connections = [SMTPInherit('127.0.0.1', port) for _i in range(workers)]
+    started = time.perf_counter()
+    if workers == 1:
+        # Como ir.mail_server.send_email: envío secuencial con reintentos de los 4xx
+        scheduler = RetryScheduler(backoff=0.05)
+        for index in range(messages):
+            scheduler.send('bench', connections[0].send_message,
+                           _message(index), 'bench@example.com', ['rcpt%s@example.com' % index])
+        failed = 0
+    else:
+        sender = ConcurrentSender(connections, rate=rate, backoff=0.05)
+        for index in range(messages):
+            sender.submit(index, _message(index), 'bench@example.com', ['rcpt%s@example.com' % index])
+        results = sender.join()
+        failed = sum(isinstance(result, Exception) for result in results.values())
+    elapsed = time.perf_counter() - started
+    for connection in connections:
+        connection.quit()
+    return elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.005)
+    parser.add_argument('--throttle', type=float, default=0.0)
+    parser.add_argument('--rate', type=float, default=0, help="max send rate (0 = sin límite)")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    server = FakeSESServer(latency=args.latency, throttle=args.throttle)
+    port = server.start()
+    print("%8s %10s %10s %8s" % ("workers", "seconds", "msg/s", "failed"))
+    for workers in args.workers:
+        elapsed, failed = run(port, args.messages, workers, args.rate)
+        print("%8d %10.2f %10.1f %8d" % (workers, elapsed, args.messages / elapsed, failed))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Escritura de los SES Message-IDs en la ruta del cron de correo, contra el servidor SMTP falso.
+
+Se ejecuta dentro de un shell de Odoo, desde la raíz del repositorio (¡en una base de datos de pruebas!):
+
+    BENCH_OUTPUT=cron.json odoo-bin shell -d <db> < benchmarks/bench_cron_writeback.py
+    python benchmarks/run_benchmarks.py --include cron.json
+
+Crea un mailing con ``BENCH_MAILS`` correos en cola (cada uno con su mailing.trace), un servidor
+de correo que apunta a fake_ses_smtp.py y los envía con ``mail.mail.send(auto_commit=True)``, como
+``process_email_queue``: un commit por correo. Mide los mensajes por segundo, las escrituras en
+bloque (histograma ``ses_phase_seconds{phase="writeback"}``), las consultas por mensaje y los
+rastros que acaban con su SES Message-ID. Con ``aws_ses_mail_tracking.writeback_batch_size`` por
+defecto, las escrituras deben ser ceil(BENCH_MAILS / 500) y no una por mensaje.
+Al terminar borra todo lo creado y restaura los parámetros.
+"""
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.getcwd(), 'benchmarks'))
+
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from odoo.addons.aws_ses_mail_tracking.libs.metrics import metrics  # noqa: E402
+
+BENCH_SUBJECT = 'aws_ses_mail_tracking cron benchmark'
+PARAMS = ('aws_ses_mail_tracking.metrics_enabled', 'aws_ses_mail_tracking.concurrent_connections')
+
+
+def setup(env, count, port):
+    server = env['ir.mail_server'].create({
+        'name': BENCH_SUBJECT,
+        'smtp_host': '127.0.0.1',
+        'smtp_port': port,
+        'smtp_encryption': 'none',
+        'smtp_authentication': 'login',
+        'smtp_user': 'bench',
+        'smtp_pass': 'bench',
+        'ses_region': 'us-east-1',
+        'sequence': 1000,
+    })
+    mailing = env['mailing.mailing'].create({
+        'subject': BENCH_SUBJECT,
+        'mailing_model_id': env['ir.model']._get_id('res.partner'),
+        'body_html': '<p>Benchmark</p>',
+        'mail_server_id': server.id,
+    })
+    partner_id = env.user.partner_id.id
+    mails = env['mail.mail'].create([{
+        'subject': BENCH_SUBJECT,
+        'body_html': '<p>Benchmark %s</p>' % index,
+        'email_from': 'bench@example.com',
+        'email_to': 'bench%s@example.com' % index,
+        'message_id': '<bench.cron.%s@odoo.example.com>' % index,
+        'mail_server_id': server.id,
+        'mailing_id': mailing.id,
+        'auto_delete': False,
+        'state': 'outgoing',
+    } for index in range(count)])
+    env['mailing.trace'].create([{
+        'trace_type': 'mail',
+        'model': 'res.partner',
+        'res_id': partner_id,
+        'mass_mailing_id': mailing.id,
+        'mail_mail_id': mail.id,
+        'email': mail.email_to,
+        'message_id': mail.message_id,
+    } for mail in mails])
+    env.cr.commit()
+    return server, mailing, mails
+
+
+def cleanup(env, server, mailing, mails):
+    env.cr.execute("DELETE FROM mailing_trace WHERE mass_mailing_id = %s", [mailing.id])
+    mails.exists().unlink()
+    mailing.unlink()
+    server.unlink()
+    env.cr.commit()
+
+
+def run(env, count, flush_size):
+    ICP = env['ir.config_parameter'].sudo()
+    saved = {key: ICP.get_param(key) for key in PARAMS}
+    fake = FakeSESServer(seed=int(os.environ.get('BENCH_SEED', 1)))
+    server, mailing, mails = setup(env, count, fake.start())
+    try:
+        # Envío secuencial: se mide solo la escritura de los SES Message-IDs
+        ICP.set_param('aws_ses_mail_tracking.metrics_enabled', 'True')
+        ICP.set_param('aws_ses_mail_tracking.concurrent_connections', '1')
+        env.cr.commit()
+        metrics.reset()
+        queries_before = env.cr.sql_log_count
+        started = time.perf_counter()
+        mails.send(auto_commit=True)
+        elapsed = time.perf_counter() - started
+        queries = env.cr.sql_log_count - queries_before
+        writebacks = sum(
+            serie['count'] for serie in metrics.snapshot()['histograms'].get('ses_phase_seconds', [])
+            if serie['labels'].get('phase') == 'writeback')
+        env.cr.execute("""
+            SELECT count(*) FROM mailing_trace WHERE mass_mailing_id = %s AND ses_message_key IS NOT NULL
+        """, [mailing.id])
+        written = env.cr.fetchone()[0]
+    finally:
+        for key, value in saved.items():
+            ICP.set_param(key, value or False)
+        env.cr.commit()
+        cleanup(env, server, mailing, mails)
+        fake.stop()
+
+    print("%d mails in %.2fs (%.0f msg/s), %d write-backs (expected %d), %.1f queries/mail, %d traces written"
+          % (count, elapsed, count / elapsed, writebacks, math.ceil(count / flush_size), queries / count, written))
+    return {'results': {'cron_writeback': {
+        'mails': {'value': count, 'unit': 'mails', 'better': 'info'},
+        'messages_per_second': {'value': count / elapsed, 'unit': 'msg/s', 'better': 'higher'},
+        'writebacks': {'value': writebacks, 'unit': 'UPDATEs', 'better': 'lower'},
+        'queries_per_mail': {'value': queries / count, 'unit': 'queries', 'better': 'lower'},
+        'traces_written': {'value': written, 'unit': 'traces', 'better': 'info'},
+    }}}
+
+
+report = run(env, int(os.environ.get('BENCH_MAILS', 2000)), int(env['ir.config_parameter'].sudo().get_param(  # noqa: F821
+    'aws_ses_mail_tracking.writeback_batch_size', 500)))
+if os.environ.get('BENCH_OUTPUT'):
+    with open(os.environ['BENCH_OUTPUT'], 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,69 @@
+"""Coste de la instrumentación del envío con las métricas desactivadas y activadas, contra el SES simulado.
+
+    python benchmarks/bench_metrics.py --messages 2000
+"""
+import argparse
+import os
+import sys
+import time
+from email.message import EmailMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from libs.metrics import MetricsRegistry, metrics  # noqa: E402
+from libs.smtplib_inherit import SMTPInherit  # noqa: E402
+
+
+def _message(index):
+    message = EmailMessage()
+    message['From'] = 'bench@example.com'
+    message['To'] = 'rcpt%s@example.com' % index
+    message['Subject'] = 'Benchmark %s' % index
+    message.set_content('Hola\n' * 50)
+    return message
+
+
+def run_send(port, messages):
+    connection = SMTPInherit('127.0.0.1', port)
+    started = time.perf_counter()
+    for index in range(messages):
+        connection.send_message(_message(index), 'bench@example.com', ['rcpt%s@example.com' % index])
+    elapsed = time.perf_counter() - started
+    connection.quit()
+    return elapsed
+
+
+def run_hooks(registry, iterations):
+    """Coste por envío de los ganchos (4 temporizadores y 4 contadores) sin E/S"""
+    started = time.perf_counter()
+    for _i in range(iterations):
+        for phase in ('envelope', 'data', 'prepare', 'writeback'):
+            with registry.timer('ses_phase_seconds', phase=phase):
+                pass
+            registry.inc('ses_replies_total', command='data', code=250)
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=100000)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        print("metrics %-8s hooks: %6.2f us/send" % (
+            'enabled' if enabled else 'disabled', run_hooks(MetricsRegistry(enabled), args.iterations) * 1e6))
+
+    server = FakeSESServer(latency=0)
+    port = server.start()
+    print("%10s %10s %10s" % ("metrics", "seconds", "msg/s"))
+    for enabled in (False, True, False, True):
+        metrics.enabled = enabled
+        elapsed = run_send(port, args.messages)
+        print("%10s %10.2f %10.1f" % ('on' if enabled else 'off', elapsed, args.messages / elapsed))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
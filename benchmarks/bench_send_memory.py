@@ -0,0 +1,61 @@
+"""Memoria máxima de ``send_message`` según el tamaño del adjunto: smtplib.SMTP frente a SMTPInherit.
+
+    python benchmarks/bench_send_memory.py --sizes 1 5 20
+"""
+import argparse
+import email.policy
+import os
+import sys
+import tracemalloc
+from email.message import EmailMessage
+from smtplib import SMTP
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from libs.smtplib_inherit import SMTPInherit  # noqa: E402
+
+
+def _message(size):
+    # Mismo tipo de mensaje que construye ir.mail_server.build_email
+    message = EmailMessage(policy=email.policy.SMTP)
+    message['From'] = 'bench@example.com'
+    message['To'] = 'rcpt@example.com'
+    message['Subject'] = 'Benchmark'
+    message.set_content('Hola')
+    message.add_alternative('<p>Hola</p>', subtype='html')
+    message.add_attachment(os.urandom(size), maintype='application', subtype='octet-stream', filename='f.bin')
+    return message
+
+
+def peak_memory(smtp_class, port, size):
+    message = _message(size)
+    connection = smtp_class('127.0.0.1', port)
+    connection.ehlo()
+    tracemalloc.start()
+    connection.send_message(message, 'bench@example.com', ['rcpt@example.com'])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    connection.quit()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20], help="tamaños de adjunto en MB")
+    args = parser.parse_args()
+
+    server = FakeSESServer()
+    port = server.start()
+    print("%12s %14s %14s" % ("attach MB", "SMTP peak MB", "Inherit peak MB"))
+    for size in args.sizes:
+        print("%12d %14.1f %14.1f" % (
+            size,
+            peak_memory(SMTP, port, size << 20) / 1e6,
+            peak_memory(SMTPInherit, port, size << 20) / 1e6,
+        ))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Coste de carga, memoria y búsqueda del índice de supresión para N direcciones.
+
+    python benchmarks/bench_suppression.py --size 5000000 --lookups 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from libs.suppression import SuppressionIndex  # noqa: E402
+
+
+def run(size, lookups, incremental, seed=None):
+    rng = random.Random(seed)
+    index = SuppressionIndex()
+    start = time.perf_counter()
+    index.load(f"user{i}@example.com" for i in range(size))
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.add(f"new{i}@example.com" for i in range(incremental))
+    incremental_add = time.perf_counter() - start
+
+    # Mitad de aciertos y mitad de fallos
+    emails = [f"user{rng.randrange(size * 2)}@example.com" for __ in range(lookups)]
+    start = time.perf_counter()
+    hits = sum(email in index for email in emails)
+    lookup = (time.perf_counter() - start) / lookups * 1e6
+    return {
+        'addresses': len(index),
+        'index_mb': len(index._sorted) * index._sorted.itemsize / 1e6,
+        'recent': len(index._recent),
+        'load_s': load,
+        'incremental_ms': incremental_add * 1000,
+        'lookup_us': lookup,
+        'hits': hits,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=200000)
+    parser.add_argument('--incremental', type=int, default=5000, help="direcciones añadidas tras la carga")
+    args = parser.parse_args()
+
+    result = run(args.size, args.lookups, args.incremental)
+    print(f"addresses:       {result['addresses']}")
+    print(f"index size:      {result['index_mb']:.1f} MB (+{result['recent']} recent)")
+    print(f"full load:       {result['load_s']:.2f} s")
+    print(f"incremental add: {result['incremental_ms']:.1f} ms for {args.incremental} addresses")
+    print(f"lookup:          {result['lookup_us']:.2f} us/recipient ({result['hits']} hits of {args.lookups})")
+
+
+if __name__ == '__main__':
+    main()
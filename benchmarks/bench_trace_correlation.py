@@ -0,0 +1,112 @@
+"""Consultas, latencia y memoria de la correlación de rebotes y respuestas sobre una tabla grande.
+
+Se ejecuta dentro de un shell de Odoo, tras generar los rastros con generate_traces.py:
+
+    BENCH_OUTPUT=db.json odoo-bin shell -d <db> < benchmarks/bench_trace_correlation.py
+    python benchmarks/run_benchmarks.py --include db.json
+
+Para cada número de IDs toma rastros al azar del mailing de benchmark y mide, con la caché
+del ORM vacía:
+
+- bounce: ``_get_traces_from_ses_ids`` con los IDs tal como llegan en los rebotes (@email.amazonses.com),
+- reply: ``_get_traces_from_references`` con una mezcla de Message-IDs de Odoo y de SES,
+- bounce_write: la búsqueda más ``set_bounced`` y ``_set_ses_bounce_info`` (deshecho al terminar),
+
+primero con la caché de correlación SES vacía (``cold``) y después con los IDs ya en ella (``cached``).
+
+Se queda con la mediana de ``BENCH_REPEAT`` repeticiones. El número de consultas no debe crecer
+con el número de IDs ni con el tamaño de la tabla.
+"""
+import json
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+BENCH_SUBJECT = 'aws_ses_mail_tracking benchmark'
+SIZES = (1, 10, 100, 1000)
+
+
+def _sample(env, mailing_id, size, rng):
+    env.cr.execute("SELECT min(id), max(id) FROM mailing_trace WHERE mass_mailing_id = %s", [mailing_id])
+    low, high = env.cr.fetchone()
+    ids = rng.sample(range(low, high + 1), min(size, high - low + 1))
+    env.cr.execute("SELECT message_id, ses_message_key FROM mailing_trace WHERE id = ANY(%s)", [ids])
+    return env.cr.fetchall()
+
+
+def _measure(env, function, repeat, cold):
+    """(consultas, ms mediana, KB de memoria máxima) de ``function``; cada repetición se deshace"""
+    cache = env['mailing.trace']._get_ses_trace_cache()
+    queries = None
+    timings = []
+    for _i in range(repeat):
+        env.cr.execute("SAVEPOINT bench_trace_correlation")
+        env.invalidate_all()
+        if cold and cache:
+            cache.clear()
+        queries_before = env.cr.sql_log_count
+        started = time.perf_counter()
+        function()
+        env.flush_all()
+        timings.append(time.perf_counter() - started)
+        queries = env.cr.sql_log_count - queries_before
+        env.cr.execute("ROLLBACK TO SAVEPOINT bench_trace_correlation")
+        env.invalidate_all()
+    # La memoria se mide aparte: tracemalloc ralentiza la ejecución
+    if cold and cache:
+        cache.clear()
+    tracemalloc.start()
+    env.cr.execute("SAVEPOINT bench_trace_correlation")
+    function()
+    env.flush_all()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    env.cr.execute("ROLLBACK TO SAVEPOINT bench_trace_correlation")
+    env.invalidate_all()
+    return queries, statistics.median(timings) * 1000, peak / 1024
+
+
+def run(env, repeat, seed):
+    Trace = env['mailing.trace'].sudo()
+    mailing = env['mailing.mailing'].search([('subject', '=', BENCH_SUBJECT)], limit=1)
+    assert mailing, "no benchmark mailing: run generate_traces.py first"
+    env.cr.execute("SELECT count(*) FROM mailing_trace")
+    table_rows = env.cr.fetchone()[0]
+    rng = random.Random(seed)
+
+    results = {'table_rows': {'value': table_rows, 'unit': 'rows', 'better': 'info'}}
+    print("%-20s %6s %9s %10s %10s" % ("scenario", "ids", "queries", "ms", "peak KB"))
+    for size in SIZES:
+        rows = _sample(env, mailing.id, size, rng)
+        bounced_ids = ['<%s@email.amazonses.com>' % ses_key for __, ses_key in rows]
+        # La mitad de las respuestas citan el Message-ID de Odoo y la otra mitad el de SES
+        references = [message_id if index % 2 else bounced_ids[index] for index, (message_id, __) in enumerate(rows)]
+
+        def bounce_write():
+            traces = Trace._get_traces_from_ses_ids(bounced_ids)
+            traces.set_bounced(bounce_message='SES Report: Hard Bounce (Code: 5.1.1)')
+            traces._set_ses_bounce_info('hard', status_code='5.1.1', suppress=True)
+
+        scenarios = (
+            ('bounce', lambda: Trace._get_traces_from_ses_ids(bounced_ids)),
+            ('reply', lambda: Trace._get_traces_from_references(references)),
+            ('bounce_write', bounce_write),
+        )
+        for name, function in scenarios:
+            for cold in (True, False):
+                label = '%s_%s' % (name, 'cold' if cold else 'cached')
+                queries, elapsed, peak = _measure(env, function, repeat, cold)
+                print("%-20s %6d %9d %10.2f %10.1f" % (label, size, queries, elapsed, peak))
+                results[f'{label}_{size}_queries'] = {'value': queries, 'unit': 'queries', 'better': 'lower'}
+                results[f'{label}_{size}_ms'] = {'value': elapsed, 'unit': 'ms', 'better': 'lower'}
+                results[f'{label}_{size}_peak_kb'] = {'value': peak, 'unit': 'KB', 'better': 'lower'}
+    env.cr.rollback()
+    return {'results': {'trace_correlation': results}}
+
+
+report = run(env, int(os.environ.get('BENCH_REPEAT', 5)), int(os.environ.get('BENCH_SEED', 1)))  # noqa: F821
+if os.environ.get('BENCH_OUTPUT'):
+    with open(os.environ['BENCH_OUTPUT'], 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,144 @@
+"""Servidor HTTP local que responde como el endpoint de la API SES v2, para benchmarks y pruebas.
+
+- ``POST /v2/email/outbound-emails`` con contenido Raw: ``{"MessageId": ...}``,
+- ``GET /v2/email/account`` (GetAccount, usado por "Probar conexión"),
+- comprueba la firma AWS Signature Version 4 con las credenciales configuradas (403 si no coincide),
+- latencia configurable por petición y una fracción configurable de 429 TooManyRequestsException.
+
+Uso independiente::
+
+    python benchmarks/fake_ses_api.py --port 8025 --latency 0.02 --throttle 0.01
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'aws_ses_mail_tracking'))
+
+from libs.ses_api import SES_API_SEND_PATH, sign_v4  # noqa: E402
+
+ACCESS_KEY = 'AKIDEXAMPLE'
+SECRET_KEY = 'wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY'
+REGION = 'us-east-1'
+
+
+class FakeSESAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # Sin Nagle: cabeceras y cuerpo van en escrituras separadas (como en un servidor real con TCP_NODELAY)
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        if server.latency:
+            time.sleep(server.latency)
+        if self.path != SES_API_SEND_PATH:
+            return self._reply(404, {'message': 'Not found'}, 'NotFoundException')
+        if not self._signature_ok(body):
+            return self._reply(403, {'message': 'The request signature we calculated does not match'},
+                               'SignatureDoesNotMatch')
+        if random.random() < server.throttle:
+            with server.lock:
+                server.throttled += 1
+            return self._reply(429, {'message': 'Maximum sending rate exceeded.'}, 'TooManyRequestsException')
+        payload = json.loads(body)
+        data = base64.b64decode(payload['Content']['Raw']['Data'])
+        with server.lock:
+            server.messages += 1
+            server.bytes += len(data)
+        self._reply(200, {'MessageId': '%016x-%s-000000' % (random.getrandbits(64), uuid.uuid4())})
+
+    def do_GET(self):
+        if self.path != '/v2/email/account':
+            return self._reply(404, {'message': 'Not found'}, 'NotFoundException')
+        if not self._signature_ok(b''):
+            return self._reply(403, {'message': 'The request signature we calculated does not match'},
+                               'SignatureDoesNotMatch')
+        self._reply(200, {
+            'SendingEnabled': True,
+            'SendQuota': {'Max24HourSend': 50000.0, 'MaxSendRate': 14.0, 'SentLast24Hours': float(self.server.fake.messages)},
+        })
+
+    def _signature_ok(self, body):
+        signed = self.headers.get('Authorization', '').split('SignedHeaders=')[-1].split(',')[0].split(';')
+        headers = {name: self.headers[name] for name in signed if name not in ('host', 'x-amz-date')}
+        expected = sign_v4(
+            self.command, 'http://%s%s' % (self.headers['Host'], self.path), headers, body,
+            self.server.fake.access_key, self.server.fake.secret_key, self.server.fake.region,
+            amz_date=self.headers.get('X-Amz-Date'))
+        return expected['Authorization'] == self.headers.get('Authorization')
+
+    def _reply(self, status, payload, error_type=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if error_type:
+            self.send_header('x-amzn-ErrorType', error_type)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeSESAPIServer:
+    """Servidor en un hilo propio; ``start()`` devuelve el puerto en escucha"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, throttle=0.0,
+                 access_key=ACCESS_KEY, secret_key=SECRET_KEY, region=REGION):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.throttle = throttle
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.messages = self.bytes = self.throttled = self.requests = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def endpoint(self):
+        return 'http://%s:%s' % (self.host, self.port)
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), FakeSESAPIHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0, help="segundos de espera por petición")
+    parser.add_argument('--throttle', type=float, default=0.0, help="fracción de peticiones con 429")
+    args = parser.parse_args()
+    server = FakeSESAPIServer(args.host, args.port, args.latency, args.throttle)
+    print("Fake SES API listening on %s (access key %s, region %s)" % (
+        server.endpoint if server.start() else '', ACCESS_KEY, REGION))
+    threading.Event().wait()
@@ -0,0 +1,131 @@
+"""Servidor SMTP local que responde como Amazon SES, para benchmarks.
+
+- ``250 Ok <id>`` a DATA, con un id con el formato de SES,
+- latencia configurable por ida y vuelta (simula el RTT hasta el endpoint de SES),
+- una fracción configurable de ``454 Throttling failure`` en MAIL FROM (reproducible con ``seed``).
+
+Uso independiente::
+
+    python benchmarks/fake_ses_smtp.py --port 2525 --latency 0.02 --throttle 0.01
+"""
+import argparse
+import asyncio
+import random
+import threading
+import uuid
+
+
+class FakeSESProtocol:
+
+    def __init__(self, server):
+        self.server = server
+
+    async def handle(self, reader, writer):
+        pending = []
+
+        async def reply(line):
+            # Las respuestas se acumulan y se envían juntas cuando el cliente no tiene más
+            # comandos en vuelo: la latencia se paga una vez por ida y vuelta, como en la red
+            pending.append(line.encode('ascii') + b'\r\n')
+            if reader._buffer:
+                return
+            if self.server.latency:
+                await asyncio.sleep(self.server.latency)
+            writer.write(b''.join(pending))
+            pending.clear()
+            await writer.drain()
+
+        await reply("220 email-smtp.amazonaws.com ESMTP SimpleEmailService")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                command = line.decode('ascii', 'replace').strip()
+                verb = command.split(' ', 1)[0].upper()
+                if verb in ('EHLO', 'HELO'):
+                    pending.append(
+                        b"250-email-smtp.amazonaws.com\r\n"
+                        b"250-8BITMIME\r\n"
+                        b"250-PIPELINING\r\n"
+                        b"250-SIZE 41943040\r\n"
+                        b"250-AUTH PLAIN LOGIN\r\n")
+                    await reply("250 Ok")
+                elif verb == 'AUTH':
+                    await reply("235 Authentication successful.")
+                elif verb == 'MAIL':
+                    if self.server.random.random() < self.server.throttle:
+                        self.server.throttled += 1
+                        await reply("454 Throttling failure: Maximum sending rate exceeded.")
+                    else:
+                        await reply("250 Ok")
+                elif verb == 'RCPT':
+                    await reply("250 Ok")
+                elif verb == 'DATA':
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    size = 0
+                    while True:
+                        data_line = await reader.readline()
+                        if not data_line or data_line == b'.\r\n':
+                            break
+                        size += len(data_line)
+                    self.server.messages += 1
+                    self.server.bytes += size
+                    await reply("250 Ok %016x-%s-000000" % (self.server.random.getrandbits(64), uuid.uuid4()))
+                elif verb in ('NOOP', 'RSET'):
+                    await reply("250 Ok")
+                elif verb == 'QUIT':
+                    await reply("221 Bye")
+                    return
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+
+class FakeSESServer:
+    """Servidor en un hilo propio; ``start()`` devuelve el puerto en escucha"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, throttle=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.throttle = throttle
+        self.random = random.Random(seed)
+        self.messages = self.bytes = self.throttled = 0
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self._ready.wait()
+        return self.port
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(
+            lambda r, w: FakeSESProtocol(self).handle(r, w), self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._server.serve_forever())
+        except asyncio.CancelledError:
+            pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2525)
+    parser.add_argument('--latency', type=float, default=0.0, help="segundos de espera por ida y vuelta")
+    parser.add_argument('--throttle', type=float, default=0.0, help="fracción de MAIL FROM con 454")
+    parser.add_argument('--seed', type=int, default=None, help="semilla de los 454 (reproducible)")
+    args = parser.parse_args()
+    server = FakeSESServer(args.host, args.port, args.latency, args.throttle, args.seed)
+    print("Fake SES SMTP listening on %s:%s" % (args.host, server.start()))
+    threading.Event().wait()
@@ -0,0 +1,79 @@
+"""Genera N rastros sintéticos de mailing.trace con SES Message-ID, para los benchmarks con base de datos.
+
+Se ejecuta dentro de un shell de Odoo con el módulo instalado (¡en una base de datos de pruebas!):
+
+    BENCH_TRACES=5000000 odoo-bin shell -d <db> < benchmarks/generate_traces.py
+    BENCH_CLEANUP=1 odoo-bin shell -d <db> < benchmarks/generate_traces.py
+
+Los rastros pertenecen a un mailing propio (``BENCH_SUBJECT``) y se insertan con SQL por bloques
+de ``BENCH_BATCH`` filas, confirmando cada bloque. Volver a ejecutarlo añade filas a partir de la
+última generada. Al terminar actualiza las estadísticas de la tabla (ANALYZE) para que los planes
+de consulta sean los de una tabla de ese tamaño. ``BENCH_CLEANUP=1`` borra el mailing y sus rastros.
+"""
+import os
+import time
+
+BENCH_SUBJECT = 'aws_ses_mail_tracking benchmark'
+
+
+def get_mailing(env, create=True):
+    mailing = env['mailing.mailing'].search([('subject', '=', BENCH_SUBJECT)], limit=1)
+    if not mailing and create:
+        mailing = env['mailing.mailing'].create({
+            'subject': BENCH_SUBJECT,
+            'mailing_model_id': env['ir.model']._get_id('res.partner'),
+            'body_html': '<p>Benchmark</p>',
+        })
+        env.cr.commit()
+    return mailing
+
+
+def generate(env, count, batch_size):
+    mailing = get_mailing(env)
+    env.cr.execute("SELECT count(*) FROM mailing_trace WHERE mass_mailing_id = %s", [mailing.id])
+    start = env.cr.fetchone()[0]
+    partner_id = env.user.partner_id.id
+    started = time.monotonic()
+    for first in range(start, start + count, batch_size):
+        last = min(first + batch_size, start + count) - 1
+        # Claves SES con el formato de SES (<16 hex>-<32 hex>-000000), deterministas por número de fila;
+        # un 5% de rastros ya rebotados y un 20% abiertos, como en una campaña real
+        env.cr.execute("""
+            INSERT INTO mailing_trace (
+                trace_type, model, res_id, mass_mailing_id, email, message_id,
+                ses_message_id, ses_message_key, trace_status, sent_datetime,
+                create_uid, write_uid, create_date, write_date)
+            SELECT 'mail', 'res.partner', %(partner_id)s, %(mailing_id)s,
+                   'bench' || i || '@example.com',
+                   '<bench.' || i || '@odoo.example.com>',
+                   '<' || data.ses_key || '@us-east-1.amazonses.com>',
+                   data.ses_key,
+                   CASE WHEN i %% 20 = 0 THEN 'bounce' WHEN i %% 5 = 0 THEN 'open' ELSE 'sent' END,
+                   now() at time zone 'UTC',
+                   %(uid)s, %(uid)s, now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM (SELECT i, '0100' || lpad(to_hex(i), 12, '0') || '-' || md5(i::text) || '-000000' AS ses_key
+                      FROM generate_series(%(first)s, %(last)s) AS i) AS data
+        """, {'partner_id': partner_id, 'mailing_id': mailing.id, 'uid': env.uid, 'first': first, 'last': last})
+        env.cr.commit()
+        done = last + 1 - start
+        elapsed = time.monotonic() - started
+        print("%10d / %d rows (%.0f rows/s)" % (done, count, done / elapsed if elapsed else 0))
+    env.cr.execute("ANALYZE mailing_trace")
+    env.cr.commit()
+    return mailing
+
+
+def cleanup(env):
+    mailing = get_mailing(env, create=False)
+    if not mailing:
+        return
+    env.cr.execute("DELETE FROM mailing_trace WHERE mass_mailing_id = %s", [mailing.id])
+    print("Deleted %s mailing.trace rows" % env.cr.rowcount)
+    mailing.unlink()
+    env.cr.commit()
+
+
+if os.environ.get('BENCH_CLEANUP'):
+    cleanup(env)  # noqa: F821 - `env` lo proporciona el shell de Odoo
+else:
+    generate(env, int(os.environ.get('BENCH_TRACES', 1000000)), int(os.environ.get('BENCH_BATCH', 500000)))  # noqa: F821
@@ -0,0 +1,264 @@
+"""Ejecuta los benchmarks sin base de datos y guarda un informe JSON comparable entre ejecuciones.
+
+    python benchmarks/run_benchmarks.py                         # todos, informe en benchmarks/results/
+    python benchmarks/run_benchmarks.py --quick smtp_send api_send
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/<anterior>.json
+    python benchmarks/run_benchmarks.py --compare <anterior>.json <actual>.json
+
+Cada métrica indica si es mejor cuanto más alta (msg/s) o cuanto más baja (us, MB). Con
+``--repeat`` se queda con la mejor de varias repeticiones. La comparación marca como regresión
+todo empeoramiento mayor que ``--threshold`` (%) y termina con código 1 si hay alguna.
+Los resultados de los benchmarks con base de datos (bench_trace_correlation.py y
+bench_cron_writeback.py, en un shell de Odoo) se añaden al informe con ``--include``.
+"""
+import argparse
+import datetime
+import email
+import email.policy
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'aws_ses_mail_tracking'))
+
+import bench_api_send  # noqa: E402
+import bench_bounce_report  # noqa: E402
+import bench_concurrent_send  # noqa: E402
+import bench_metrics  # noqa: E402
+import bench_send_memory  # noqa: E402
+import bench_suppression  # noqa: E402
+from fake_ses_api import ACCESS_KEY, REGION, SECRET_KEY, FakeSESAPIServer  # noqa: E402
+from fake_ses_smtp import FakeSESServer  # noqa: E402
+from libs.metrics import MetricsRegistry  # noqa: E402
+from libs.ses_api import SESAPIClient, SESAPISession  # noqa: E402
+from libs.smtplib_inherit import SMTPInherit  # noqa: E402
+
+# Escenarios por nombre, en orden de ejecución
+SCENARIOS = {}
+
+
+def scenario(function):
+    SCENARIOS[function.__name__] = function
+    return function
+
+
+def metric(value, unit, better='higher'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+@scenario
+def smtp_send(args):
+    """msg/s por SMTP, secuencial y concurrente, con latencia y throttling simulados"""
+    messages = 200 if args.quick else 1000
+    server = FakeSESServer(latency=args.latency, throttle=args.throttle, seed=args.seed)
+    port = server.start()
+    result = {}
+    for workers in (1, 4, 8):
+        elapsed, failed = bench_concurrent_send.run(port, messages, workers, 0)
+        result[f'workers_{workers}_msg_s'] = metric(messages / elapsed, 'msg/s')
+        result[f'workers_{workers}_failed'] = metric(failed, 'messages', 'lower')
+    result['throttled'] = metric(server.throttled, 'replies', 'info')
+    server.stop()
+    return result
+
+
+@scenario
+def api_send(args):
+    """msg/s por la API SES, con la misma latencia por ida y vuelta"""
+    messages = 200 if args.quick else 1000
+    server = FakeSESAPIServer(latency=args.latency, throttle=args.throttle)
+    server.start()
+    result = {}
+    for workers in (1, 4):
+        client = SESAPIClient(REGION, ACCESS_KEY, SECRET_KEY, endpoint=server.endpoint, pool_size=workers)
+        elapsed, failed = bench_api_send.run([SESAPISession(client) for _i in range(workers)], messages)
+        client.close()
+        result[f'workers_{workers}_msg_s'] = metric(messages / elapsed, 'msg/s')
+        result[f'workers_{workers}_failed'] = metric(failed, 'messages', 'lower')
+    server.stop()
+    return result
+
+
+@scenario
+def send_memory(args):
+    """Memoria máxima de send_message según el tamaño del adjunto"""
+    server = FakeSESServer()
+    port = server.start()
+    result = {}
+    for size in (1, 5) if args.quick else (1, 5, 20):
+        peak = bench_send_memory.peak_memory(SMTPInherit, port, size << 20)
+        result[f'attach_{size}mb_peak_mb'] = metric(peak / 1e6, 'MB', 'lower')
+    server.stop()
+    return result
+
+
+@scenario
+def bounce_report(args):
+    """Coste del análisis de cada rebote/queja del corpus"""
+    iterations = 500 if args.quick else 5000
+    result = {}
+    for path in sorted(glob.glob(os.path.join(BENCH_DIR, 'corpus', '*.eml'))):
+        with open(path, 'rb') as f:
+            message = email.message_from_binary_file(f, policy=email.policy.SMTP)
+        name = os.path.splitext(os.path.basename(path))[0]
+        result[f'{name}_us'] = metric(
+            bench_bounce_report.timed(bench_bounce_report.report_details, message, iterations), 'us', 'lower')
+    return result
+
+
+@scenario
+def suppression(args):
+    """Carga y búsqueda en el índice de supresión"""
+    size = 100000 if args.quick else 1000000
+    data = bench_suppression.run(size, 50000 if args.quick else 200000, 5000, seed=args.seed)
+    return {
+        'load_s': metric(data['load_s'], 's', 'lower'),
+        'incremental_ms': metric(data['incremental_ms'], 'ms', 'lower'),
+        'lookup_us': metric(data['lookup_us'], 'us', 'lower'),
+        'index_mb': metric(data['index_mb'], 'MB', 'lower'),
+    }
+
+
+@scenario
+def metrics_overhead(args):
+    """Coste de los ganchos de métricas por envío"""
+    iterations = 20000 if args.quick else 200000
+    return {
+        'disabled_us': metric(bench_metrics.run_hooks(MetricsRegistry(False), iterations) * 1e6, 'us', 'lower'),
+        'enabled_us': metric(bench_metrics.run_hooks(MetricsRegistry(True), iterations) * 1e6, 'us', 'lower'),
+    }
+
+
+def best(runs):
+    """Combina las repeticiones de un escenario quedándose con el mejor valor de cada métrica"""
+    result = runs[0]
+    for run in runs[1:]:
+        for name, data in run.items():
+            current = result.get(name)
+            if current is None:
+                result[name] = data
+            elif data['better'] == 'higher' and data['value'] > current['value']:
+                result[name] = data
+            elif data['better'] == 'lower' and data['value'] < current['value']:
+                result[name] = data
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    names = args.scenarios or list(SCENARIOS)
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': {
+                'quick': args.quick, 'repeat': args.repeat, 'latency': args.latency,
+                'throttle': args.throttle, 'seed': args.seed,
+            },
+        },
+        'results': {},
+    }
+    for name in names:
+        started = time.perf_counter()
+        runs = []
+        for _i in range(args.repeat):
+            random.seed(args.seed)
+            runs.append(SCENARIOS[name](args))
+        report['results'][name] = best(runs)
+        print("%-20s %6.1fs" % (name, time.perf_counter() - started), file=sys.stderr)
+    # ru_maxrss está en KB en Linux
+    report['results']['process'] = {
+        'peak_rss_mb': metric(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'MB', 'info'),
+    }
+    for path in args.include or []:
+        with open(path) as f:
+            report['results'].update(json.load(f).get('results', {}))
+    return report
+
+
+def compare(old, new, threshold):
+    """Tabla de cambios entre dos informes; devuelve el número de regresiones"""
+    regressions = 0
+    print("%-48s %14s %14s %9s" % ("metric", "old", "new", "change"))
+    for scenario_name, metrics in new['results'].items():
+        for name, data in metrics.items():
+            previous = old['results'].get(scenario_name, {}).get(name)
+            label = f"{scenario_name}.{name}"
+            if previous is None:
+                print("%-48s %14s %14.3f %9s" % (label, '-', data['value'], 'new'))
+                continue
+            change = (data['value'] - previous['value']) / previous['value'] * 100 if previous['value'] else 0.0
+            flag = ''
+            if data['better'] in ('higher', 'lower'):
+                worse = -change if data['better'] == 'higher' else change
+                if worse > threshold:
+                    flag = '  REGRESSION'
+                    regressions += 1
+                elif -worse > threshold:
+                    flag = '  improved'
+            print("%-48s %14.3f %14.3f %+8.1f%%%s" % (label, previous['value'], data['value'], change, flag))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help="escenarios a ejecutar (%s)" % ', '.join(SCENARIOS))
+    parser.add_argument('--quick', action='store_true', help="tamaños reducidos, para una comprobación rápida")
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--latency', type=float, default=0.005, help="segundos por ida y vuelta del SES simulado")
+    parser.add_argument('--throttle', type=float, default=0.01, help="fracción de 454 del SES simulado")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="fichero del informe (por defecto benchmarks/results/<fecha>-<revisión>.json)")
+    parser.add_argument('--include', nargs='+', help="informes JSON a añadir (p. ej. de bench_trace_correlation.py)")
+    parser.add_argument('--baseline', help="informe con el que comparar al terminar")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="solo comparar dos informes")
+    parser.add_argument('--threshold', type=float, default=10.0, help="empeoramiento (%%) considerado regresión")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown scenarios: %s" % ', '.join(sorted(unknown)))
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+
+    report = run(args)
+    output = args.output or os.path.join(BENCH_DIR, 'results', '%s-%s.json' % (
+        datetime.datetime.now().strftime('%Y%m%d-%H%M%S'), report['meta']['revision'] or 'unknown'))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print("Report written to %s" % output, file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        sys.exit(1 if compare(baseline, report, args.threshold) else 0)
+    for scenario_name, metrics in report['results'].items():
+        for name, data in metrics.items():
+            print("%-48s %14.3f %s" % (f"{scenario_name}.{name}", data['value'], data['unit']))
+
+
+if __name__ == '__main__':
+    main()